@@ -0,0 +1,449 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import signal
+import argparse
+import tempfile
+import threading
+import contextlib
+import subprocess
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from sender import BrokerClient, generate_random_message, latency_summary
+
+
+# =============================================
+# Benchmark reproductibil pentru broker
+# =============================================
+# Pornește un NetworkServer (în același proces sau ca subproces) cu un director de
+# date nou, publică un număr fix de mesaje de la P publisheri către S subscriberi
+# și măsoară debitul, latența end-to-end, memoria (RSS) și octeții scriși pe disc
+# per mesaj. Rezultatele sunt adăugate într-un fișier JSON, ca rulările să poată
+# fi comparate (--baseline semnalează regresiile).
+LAB_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+def read_rss(pid='self'):
+    """(RSS curent, RSS maxim) în KB, din /proc (None pe alte sisteme)"""
+    values = {}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('VmRSS', 'VmHWM'):
+                    values[key] = int(value.split()[0])
+    except OSError:
+        return None, None
+    return values.get('VmRSS'), values.get('VmHWM')
+
+
+def directory_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def wait_for_port(host, port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Server did not start on {host}:{port}")
+
+
+class InProcessServer:
+    """NetworkServer pornit pe fire în procesul benchmark-ului (RSS include și clienții)"""
+
+    def __init__(self, data_dir, mode='threaded', fsync='none', queue_size=1024):
+        self.data_dir = data_dir
+        self.options = {'mode': mode, 'fsync_policy': fsync, 'queue_size': queue_size}
+        self.host = 'localhost'
+        self.port = free_port()
+        self.server = None
+
+    def start(self):
+        # Import local: server.py creează fișierele de schemă la import
+        with contextlib.redirect_stdout(io.StringIO()):
+            import server
+            self.server = server.NetworkServer(self.host, self.port, free_port(), storage_dir=self.data_dir,
+                                               **self.options)
+        target = self.server.start_async_server if self.options['mode'] == 'asyncio' \
+            else self.server.start_tcp_server
+        threading.Thread(target=target, daemon=True).start()
+        wait_for_port(self.host, self.port)
+
+    def rss(self):
+        return read_rss()
+
+    def stop(self):
+        self.server.broker.log.close()
+
+
+class SubprocessServer:
+    """server.py pornit ca proces separat (RSS măsoară doar broker-ul)"""
+
+    def __init__(self, data_dir, mode='threaded', fsync='none', queue_size=1024):
+        self.data_dir = data_dir
+        self.host = 'localhost'
+        self.port = free_port()
+        self.command = [sys.executable, os.path.join(LAB_DIR, 'server.py'),
+                        '--tcp-port', str(self.port), '--udp-port', str(free_port()),
+                        '--data-dir', data_dir, '--mode', mode, '--fsync', fsync,
+                        '--queue-size', str(queue_size), '--log-level', 'WARNING']
+        self.process = None
+
+    def start(self):
+        self.process = subprocess.Popen(self.command, cwd=LAB_DIR, stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.STDOUT)
+        wait_for_port(self.host, self.port)
+
+    def rss(self):
+        return read_rss(self.process.pid)
+
+    def stop(self):
+        # Fără SIGINT: oprirea normală ar exporta jurnalul în messages.* din Lab1
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def sized_message(format_type, topic, size):
+    """Un mesaj valid (text, JSON sau XML conform schemelor) de aproximativ `size` octeți"""
+    content = generate_random_message(format_type, topic)
+    missing = size - len(content.encode('utf-8'))
+    if missing <= 0:
+        return content
+    if format_type == 'json':
+        data = json.loads(content)
+        data['description'] += 'x' * missing
+        return json.dumps(data, indent=2, ensure_ascii=False)
+    if format_type == 'xml':
+        root = ET.fromstring(content)
+        element = root.find('content')
+        element.text += ' ' + 'x' * (missing - 1)
+        return ET.tostring(root, encoding='unicode')
+    return content + ' ' + 'x' * (missing - 1)
+
+
+def parse_formats(spec):
+    """'json:2,xml,text' -> [('json', 2.0), ('xml', 1.0), ('text', 1.0)]"""
+    formats = []
+    for item in spec.split(','):
+        name, _, weight = item.strip().partition(':')
+        if name not in ('text', 'json', 'xml'):
+            raise ValueError(f"Unknown format: {name}")
+        formats.append((name, float(weight) if weight else 1.0))
+    return formats
+
+
+class BrokerBenchmark:
+    def __init__(self, host, port, messages=20000, publishers=1, subscribers=1, size=256,
+                 formats=(('json', 1.0),), topics=1, batch_size=50, rate=0, max_in_flight=64,
+                 encoding='json', distinct=100, seed=1):
+        self.host = host
+        self.port = port
+        self.messages = messages
+        self.publishers = publishers
+        self.subscribers = subscribers
+        self.batch_size = batch_size if encoding == 'json' else 1
+        self.rate = rate
+        self.max_in_flight = max_in_flight
+        self.encoding = encoding
+        self.topics = ['bench'] if topics <= 1 else [f'bench.{i}' for i in range(topics)]
+        self.subscription = 'bench' if topics <= 1 else 'bench.*'
+
+        # Conținutul este pregenerat (cu seed fix), ca generarea să nu limiteze debitul
+        rng = random.Random(seed)
+        random.seed(seed)
+        names = [name for name, _ in formats]
+        weights = [weight for _, weight in formats]
+        pool = {name: [sized_message(name, 'bench', size) for _ in range(distinct)] for name in names}
+        self.plan = [(topic, name, rng.choice(pool[name]))
+                     for topic, name in zip((rng.choice(self.topics) for _ in range(messages)),
+                                            rng.choices(names, weights, k=messages))]
+        self.payload_bytes = sum(len(content.encode('utf-8')) for _, _, content in self.plan)
+
+        self.lock = threading.Lock()
+        self.sent_at = {}
+        self.ack_latencies = []
+        self.acked = 0
+        self.rejected = 0
+        self.received = [[] for _ in range(subscribers)]
+
+    def _on_ack(self, started, count, future):
+        now = time.perf_counter()
+        try:
+            response = future.result()
+        except Exception:
+            with self.lock:
+                self.rejected += count
+            return
+        ids = response['ids'] if 'ids' in response else [response.get('id')]
+        with self.lock:
+            self.ack_latencies.append((now - started) * 1000)
+            for msg_id in ids:
+                if msg_id is None:
+                    self.rejected += 1
+                else:
+                    self.acked += 1
+                    self.sent_at[msg_id] = started
+
+    def _publish(self, client, plan, futures):
+        """Publică partea unui publisher, cu ritm constant dacă rate > 0"""
+        rate = self.rate / self.publishers if self.rate else 0
+        start = time.perf_counter()
+        for n, i in enumerate(range(0, len(plan), self.batch_size)):
+            if rate:
+                delay = start + n * self.batch_size / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            batch = plan[i:i + self.batch_size]
+            sent = time.perf_counter()
+            if self.encoding == 'record':
+                topic, format_type, content = batch[0]
+                future = client.publish_record(topic, content, format_type)
+            elif len(batch) == 1:
+                future = client.publish(*batch[0])
+            else:
+                future = client.publish_batch([{'topic': topic, 'format': format_type, 'content': content}
+                                               for topic, format_type, content in batch])
+            future.add_done_callback(lambda f, sent=sent, count=len(batch): self._on_ack(sent, count, f))
+            futures.append(future)
+
+    def run(self):
+        subscribers = []
+        for index in range(self.subscribers):
+            client = BrokerClient(self.host, self.port).connect()
+            received = self.received[index]
+            client.subscribe(self.subscription, lambda m, received=received: received.append(
+                (m.get('id'), time.perf_counter())), encoding=self.encoding).result(timeout=10)
+            subscribers.append(client)
+        publishers = [BrokerClient(self.host, self.port, self.max_in_flight).connect()
+                      for _ in range(self.publishers)]
+
+        futures = []
+        threads = [threading.Thread(target=self._publish, args=(client, self.plan[i::self.publishers], futures))
+                   for i, client in enumerate(publishers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for future in list(futures):
+            try:
+                future.result(timeout=30)
+            except Exception:
+                pass
+        elapsed = time.perf_counter() - start
+
+        # Așteaptă ca fiecare subscriber să primească toate mesajele confirmate
+        deadline = time.time() + 10
+        while time.time() < deadline and any(len(r) < self.acked for r in self.received):
+            time.sleep(0.05)
+        delivered_elapsed = time.perf_counter() - start
+
+        statistics = {}
+        try:
+            statistics = publishers[0].request({'type': 'STATS'}).result(timeout=10).get('statistics', {})
+        except Exception:
+            pass
+        for client in publishers + subscribers:
+            client.close()
+        return self.report(elapsed, delivered_elapsed, statistics)
+
+    def report(self, elapsed, delivered_elapsed, statistics):
+        with self.lock:
+            end_to_end = [(received_at - self.sent_at[msg_id]) * 1000
+                          for received in self.received for msg_id, received_at in received
+                          if msg_id in self.sent_at]
+            deliveries = sum(len(received) for received in self.received)
+            return {
+                'publish': {
+                    'acked': self.acked,
+                    'rejected': self.rejected,
+                    'elapsed_s': round(elapsed, 3),
+                    'throughput': round(self.acked / elapsed, 1) if elapsed else 0,
+                    'mb_per_s': round(self.payload_bytes / elapsed / 1e6, 2) if elapsed else 0,
+                    'avg_payload_bytes': round(self.payload_bytes / max(1, len(self.plan)), 1),
+                },
+                'delivery': {
+                    'expected': self.acked * self.subscribers,
+                    'delivered': deliveries,
+                    'throughput': round(deliveries / delivered_elapsed, 1) if delivered_elapsed else 0,
+                    'dropped': statistics.get('fanout', {}).get('dropped'),
+                },
+                'ack_latency': latency_summary(self.ack_latencies),
+                'end_to_end_latency': latency_summary(end_to_end),
+                'storage': statistics.get('storage', {}),
+            }
+
+
+# =============================================
+# Fișierul de rezultate și detectarea regresiilor
+# =============================================
+# (cale în rezultate, True dacă valoarea mai mare este mai bună)
+TRACKED_METRICS = (
+    (('publish', 'throughput'), True),
+    (('delivery', 'throughput'), True),
+    (('end_to_end_latency', 'p50_ms'), False),
+    (('end_to_end_latency', 'p99_ms'), False),
+    (('storage', 'bytes_per_message'), False),
+    (('server', 'peak_rss_kb'), False),
+)
+
+
+def _lookup(results, path):
+    for key in path:
+        if not isinstance(results, dict):
+            return None
+        results = results.get(key)
+    return results
+
+
+def load_runs(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            runs = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return runs if isinstance(runs, list) else []
+
+
+def save_run(path, run):
+    runs = load_runs(path)
+    runs.append(run)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(runs, f, indent=2, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+
+def compare(run, baseline_runs, tolerance):
+    """Compară cu ultima rulare cu aceeași configurație; returnează lista regresiilor"""
+    previous = next((r for r in reversed(baseline_runs) if r.get('config') == run['config']), None)
+    if previous is None:
+        print("ℹ️  Nicio rulare anterioară cu aceeași configurație în baseline")
+        return []
+
+    regressions = []
+    print(f"\n📊 Comparație cu rularea din {previous.get('timestamp')} ({previous.get('commit')})")
+    for path, higher_is_better in TRACKED_METRICS:
+        old, new = _lookup(previous['results'], path), _lookup(run['results'], path)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        marker = '❌' if worse > tolerance else '✅'
+        print(f"  {marker} {'.'.join(path):<32} {old:>12} -> {new:<12} ({change:+.1%})")
+        if worse > tolerance:
+            regressions.append('.'.join(path))
+    return regressions
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=LAB_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Broker benchmark: throughput, fan-out latency, storage cost")
+    parser.add_argument('--server', choices=('inprocess', 'subprocess'), default='subprocess',
+                        help="inprocess: server pe fire în acest proces; subprocess: server.py separat")
+    parser.add_argument('--mode', choices=('threaded', 'asyncio'), default='threaded')
+    parser.add_argument('--fsync', choices=('none', 'batch', 'message'), default='none')
+    parser.add_argument('--queue-size', type=int, default=1024,
+                        help="coada de ieșire per subscriber pe server")
+    parser.add_argument('--messages', type=int, default=20000, help="numărul total de mesaje publicate")
+    parser.add_argument('--publishers', type=int, default=1)
+    parser.add_argument('--subscribers', type=int, default=1)
+    parser.add_argument('--size', type=int, default=256, help="dimensiunea aproximativă a conținutului (octeți)")
+    parser.add_argument('--formats', default='json',
+                        help="mixul de formate cu ponderi opționale, ex: json:2,xml,text")
+    parser.add_argument('--topics', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=50, help="mesaje per cadru PUBLISH_BATCH (1 = PUBLISH)")
+    parser.add_argument('--rate', type=float, default=0, help="mesaje/s în total (0 = cât de repede se poate)")
+    parser.add_argument('--in-flight', type=int, default=64, help="cereri neconfirmate permise per publisher")
+    parser.add_argument('--encoding', choices=('json', 'record'), default='json',
+                        help="record: publicare și livrare în codificarea compactă (fără loturi)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--name', default='default', help="numele scenariului în fișierul de rezultate")
+    parser.add_argument('--output', default='bench_results.json', help="fișierul JSON în care se adaugă rularea")
+    parser.add_argument('--baseline', default=None,
+                        help="fișier de rezultate cu care se compară (implicit fără comparație)")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="înrăutățirea relativă tolerată înainte de a semnala o regresie")
+    parser.add_argument('--keep-data', action='store_true', help="păstrează directorul de date al serverului")
+    args = parser.parse_args()
+
+    config = {key: value for key, value in vars(args).items()
+              if key not in ('output', 'baseline', 'tolerance', 'keep_data')}
+    data_dir = tempfile.mkdtemp(prefix='broker-bench-')
+    server_class = InProcessServer if args.server == 'inprocess' else SubprocessServer
+    server = server_class(data_dir, args.mode, args.fsync, args.queue_size)
+
+    print(f"🚀 Pornesc serverul ({args.server}, {args.mode}, fsync={args.fsync}) în {data_dir}")
+    server.start()
+    try:
+        rss_before, _ = server.rss()
+        benchmark = BrokerBenchmark(server.host, server.port, args.messages, args.publishers, args.subscribers,
+                                    args.size, parse_formats(args.formats), args.topics, args.batch_size,
+                                    args.rate, args.in_flight, args.encoding, seed=args.seed)
+        print(f"📤 {args.messages} mesaje, {args.publishers} publisheri, {args.subscribers} subscriberi, "
+              f"~{args.size} B, formate {args.formats}")
+        results = benchmark.run()
+        rss, peak_rss = server.rss()
+        written = directory_bytes(data_dir)
+    finally:
+        server.stop()
+        if not args.keep_data:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    results['server'] = {'rss_before_kb': rss_before, 'rss_kb': rss, 'peak_rss_kb': peak_rss,
+                         'includes_clients': args.server == 'inprocess'}
+    results['storage']['bytes_written'] = written
+    results['storage']['bytes_per_message'] = round(written / results['publish']['acked'], 1) \
+        if results['publish']['acked'] else None
+
+    run = {
+        'name': args.name,
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'commit': current_commit(),
+        'config': config,
+        'results': results,
+    }
+    print(json.dumps(results, indent=2))
+
+    regressions = []
+    if args.baseline:
+        regressions = compare(run, load_runs(args.baseline), args.tolerance)
+    save_run(args.output, run)
+    print(f"📁 Rezultatele au fost adăugate în {args.output}")
+    if regressions:
+        print(f"🚨 Regresii peste {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
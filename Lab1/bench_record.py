@@ -0,0 +1,89 @@
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+from protocol import FrameDecoder, encode_frame, encode_record_frame, OP_MESSAGE
+from record import MessageRecord, RecordCodec, SymbolTable, message_frame
+from message_log import JSONCodec
+from sender import generate_random_message
+
+
+# =============================================
+# Benchmark: dict + JSON vs. înregistrare compactă
+# =============================================
+def make_messages(count, topics):
+    now = time.time()
+    return [MessageRecord(1000 + i, f"sensors.{i % topics}", 'json',
+                          generate_random_message('json', 'sensors').encode('utf-8'), now, i)
+            for i in range(count)]
+
+
+def memory_per_message(label, build, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"  {label:<38} {(after - before) / count:>12,.0f} B/msg")
+    return kept
+
+
+def measure(label, func, count):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<38} {count / elapsed:>12,.0f} msg/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Message record encoding benchmark")
+    parser.add_argument('--count', type=int, default=50000)
+    parser.add_argument('--topics', type=int, default=100, help="numărul de topic-uri distincte")
+    args = parser.parse_args()
+
+    random.seed(1)
+    records = make_messages(args.count, args.topics)
+    dicts = [record.to_dict() for record in records]
+    texts = [d['content'] for d in dicts]
+    codec = RecordCodec(SymbolTable())
+    json_codec = JSONCodec()
+
+    # Structura mesajului, fără conținut (șirul de conținut este partajat în ambele variante)
+    print(f"\nMemorie per mesaj reținut ({args.count} mesaje, {args.topics} topic-uri)")
+    memory_per_message('dict (forma veche, timestamp text)',
+                       lambda: [{'id': r.id, 'topic': r.topic, 'format': r.format, 'content': text,
+                                 'timestamp': d['timestamp'], 'offset': r.offset}
+                                for r, d, text in zip(records, dicts, texts)], args.count)
+    memory_per_message('MessageRecord (__slots__)',
+                       lambda: [MessageRecord(r.id, r.topic, r.format, r.content, r.timestamp, r.offset)
+                                for r in records], args.count)
+    memory_per_message('cadru JSON reținut',
+                       lambda: [encode_frame(OP_MESSAGE, d) for d in dicts], args.count)
+    memory_per_message('cadru compact reținut', lambda: [message_frame(r) for r in records], args.count)
+
+    print("\nStocare în jurnal")
+    stored_json = [json_codec.encode(d) for d in dicts]
+    stored_compact = [codec.encode(r) for r in records]
+    print(f"  {'JSON':<38} {sum(map(len, stored_json)) / args.count:>12,.0f} B/msg")
+    print(f"  {'compact (ID-uri de topic)':<38} {sum(map(len, stored_compact)) / args.count:>12,.0f} B/msg")
+    measure('encode JSON', lambda: [json_codec.encode(d) for d in dicts], args.count)
+    measure('encode compact', lambda: [codec.encode(r) for r in records], args.count)
+    measure('decode JSON', lambda: [json_codec.decode(p) for p in stored_json], args.count)
+    measure('decode compact', lambda: [codec.decode(p) for p in stored_compact], args.count)
+
+    print("\nCadre MESSAGE (publisher -> subscriber)")
+    json_stream = b''.join(encode_frame(OP_MESSAGE, d) for d in dicts)
+    compact_stream = b''.join(message_frame(r) for r in records)
+    measure('encode JSON', lambda: [encode_frame(OP_MESSAGE, d) for d in dicts], args.count)
+    measure('encode compact', lambda: [encode_record_frame(OP_MESSAGE, r.offset, r.id, r.timestamp,
+                                                           r.topic, r.format, r.content)
+                                       for r in records], args.count)
+    measure('decode JSON', lambda: FrameDecoder().feed(json_stream), args.count)
+    measure('decode compact', lambda: FrameDecoder().feed(compact_stream), args.count)
+    print(f"  {'octeți JSON / compact':<38} {len(json_stream) / len(compact_stream):>12.2f} x")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import sys
+import json
+import time
+import random
+import argparse
+import xml.etree.ElementTree as ET
+
+import jsonschema
+from lxml import etree
+
+from validation import XMLValidator, JSONValidator, ValidationEngine
+
+
+# =============================================
+# Benchmark: validare clasică vs. motorul compilat cu cache
+# =============================================
+def make_json(i):
+    return json.dumps({
+        "message_id": 1000 + i % 9000,
+        "timestamp": "2025-10-15 19:00:32",
+        "priority": random.choice(["low", "medium", "high", "critical"]),
+        "source": random.choice(["sensor_1", "sensor_2", "server", "client"]),
+        "value": round(random.uniform(0, 100), 2),
+        "status": random.choice(["active", "inactive", "warning", "error"]),
+        "description": f"Mesaj de test {i}"
+    }, indent=2)
+
+
+def make_xml(i):
+    root = ET.Element("message")
+    ET.SubElement(root, "id").text = str(i)
+    ET.SubElement(root, "topic").text = "sensors"
+    ET.SubElement(root, "timestamp").text = "2025-10-15 19:00:32"
+    ET.SubElement(root, "content").text = json.dumps({"value": i % 100})
+    return ET.tostring(root, encoding='unicode')
+
+
+def legacy_json(schema):
+    """Calea veche: jsonschema.validate reconstruiește validatorul la fiecare apel"""
+    def validate(content):
+        try:
+            jsonschema.validate(instance=json.loads(content), schema=schema)
+            return True
+        except (json.JSONDecodeError, jsonschema.ValidationError):
+            return False
+    return validate
+
+
+def legacy_xml(xsd_path):
+    with open(xsd_path, 'rb') as f:
+        schema = etree.XMLSchema(etree.XML(f.read()))
+
+    def validate(content):
+        try:
+            schema.validate(etree.fromstring(content))
+            return True
+        except etree.XMLSyntaxError:
+            return False
+    return validate
+
+
+def measure(label, func, messages):
+    start = time.perf_counter()
+    func(messages)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<38} {len(messages) / elapsed:>12,.0f} msg/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validation throughput benchmark")
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--unique', type=int, default=50,
+                        help="numărul de payload-uri distincte (mesaje periodice repetate)")
+    args = parser.parse_args()
+
+    with open('schema.json') as f:
+        json_schema = json.load(f)
+
+    for format_type, make, legacy in (('json', make_json, legacy_json(json_schema)),
+                                      ('xml', make_xml, legacy_xml('schema.xsd'))):
+        pool = [make(i) for i in range(args.unique)]
+        repeated = [pool[i % len(pool)] for i in range(args.count)]
+        unique = [make(i) for i in range(args.count)]
+
+        print(f"\n{format_type.upper()} ({args.count} messages)")
+        for name, messages in (('unique payloads', unique), (f'{args.unique} repeated payloads', repeated)):
+            engine = ValidationEngine(XMLValidator('schema.xsd'), JSONValidator('schema.json'))
+            print(f" {name}:")
+            measure('legacy (validate per call)', lambda ms: [legacy(m) for m in ms], messages)
+            measure('compiled, cache disabled',
+                    lambda ms: ValidationEngine(engine.validators['xml'], engine.validators['json'],
+                                                cache_size=0).validate_many((format_type, m) for m in ms),
+                    messages)
+            measure('compiled + cache (validate_many)',
+                    lambda ms: engine.validate_many((format_type, m) for m in ms), messages)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
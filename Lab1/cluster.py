@@ -0,0 +1,376 @@
+import time
+import zlib
+import hashlib
+import bisect
+import threading
+from collections import defaultdict
+from concurrent.futures import Future
+
+from sender import BrokerClient
+from topic_trie import is_pattern
+from instrumentation import logger
+
+
+# =============================================
+# Harta partițiilor (consistent hashing)
+# =============================================
+# Topic-urile sunt împărțite în partiții fixe (crc32(topic) % partitions), iar
+# partițiile sunt așezate pe un inel de hash cu noduri virtuale. Primul nod
+# întâlnit pe inel este proprietarul (liderul) partiției; următoarele noduri
+# distincte sunt replicile ei. Dacă liderul cade, primul nod viu din lista de
+# replici devine lider. Adăugarea unui nod mută doar partițiile de lângă el.
+def _ring_hash(key):
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+def parse_nodes(spec):
+    """Parsează lista de noduri: '0=localhost:9999,1=localhost:10000'"""
+    nodes = {}
+    for item in spec.split(','):
+        node_id, address = item.strip().split('=')
+        host, port = address.rsplit(':', 1)
+        nodes[int(node_id)] = (host, int(port))
+    return nodes
+
+
+class ClusterMap:
+    def __init__(self, nodes, partitions=64, vnodes=64, replication=1):
+        if not nodes:
+            raise ValueError("A cluster needs at least one node")
+        self.nodes = {int(node_id): (host, int(port)) for node_id, (host, port) in nodes.items()}
+        self.partitions = partitions
+        self.vnodes = vnodes
+        self.replication = min(replication, len(self.nodes))
+
+        ring = sorted((_ring_hash(f"{node_id}#{i}"), node_id) for node_id in self.nodes for i in range(vnodes))
+        self._ring_keys = [key for key, _ in ring]
+        self._ring_nodes = [node_id for _, node_id in ring]
+        self.replica_sets = [self._walk(_ring_hash(f"partition-{p}")) for p in range(partitions)]
+        self.alive = set(self.nodes)
+        self.syncing = set()   # noduri revenite care recuperează: primesc replicarea, nu conduc
+
+    def _walk(self, key):
+        """Primele `replication` noduri distincte de pe inel, în sensul acelor de ceasornic"""
+        start = bisect.bisect_left(self._ring_keys, key)
+        replicas = []
+        for i in range(len(self._ring_nodes)):
+            node_id = self._ring_nodes[(start + i) % len(self._ring_nodes)]
+            if node_id not in replicas:
+                replicas.append(node_id)
+                if len(replicas) == self.replication:
+                    break
+        return replicas
+
+    def partition_for(self, topic):
+        return zlib.crc32(topic.encode('utf-8')) % self.partitions
+
+    def replicas(self, topic):
+        return self.replica_sets[self.partition_for(topic)]
+
+    def owner(self, topic):
+        return self.leader(self.partition_for(topic))
+
+    def leader(self, partition):
+        """Liderul partiției: prima replică vie care nu mai recuperează"""
+        replicas = self.replica_sets[partition]
+        for node_id in replicas:
+            if node_id in self.alive and node_id not in self.syncing:
+                return node_id
+        for node_id in replicas:
+            if node_id in self.alive:
+                return node_id
+        return replicas[0]
+
+    def mark_dead(self, node_id):
+        self.alive.discard(node_id)
+        self.syncing.discard(node_id)
+
+    def mark_syncing(self, node_id):
+        """Nodul este viu, dar rămâne urmăritor până recuperează scrierile pierdute"""
+        self.alive.add(node_id)
+        self.syncing.add(node_id)
+
+    def mark_alive(self, node_id):
+        self.alive.add(node_id)
+        self.syncing.discard(node_id)
+
+    def address(self, node_id):
+        return self.nodes[node_id]
+
+    def to_dict(self):
+        return {
+            'nodes': {str(node_id): [host, port] for node_id, (host, port) in self.nodes.items()},
+            'partitions': self.partitions,
+            'vnodes': self.vnodes,
+            'replication': self.replication,
+            'alive': sorted(self.alive),
+            'syncing': sorted(self.syncing),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        nodes = {int(node_id): tuple(address) for node_id, address in data['nodes'].items()}
+        cluster_map = cls(nodes, data['partitions'], data['vnodes'], data.get('replication', 1))
+        if 'alive' in data:
+            cluster_map.alive = set(data['alive'])
+        cluster_map.syncing = set(data.get('syncing', ()))
+        return cluster_map
+
+
+def when_all(futures, callback):
+    """Apelează callback() o singură dată, după ce toate Future-urile s-au terminat"""
+    futures = list(futures)
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            callback()
+
+    if not futures:
+        callback()
+    for future in futures:
+        future.add_done_callback(done)
+
+
+def merge_batch_responses(size, parts):
+    """Combină răspunsurile PUBLISH_BATCH ale mai multor noduri.
+
+    parts: listă de (indecși în lotul original, Future cu răspunsul pentru acei indecși)"""
+    ids = [None] * size
+    errors = []
+    for indexes, future in parts:
+        try:
+            response = future.result()
+        except Exception as e:
+            response = {'ids': [None] * len(indexes),
+                        'errors': [{'index': i, 'message': f'Node unavailable: {e}'} for i in range(len(indexes))]}
+        for position, msg_id in zip(indexes, response.get('ids', [])):
+            ids[position] = msg_id
+        for error in response.get('errors', []):
+            errors.append({'index': indexes[error['index']], 'message': error['message']})
+    errors.sort(key=lambda error: error['index'])
+    return {'status': 'ERROR' if errors else 'OK', 'ids': ids, 'errors': errors}
+
+
+def split_batch(cluster_map, batch):
+    """Grupează mesajele unui lot după nodul proprietar: {nod: [indecși]}"""
+    owners = defaultdict(list)
+    for index, item in enumerate(batch):
+        topic = item.get('topic')
+        owners[cluster_map.owner(topic) if isinstance(topic, str) else None].append(index)
+    return owners
+
+
+# =============================================
+# Partea de server: redirecționarea publicărilor
+# =============================================
+class ClusterRouter:
+    """Ține conexiuni persistente către celelalte noduri și le trimite
+    publicările pentru topic-urile pe care nu le deține nodul curent"""
+
+    def __init__(self, cluster_map, node_id, max_in_flight=1024, heartbeat_interval=0.5, failure_timeout=1.5):
+        if node_id not in cluster_map.nodes:
+            raise ValueError(f"Node {node_id} is not part of the cluster")
+        self.map = cluster_map
+        self.node_id = node_id
+        self.max_in_flight = max_in_flight
+        self.peers = {}
+        self.lock = threading.Lock()
+        self.forwarded = defaultdict(int)
+        self.heartbeat_interval = heartbeat_interval
+        self.failure_timeout = failure_timeout
+        self.failovers = 0
+        self.broker = None      # MessageBroker, setat de NetworkServer (recuperarea nodurilor revenite)
+        self.down_since = {}    # nod căzut -> offset-ul jurnalului local la detectarea căderii
+
+    def remote_owner(self, topic):
+        """Nodul proprietar al topic-ului, sau None dacă este nodul curent"""
+        owner = self.map.owner(topic)
+        return None if owner == self.node_id else owner
+
+    def split(self, batch):
+        """(indecși locali, {nod: indecși}) pentru un lot de mesaje"""
+        owners = split_batch(self.map, batch)
+        local = owners.pop(self.node_id, []) + owners.pop(None, [])
+        return sorted(local), dict(owners)
+
+    def peer(self, node_id):
+        with self.lock:
+            client = self.peers.get(node_id)
+            if client is None or client.closed:
+                host, port = self.map.address(node_id)
+                client = self.peers[node_id] = BrokerClient(host, port, self.max_in_flight).connect()
+            return client
+
+    def forward(self, node_id, message):
+        """Trimite cererea nodului proprietar; returnează un Future cu răspunsul lui"""
+        if isinstance(message.get('content'), bytes):
+            # Publicările compacte sunt trimise mai departe ca JSON
+            message = dict(message, content=str(message['content'], 'utf-8', 'replace'))
+        try:
+            future = self.peer(node_id).request(dict(message, forwarded=True))
+        except (OSError, TimeoutError) as e:
+            future = Future()
+            future.set_exception(ConnectionError(f"Node {node_id} unavailable: {e}"))
+            return future
+        self.forwarded[node_id] += len(message.get('messages', ())) or 1
+        return future
+
+    def followers(self, topic):
+        """Replicile vii ale partiției topic-ului, în afară de nodul curent"""
+        return [node_id for node_id in self.map.replicas(topic)
+                if node_id != self.node_id and node_id in self.map.alive]
+
+    def monitor(self):
+        """Verifică periodic celelalte noduri; un nod care nu răspunde în failure_timeout
+        este considerat căzut, iar partițiile lui trec la următoarea replică"""
+        while True:
+            time.sleep(self.heartbeat_interval)
+            for node_id in self.map.nodes:
+                if node_id != self.node_id:
+                    self._check(node_id)
+
+    def _check(self, node_id):
+        try:
+            self.peer(node_id).request({'type': 'CLUSTER'}).result(timeout=self.failure_timeout)
+        except Exception:
+            if node_id in self.map.alive:
+                self.map.mark_dead(node_id)
+                if self.broker is not None:
+                    self.down_since.setdefault(node_id, self.broker.log.next_offset)
+                self.failovers += 1
+                logger.warning("Node %s is down; its partitions fail over to their replicas", node_id)
+            with self.lock:
+                client = self.peers.pop(node_id, None)
+            if client is not None:
+                client.close()
+            return
+        if node_id in self.map.alive:
+            return
+        since = self.down_since.get(node_id)
+        if since is None:
+            self.map.mark_alive(node_id)
+            logger.warning("Node %s is back; it leads its partitions again", node_id)
+            return
+        # Nu conduce din nou până nu are scrierile acceptate de replici cât timp a lipsit
+        logger.warning("Node %s is back; it follows until it has caught up", node_id)
+        self.broker.catch_up(node_id, since).add_done_callback(
+            lambda future: self._caught_up(node_id, future))
+
+    def _caught_up(self, node_id, future):
+        if future.exception() is not None:
+            # Reîncercat la următorul heartbeat reușit, de la același offset
+            logger.warning("Catch-up of node %s failed: %s", node_id, future.exception())
+            self.map.mark_dead(node_id)
+            return
+        if node_id in self.map.syncing:
+            self.down_since.pop(node_id, None)
+            self.map.mark_alive(node_id)
+            logger.warning("Node %s has caught up (%d records); it leads its partitions again",
+                           node_id, future.result())
+
+    def get_statistics(self):
+        return {
+            'node_id': self.node_id,
+            'alive': sorted(self.map.alive),
+            'syncing': sorted(self.map.syncing),
+            'failovers': self.failovers,
+            'nodes': len(self.map.nodes),
+            'partitions': self.map.partitions,
+            'owned_partitions': sum(1 for partition in range(self.map.partitions)
+                                    if self.map.leader(partition) == self.node_id),
+            'forwarded': dict(self.forwarded),
+        }
+
+
+# =============================================
+# Partea de client: conexiune directă la proprietar
+# =============================================
+class ClusterClient:
+    """Client care află harta partițiilor de la un nod și vorbește direct cu
+    nodul proprietar al fiecărui topic (aceeași interfață ca BrokerClient)"""
+
+    def __init__(self, host='localhost', port=9999, max_in_flight=64, timeout=10):
+        self.host = host
+        self.port = port
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.map = None
+        self.clients = {}
+
+    def connect(self):
+        seed = BrokerClient(self.host, self.port, self.max_in_flight, self.timeout).connect()
+        response = seed.request({'type': 'CLUSTER'}).result(timeout=self.timeout)
+        self.map = ClusterMap.from_dict(response['cluster'])
+        for node_id, (host, port) in self.map.nodes.items():
+            if node_id == response.get('node_id'):
+                self.clients[node_id] = seed
+            elif node_id in self.map.alive:
+                try:
+                    self.clients[node_id] = BrokerClient(host, port, self.max_in_flight, self.timeout).connect()
+                except OSError:
+                    self.map.mark_dead(node_id)
+        return self
+
+    @property
+    def closed(self):
+        return not self._live_clients()
+
+    def _live_clients(self):
+        """Conexiunile deschise; nodurile cu conexiunea pierdută sunt scoase din hartă"""
+        for node_id, client in list(self.clients.items()):
+            if client.closed:
+                self.map.mark_dead(node_id)
+                del self.clients[node_id]
+        return self.clients
+
+    def _client_for(self, node_id):
+        clients = self._live_clients()
+        if node_id in clients:
+            return clients[node_id]
+        if not clients:
+            raise ConnectionError("No cluster node is reachable")
+        # Mesajele fără topic valid sunt respinse de orice nod
+        return next(iter(clients.values()))
+
+    def publish(self, topic, content, format_type='text'):
+        self._live_clients()
+        return self._client_for(self.map.owner(topic)).publish(topic, content, format_type)
+
+    def publish_batch(self, messages):
+        """Împarte lotul pe noduri; Future-ul rezultat are 'ids' în ordinea lotului original"""
+        messages = list(messages)
+        self._live_clients()
+        parts = [(indexes, self._client_for(node_id).publish_batch([messages[i] for i in indexes]))
+                 for node_id, indexes in split_batch(self.map, messages).items()]
+        result = Future()
+        when_all((future for _, future in parts),
+                 lambda: result.set_result(merge_batch_responses(len(messages), parts)))
+        return result
+
+    def subscribe(self, topic, on_message, **options):
+        """Un topic concret este cerut doar proprietarului; un șablon, tuturor nodurilor"""
+        clients = self._live_clients()
+        if topic == 'all' or is_pattern(topic):
+            nodes = list(clients)
+        else:
+            nodes = [self.map.owner(topic)]
+        futures = [self._client_for(node_id).subscribe(topic, on_message, **options) for node_id in nodes]
+        result = Future()
+
+        def finish():
+            errors = [future.exception() for future in futures if future.exception() is not None]
+            if errors:
+                result.set_exception(errors[0])
+            else:
+                result.set_result(futures[0].result())
+        when_all(futures, finish)
+        return result
+
+    def close(self):
+        for client in self.clients.values():
+            client.close()
@@ -0,0 +1,234 @@
+import time
+import threading
+import itertools
+from collections import deque, OrderedDict
+
+from protocol import encode_frame, OP_MESSAGE
+from topic_trie import TopicTrie
+
+
+# =============================================
+# Grupuri de consumatori (competing consumers)
+# =============================================
+# Fiecare mesaj al unui grup ajunge la un singur membru. Membrul confirmă cu ACK;
+# la NACK sau dacă timpul de vizibilitate expiră, mesajul este livrat din nou.
+# prefetch limitează numărul de mesaje neconfirmate per membru (flow control).
+class _Delivery:
+    __slots__ = ('message', 'consumer', 'deadline', 'attempts')
+
+    def __init__(self, message, consumer, deadline, attempts):
+        self.message = message
+        self.consumer = consumer
+        self.deadline = deadline
+        self.attempts = attempts
+
+
+class ConsumerGroup:
+    def __init__(self, name, pattern, visibility_timeout=30, max_attempts=5, max_pending=100000):
+        self.name = name
+        self.pattern = pattern
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+
+        self.pending = deque()             # (mesaj, încercări anterioare)
+        self.in_flight = OrderedDict()     # delivery_tag -> _Delivery
+        self.members = OrderedDict()       # consumer -> [prefetch, neconfirmate]
+
+        self.delivered = 0
+        self.acked = 0
+        self.redelivered = 0
+        self.dead_lettered = 0
+        self.dropped = 0
+
+    def join(self, consumer, prefetch):
+        self.members[consumer] = [max(1, prefetch), 0]
+
+    def leave(self, consumer):
+        """Scoate membrul și repune în coadă mesajele lui neconfirmate"""
+        if self.members.pop(consumer, None) is None:
+            return []
+        tags = [tag for tag, delivery in self.in_flight.items() if delivery.consumer is consumer]
+        for tag in tags:
+            delivery = self.in_flight.pop(tag)
+            self._requeue(delivery.message, delivery.attempts)
+        return tags
+
+    def enqueue(self, message):
+        if len(self.pending) >= self.max_pending:
+            self.pending.popleft()
+            self.dropped += 1
+        self.pending.append((message, 0))
+
+    def _requeue(self, message, attempts):
+        if attempts >= self.max_attempts:
+            self.dead_lettered += 1
+            return
+        self.pending.appendleft((message, attempts))
+        self.redelivered += 1
+
+    def _next_member(self):
+        """Următorul membru (round-robin) care mai are loc în fereastra de prefetch"""
+        for _ in range(len(self.members)):
+            consumer, state = next(iter(self.members.items()))
+            self.members.move_to_end(consumer)
+            if state[1] < state[0]:
+                return consumer, state
+        return None, None
+
+    def dispatch(self, next_tag, now, on_delivered, on_released):
+        """Distribuie mesajele în așteptare; returnează membrii care nu au mai putut primi.
+
+        Un membru eliminat pierde și livrările neconfirmate: sunt repuse imediat în coadă
+        (on_released pentru fiecare tag), fără a aștepta timpul de vizibilitate."""
+        failed = []
+        while self.pending:
+            consumer, state = self._next_member()
+            if consumer is None:
+                break
+            message, attempts = self.pending.popleft()
+            tag = next_tag()
+            payload = dict(message.to_dict(), group=self.name, delivery_tag=tag, redelivered=attempts > 0)
+            if not consumer.deliver(encode_frame(OP_MESSAGE, payload)):
+                self.pending.appendleft((message, attempts))
+                for released in self.leave(consumer):
+                    on_released(released)
+                failed.append(consumer)
+                continue
+            state[1] += 1
+            self.in_flight[tag] = _Delivery(message, consumer, now + self.visibility_timeout, attempts + 1)
+            self.delivered += 1
+            on_delivered(tag)
+        return failed
+
+    def settle(self, consumer, tag, ack=True, requeue=True):
+        delivery = self.in_flight.get(tag)
+        if delivery is None or delivery.consumer is not consumer:
+            return False
+        del self.in_flight[tag]
+        state = self.members.get(consumer)
+        if state is not None:
+            state[1] -= 1
+        if ack:
+            self.acked += 1
+        elif requeue:
+            self._requeue(delivery.message, delivery.attempts)
+        else:
+            self.dead_lettered += 1
+        return True
+
+    def expire(self, now):
+        """Repune în coadă livrările al căror timp de vizibilitate a expirat"""
+        # Livrările sunt în ordinea termenelor (același timeout pentru tot grupul)
+        expired = []
+        for tag, delivery in self.in_flight.items():
+            if delivery.deadline > now:
+                break
+            expired.append(tag)
+        for tag in expired:
+            delivery = self.in_flight.pop(tag)
+            state = self.members.get(delivery.consumer)
+            if state is not None:
+                state[1] -= 1
+            self._requeue(delivery.message, delivery.attempts)
+        return expired
+
+    def get_statistics(self):
+        return {
+            'pattern': self.pattern,
+            'members': len(self.members),
+            'pending': len(self.pending),
+            'in_flight': len(self.in_flight),
+            'delivered': self.delivered,
+            'acked': self.acked,
+            'redelivered': self.redelivered,
+            'dead_lettered': self.dead_lettered,
+            'dropped': self.dropped,
+        }
+
+
+class ConsumerGroupManager:
+    def __init__(self, visibility_timeout=30, max_attempts=5):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.groups = {}
+        self.index = TopicTrie()
+        self.tags = {}               # delivery_tag -> grup
+        self.lock = threading.Lock()
+        self._counter = itertools.count(1)
+
+    def _next_tag(self):
+        return next(self._counter)
+
+    def join(self, name, pattern, consumer, prefetch=10):
+        failed = []
+        with self.lock:
+            key = (name, pattern)
+            group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = ConsumerGroup(name, pattern, self.visibility_timeout, self.max_attempts)
+                self.index.add(pattern, group)
+            group.join(consumer, prefetch)
+            failed += self._dispatch(group)
+        return failed
+
+    def leave(self, consumer):
+        failed = []
+        with self.lock:
+            for group in self.groups.values():
+                for tag in group.leave(consumer):
+                    self.tags.pop(tag, None)
+                failed += self._dispatch(group)
+        return failed
+
+    def publish(self, topics, message):
+        """Pune mesajul (MessageRecord) în coada fiecărui grup abonat la unul din topic-uri"""
+        failed = []
+        with self.lock:
+            groups = set()
+            for topic in topics:
+                groups |= self.index.match(topic)
+            for group in groups:
+                group.enqueue(message)
+                failed += self._dispatch(group)
+        return failed
+
+    def _dispatch(self, group):
+        def register(tag):
+            self.tags[tag] = group
+
+        def release(tag):
+            self.tags.pop(tag, None)
+        return group.dispatch(self._next_tag, time.monotonic(), register, release)
+
+    def settle(self, consumer, tags, ack=True, requeue=True):
+        """Confirmă (ACK) sau respinge (NACK) livrări; returnează numărul de tag-uri valide"""
+        settled = 0
+        failed = []
+        with self.lock:
+            touched = set()
+            for tag in tags:
+                group = self.tags.get(tag)
+                if group is not None and group.settle(consumer, tag, ack, requeue):
+                    del self.tags[tag]
+                    touched.add(group)
+                    settled += 1
+            for group in touched:
+                failed += self._dispatch(group)
+        return settled, failed
+
+    def expire(self):
+        failed = []
+        now = time.monotonic()
+        with self.lock:
+            for group in self.groups.values():
+                expired = group.expire(now)
+                for tag in expired:
+                    self.tags.pop(tag, None)
+                if expired:
+                    failed += self._dispatch(group)
+        return failed
+
+    def get_statistics(self):
+        with self.lock:
+            return {f"{name}:{pattern}": group.get_statistics() for (name, pattern), group in self.groups.items()}
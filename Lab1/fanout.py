@@ -0,0 +1,118 @@
+import threading
+from collections import deque
+
+
+# =============================================
+# Cozi de ieșire mărginite pentru fiecare subscriber
+# =============================================
+DROP_OLDEST = 'drop-oldest'
+DROP_NEWEST = 'drop-newest'
+DISCONNECT = 'disconnect'
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, DISCONNECT)
+
+
+class SubscriberQueue:
+    """Coadă de cadre de ieșire cu limită de dimensiune și politică de depășire"""
+
+    def __init__(self, max_size=1024, policy=DROP_OLDEST, batch_size=64, on_ready=None):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.max_size = max_size
+        self.policy = policy
+        self.batch_size = batch_size
+        self.on_ready = on_ready
+
+        self.frames = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def offer(self, frame):
+        """Adaugă un cadru fără a bloca; returnează False dacă subscriber-ul trebuie deconectat"""
+        with self.condition:
+            if self.closed:
+                return False
+            if len(self.frames) >= self.max_size:
+                if self.policy == DISCONNECT:
+                    self.dropped += 1
+                    return False
+                self.dropped += 1
+                if self.policy == DROP_NEWEST:
+                    return True
+                self.frames.popleft()
+
+            was_empty = not self.frames
+            self.frames.append(frame)
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, len(self.frames))
+            self.condition.notify()
+
+        if was_empty and self.on_ready:
+            self.on_ready()
+        return True
+
+    def take_batch(self, timeout=None):
+        """Așteaptă cadre și returnează cel mult batch_size (listă goală la închidere)"""
+        with self.condition:
+            while not self.frames and not self.closed:
+                if not self.condition.wait(timeout):
+                    return []
+            return self._pop_batch()
+
+    def poll_batch(self):
+        """Returnează imediat cadrele disponibile (cel mult batch_size)"""
+        with self.condition:
+            return self._pop_batch()
+
+    def _pop_batch(self):
+        count = min(self.batch_size, len(self.frames))
+        batch = [self.frames.popleft() for _ in range(count)]
+        self.sent += count
+        return batch
+
+    @property
+    def depth(self):
+        return len(self.frames)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.frames.clear()
+            self.condition.notify_all()
+
+    def get_statistics(self):
+        return {
+            'depth': len(self.frames),
+            'max_depth': self.max_depth,
+            'enqueued': self.enqueued,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'policy': self.policy,
+        }
+
+
+class ThreadedWriter(threading.Thread):
+    """Fir care golește coada unui subscriber, scriind cadrele în loturi"""
+
+    def __init__(self, queue, write, on_error=None):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.write = write
+        self.on_error = on_error
+
+    def run(self):
+        while True:
+            batch = self.queue.take_batch()
+            if not batch:
+                return
+            try:
+                self.write(b''.join(batch))
+            except OSError:
+                self.queue.close()
+                if self.on_error:
+                    self.on_error()
+                return
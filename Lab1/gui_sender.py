@@ -1,13 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import socket
-import pickle
-import json
-import xml.etree.ElementTree as ET
 from datetime import datetime
-import random
 import threading
 
+from protocol import encode_message
+from sender import BrokerClient, generate_random_message
+
 
 class MessageSenderGUI:
     def __init__(self, root):
@@ -18,6 +17,8 @@ class MessageSenderGUI:
         self.server_host = 'localhost'
         self.tcp_port = 9999
         self.udp_port = 8888
+        self.client = None
+        self.client_lock = threading.Lock()
 
         self.setup_gui()
 
@@ -89,42 +90,7 @@ class MessageSenderGUI:
 
     def generate_random_message(self):
         """Generează un mesaj random în formatul selectat"""
-        format_type = self.format_var.get()
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        if format_type == "json":
-            random_data = {
-                "message_id": random.randint(1000, 9999),
-                "timestamp": timestamp,
-                "priority": random.choice(["low", "medium", "high", "critical"]),
-                "source": random.choice(["sensor_1", "sensor_2", "server", "client"]),
-                "value": round(random.uniform(0, 100), 2),
-                "status": random.choice(["active", "inactive", "warning", "error"]),
-                "description": f"Mesaj de test generat automat la {timestamp}"
-            }
-            content = json.dumps(random_data, indent=2, ensure_ascii=False)
-
-        else:  # XML - structură conformă cu schema XSD
-            # Creăm un ID pentru mesaj
-            message_id = str(random.randint(1000, 9999))
-
-            # Creăm conținutul ca JSON string care va fi pus în elementul <content>
-            content_data = {
-                "priority": random.choice(["low", "medium", "high"]),
-                "source": random.choice(["sensor_A", "sensor_B", "main_server"]),
-                "value": round(random.uniform(0, 100), 2),
-                "status": random.choice(["ok", "warning", "error"]),
-                "description": f"Mesaj XML generat la {timestamp}"
-            }
-
-            # Creăm structura XML conform schemei XSD
-            root = ET.Element("message")
-            ET.SubElement(root, "id").text = message_id
-            ET.SubElement(root, "topic").text = self.topic_var.get()
-            ET.SubElement(root, "timestamp").text = timestamp
-            ET.SubElement(root, "content").text = json.dumps(content_data)
-
-            content = ET.tostring(root, encoding='unicode')
+        content = generate_random_message(self.format_var.get(), self.topic_var.get())
 
         # Curăță și inserează noul conținut
         self.message_text.delete(1.0, tk.END)
@@ -144,17 +110,26 @@ class MessageSenderGUI:
         """Trimite mesajul pe TCP"""
         threading.Thread(target=self._send_tcp_thread, daemon=True).start()
 
-    def _send_tcp_thread(self):
-        try:
-            message_data = self.get_message_data()
+    def get_client(self):
+        """Conexiunea TCP persistentă, refolosită între trimiteri"""
+        with self.client_lock:
+            if self.client is None or self.client.closed:
+                self.client = BrokerClient(self.server_host, self.tcp_port, timeout=5).connect()
+            return self.client
 
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                sock.connect((self.server_host, self.tcp_port))
-                sock.send(pickle.dumps(message_data))
-                response = sock.recv(1024)
-                response_data = pickle.loads(response)
+    def _publish_tcp(self, message_data):
+        try:
+            return self.get_client().request(message_data).result(timeout=5)
+        except Exception:
+            # Conexiunea s-a pierdut: o închidem, următoarea trimitere se reconectează
+            if self.client is not None:
+                self.client.close()
+            raise
 
-                self.status_var.set(f"✅ TCP: {response_data.get('status', 'OK')}")
+    def _send_tcp_thread(self):
+        try:
+            response_data = self._publish_tcp(self.get_message_data())
+            self.status_var.set(f"✅ TCP: {response_data.get('status', 'OK')}")
 
         except Exception as e:
             self.status_var.set(f"❌ Eroare TCP: {str(e)}")
@@ -169,7 +144,7 @@ class MessageSenderGUI:
 
             with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
                 sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-                sock.sendto(pickle.dumps(message_data), ('<broadcast>', self.udp_port))
+                sock.sendto(encode_message(message_data), ('<broadcast>', self.udp_port))
 
             self.status_var.set("✅ Mesaj UDP Broadcast trimis!")
 
@@ -188,12 +163,7 @@ class MessageSenderGUI:
             # TCP
             tcp_success = False
             try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                    sock.settimeout(5)
-                    sock.connect((self.server_host, self.tcp_port))
-                    sock.send(pickle.dumps(message_data))
-                    response = sock.recv(1024)
-                    tcp_success = True
+                tcp_success = self._publish_tcp(message_data).get('status') == 'OK'
             except:
                 tcp_success = False
 
@@ -203,7 +173,7 @@ class MessageSenderGUI:
                 with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
                     sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
                     sock.settimeout(5)
-                    sock.sendto(pickle.dumps(message_data), ('<broadcast>', self.udp_port))
+                    sock.sendto(encode_message(message_data), ('<broadcast>', self.udp_port))
                     udp_success = True
             except:
                 udp_success = False
@@ -0,0 +1,83 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+# =============================================
+# Generator de ID-uri pe 64 de biți (stil Snowflake)
+# =============================================
+# | 41 biți: milisecunde de la EPOCH_MS | 10 biți: node id | 12 biți: secvență |
+# ID-urile sunt monotone crescătoare pe un nod și sortabile după timp.
+EPOCH_MS = 1704067200000  # 2024-01-01 00:00:00 UTC
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODE_ID = (1 << NODE_BITS) - 1
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+
+
+class SnowflakeIdGenerator:
+    def __init__(self, node_id=0):
+        if not 0 <= node_id <= MAX_NODE_ID:
+            raise ValueError(f"node_id must be between 0 and {MAX_NODE_ID}")
+        self.node_id = node_id
+        self.lock = threading.Lock()
+        self.last_ms = -1
+        self.sequence = 0
+
+    def next_id(self):
+        with self.lock:
+            now = int(time.time() * 1000) - EPOCH_MS
+            # Dacă ceasul sare înapoi, continuăm de la ultima milisecundă folosită
+            if now <= self.last_ms:
+                now = self.last_ms
+                self.sequence = (self.sequence + 1) & SEQUENCE_MASK
+                if self.sequence == 0:
+                    now += 1
+            else:
+                self.sequence = 0
+            self.last_ms = now
+            return (now << (NODE_BITS + SEQUENCE_BITS)) | (self.node_id << SEQUENCE_BITS) | self.sequence
+
+
+def id_timestamp(msg_id):
+    """Momentul (secunde epoch) codificat într-un ID"""
+    return ((msg_id >> (NODE_BITS + SEQUENCE_BITS)) + EPOCH_MS) / 1000.0
+
+
+def id_node(msg_id):
+    return (msg_id >> SEQUENCE_BITS) & MAX_NODE_ID
+
+
+# =============================================
+# Deduplicare pe o fereastră glisantă
+# =============================================
+class Deduplicator:
+    """Reține amprentele mesajelor recente (hash necriptografic) și ID-ul primit de fiecare"""
+
+    def __init__(self, window_seconds=60, max_entries=100000):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.duplicates = 0
+
+    @staticmethod
+    def fingerprint(topic, format_type, content):
+        return hash((topic, format_type, content))
+
+    def check_and_add(self, fingerprint, msg_id, now=None):
+        """Returnează ID-ul mesajului identic din fereastră sau None (și reține msg_id)"""
+        now = time.time() if now is None else now
+        with self.lock:
+            while self.entries:
+                _, (seen_at, _) = next(iter(self.entries.items()))
+                if now - seen_at <= self.window_seconds and len(self.entries) < self.max_entries:
+                    break
+                self.entries.popitem(last=False)
+
+            existing = self.entries.get(fingerprint)
+            if existing is not None:
+                self.duplicates += 1
+                return existing[1]
+            self.entries[fingerprint] = (now, msg_id)
+            return None
@@ -0,0 +1,178 @@
+import sys
+import json
+import queue
+import bisect
+import logging
+import threading
+import itertools
+import logging.handlers
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# =============================================
+# Logging asincron (prin coadă) și eșantionat
+# =============================================
+LOGGER_NAME = 'broker'
+logger = logging.getLogger(LOGGER_NAME)
+
+
+def setup_logging(level=logging.INFO, stream=None):
+    """Handler-ul logger-ului doar pune înregistrările într-o coadă; scrierea în consolă
+    se face pe un fir separat, deci un terminal lent nu blochează broker-ul.
+    Returnează QueueListener-ul (apelați stop() la oprire)."""
+    log_queue = queue.SimpleQueue()
+    console = logging.StreamHandler(stream or sys.stdout)
+    console.setFormatter(logging.Formatter('%(asctime)s %(levelname)-7s %(message)s', '%H:%M:%S'))
+
+    listener = logging.handlers.QueueListener(log_queue, console, respect_handler_level=True)
+    logger.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    logger.setLevel(level)
+    logger.propagate = False
+    listener.start()
+    return listener
+
+
+class Sampler:
+    """Lasă să treacă un eveniment din `every` (1 = toate); pentru loguri per mesaj"""
+
+    def __init__(self, every=100):
+        self.every = max(1, every)
+        self._counter = itertools.count()
+
+    def __call__(self):
+        return next(self._counter) % self.every == 0
+
+
+_message_sampler = Sampler()
+
+
+def set_debug_sampling(every):
+    global _message_sampler
+    _message_sampler = Sampler(every)
+
+
+def debug_sampled(msg, *args):
+    """Log DEBUG per mesaj: verificarea nivelului e prima, deci costul e neglijabil când e dezactivat"""
+    if logger.isEnabledFor(logging.DEBUG) and _message_sampler():
+        logger.debug(msg, *args)
+
+
+# =============================================
+# Contoare și histograme
+# =============================================
+class Counter:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+# Limitele găleților în microsecunde (aproximativ logaritmice)
+DEFAULT_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 1000000)
+
+
+class Histogram:
+    """Histogramă cu găleți fixe; percentilele sunt estimate la limita superioară a găleții"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+
+    def percentile(self, fraction):
+        with self.lock:
+            if not self.count:
+                return None
+            target = fraction * self.count
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= target:
+                    return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return None
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 2) if self.count else None,
+            'p50': self.percentile(0.50),
+            'p99': self.percentile(0.99),
+            'p999': self.percentile(0.999),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def counter(self, name):
+        metric = self.counters.get(name)
+        if metric is None:
+            with self.lock:
+                metric = self.counters.setdefault(name, Counter())
+        return metric
+
+    def histogram(self, name, buckets=DEFAULT_BUCKETS):
+        metric = self.histograms.get(name)
+        if metric is None:
+            with self.lock:
+                metric = self.histograms.setdefault(name, Histogram(buckets))
+        return metric
+
+    def snapshot(self):
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = dict(self.histograms)
+        return {
+            'counters': {name: counter.value for name, counter in sorted(counters.items())},
+            'histograms': {name: histogram.snapshot() for name, histogram in sorted(histograms.items())},
+        }
+
+
+METRICS = MetricsRegistry()
+
+
+# =============================================
+# Endpoint HTTP pentru statistici
+# =============================================
+class StatsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/stats':
+            body = json.dumps(self.server.stats_provider(), indent=2, default=str).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        # Fără log per cerere
+        return
+
+
+def start_stats_server(stats_provider, host='localhost', port=9998):
+    """Pornește serverul HTTP /stats pe un fir separat"""
+    httpd = ThreadingHTTPServer((host, port), StatsHandler)
+    httpd.daemon_threads = True
+    httpd.stats_provider = stats_provider
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
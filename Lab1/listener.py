@@ -1,16 +1,26 @@
+import os
+import sys
+import time
 import socket
+import argparse
 import threading
-import pickle
 import json
 import xml.etree.ElementTree as ET
 from datetime import datetime
 
+from protocol import (FrameDecoder, encode_message, decode_datagram, message_from_frame,
+                      OP_MESSAGE, OP_PUBLISH, OP_RESPONSE)
+from topic_trie import topic_matches, MULTI_LEVEL
+
 
 class MessageListener:
-    def __init__(self, host='localhost', tcp_port=9999, udp_port=8888):
+    def __init__(self, host='localhost', tcp_port=9999, udp_port=8888, topic='all', group=None, prefetch=10):
         self.host = host
         self.tcp_port = tcp_port
         self.udp_port = udp_port
+        self.topic = topic
+        self.group = group
+        self.prefetch = prefetch
         self.running = True
 
     def start_tcp_listener(self):
@@ -19,20 +29,32 @@ class MessageListener:
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.connect((self.host, self.tcp_port))
 
-            # Subscribe to all topics
-            sock.send(pickle.dumps({
+            # Subscribe (implicit la toate topic-urile); într-un grup, mesajele sunt
+            # împărțite între toți listener-ii cu același nume de grup
+            subscribe = {
                 'type': 'SUBSCRIBE',
-                'topic': 'all'
-            }))
+                'topic': self.topic
+            }
+            if self.group:
+                subscribe.update(group=self.group, prefetch=self.prefetch)
+            sock.sendall(encode_message(subscribe))
+            decoder = FrameDecoder()
 
             print(f"👂 Listener TCP pornit pe {self.host}:{self.tcp_port}")
 
             while self.running:
                 try:
-                    data = sock.recv(4096)
-                    if data:
-                        message = pickle.loads(data)
-                        self.display_message(message, "TCP")
+                    data = sock.recv(65536)
+                    if not data:
+                        break
+                    for opcode, payload in decoder.feed(data):
+                        if opcode == OP_MESSAGE:
+                            self.display_message(payload, "TCP")
+                            if 'delivery_tag' in payload:
+                                sock.sendall(encode_message({'type': 'ACK',
+                                                             'delivery_tag': payload['delivery_tag']}))
+                        elif opcode == OP_RESPONSE:
+                            print(f"ℹ️  Răspuns server: {payload.get('status')}")
                 except (EOFError, ConnectionResetError):
                     break
 
@@ -51,10 +73,11 @@ class MessageListener:
 
             while self.running:
                 try:
-                    data, addr = sock.recvfrom(4096)
+                    data, addr = sock.recvfrom(65535)
                     if data:
-                        message = pickle.loads(data)
-                        self.display_message(message, "UDP Broadcast")
+                        opcode, payload = decode_datagram(data)
+                        if opcode == OP_PUBLISH:
+                            self.display_message(message_from_frame(opcode, payload), "UDP Broadcast")
                 except Exception as e:
                     print(f"Eroare recepție UDP: {e}")
 
@@ -110,6 +133,193 @@ class MessageListener:
             print("\n🛑 Listener-e oprite")
 
 
+# =============================================
+# Consumator rapid: fără afișare detaliată, cu reluare de la offset
+# =============================================
+class StreamingListener:
+    """Primește mesajele în codificarea compactă și le scrie în loturi (stdout sau fișier).
+
+    Ultimul offset primit este salvat în offset_file; după o reconectare (sau o
+    repornire) subscrierea continuă de la offset-ul următor, din retenția broker-ului.
+    Periodic cere statisticile broker-ului și raportează întârzierea (lag) față de el."""
+
+    def __init__(self, host='localhost', tcp_port=9999, topic='all', output=None, offset_file=None,
+                 from_offset=None, flush_every=1000, flush_interval=0.2, stats_interval=1.0):
+        self.host = host
+        self.tcp_port = tcp_port
+        self.topic = topic
+        self.pattern = MULTI_LEVEL if topic == 'all' else topic
+        self.output = output
+        self.offset_file = offset_file
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.stats_interval = stats_interval
+        self.running = True
+
+        self.last_offset = self._load_offset()
+        if self.last_offset is None and from_offset is not None:
+            self.last_offset = from_offset - 1
+        self.last_timestamp = None
+        self.lines = []
+        self.received = 0
+        self.reconnects = 0
+        self.broker_offset = None
+
+    def _load_offset(self):
+        if not self.offset_file:
+            return None
+        try:
+            with open(self.offset_file, encoding='utf-8') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _save_offset(self):
+        if self.offset_file and self.last_offset is not None:
+            with open(self.offset_file + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(str(self.last_offset))
+            os.replace(self.offset_file + '.tmp', self.offset_file)
+
+    def _handle(self, message):
+        offset = message.get('offset')
+        # După reconectare retenția poate retrimite mesaje deja scrise
+        if offset is not None and self.last_offset is not None and offset <= self.last_offset:
+            return
+        content = message.get('content', b'')
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        self.lines.append(b'%d\t%s\t%s\n' % (offset if offset is not None else -1,
+                                               message.get('topic', '').encode('utf-8'),
+                                               content.replace(b'\\', b'\\\\').replace(b'\n', b'\\n')))
+        self.received += 1
+        if offset is not None:
+            self.last_offset = offset
+        self.last_timestamp = message.get('timestamp')
+
+    def _flush(self, sink):
+        """Scrie liniile acumulate cu un singur apel write() și salvează offset-ul"""
+        if self.lines:
+            sink.write(b''.join(self.lines))
+            sink.flush()
+            self.lines.clear()
+            self._save_offset()
+
+    def _report(self, started, received_before):
+        elapsed = time.perf_counter() - started
+        rate = (self.received - received_before) / elapsed if elapsed else 0
+        lag_ms = (time.time() - self.last_timestamp) * 1000 if self.last_timestamp else None
+        lag_offsets = None
+        if self.broker_offset is not None and self.last_offset is not None:
+            lag_offsets = max(0, self.broker_offset - self.last_offset)
+            if lag_offsets == 0:
+                # La zi: vechimea ultimului mesaj nu mai înseamnă întârziere
+                lag_ms = 0.0
+        print(f"📊 {rate:,.0f} msg/s | primite {self.received} | offset {self.last_offset} | "
+              f"lag {lag_offsets if lag_offsets is not None else '?'} offset-uri, "
+              f"{f'{lag_ms:.0f} ms' if lag_ms is not None else '?'} | reconectări {self.reconnects}",
+              file=sys.stderr)
+
+    def _on_response(self, payload):
+        statistics = payload.get('statistics')
+        if statistics is None:
+            if payload.get('status') not in ('OK', 'SUBSCRIBED'):
+                print(f"❌ Răspuns server: {payload.get('message')}", file=sys.stderr)
+            return
+        # Ultimul offset scris de broker pe topic-urile subscrierii
+        offsets = [topic_stats['last_offset'] for topic, topic_stats in statistics.get('topics', {}).items()
+                   if topic_matches(self.pattern, topic)]
+        if offsets:
+            self.broker_offset = max(offsets)
+
+    def _consume(self, sock, sink):
+        subscribe = {'type': 'SUBSCRIBE', 'topic': self.topic, 'encoding': 'record'}
+        if self.last_offset is not None:
+            subscribe['from_offset'] = self.last_offset + 1
+        stats_seq = 0
+        sock.sendall(encode_message(subscribe) + encode_message({'type': 'STATS', 'seq': stats_seq}))
+        decoder = FrameDecoder()
+        flushed_at = reported_at = time.perf_counter()
+        reported = self.received
+        sock.settimeout(self.flush_interval)
+
+        while self.running:
+            try:
+                data = sock.recv(1024 * 1024)
+                if not data:
+                    raise ConnectionError("Connection closed by server")
+                for opcode, payload in decoder.feed(data):
+                    if opcode == OP_MESSAGE:
+                        self._handle(payload)
+                    elif opcode == OP_RESPONSE:
+                        self._on_response(payload)
+            except socket.timeout:
+                pass
+
+            now = time.perf_counter()
+            if len(self.lines) >= self.flush_every or now - flushed_at >= self.flush_interval:
+                self._flush(sink)
+                flushed_at = now
+            if now - reported_at >= self.stats_interval:
+                self._report(reported_at, reported)
+                reported_at, reported = now, self.received
+                stats_seq += 1
+                sock.sendall(encode_message({'type': 'STATS', 'seq': stats_seq}))
+
+    def run(self):
+        sink = open(self.output, 'ab') if self.output else sys.stdout.buffer
+        print(f"👂 Listener rapid pe {self.host}:{self.tcp_port}, topic {self.topic}, "
+              f"de la offset {self.last_offset + 1 if self.last_offset is not None else 'curent'}",
+              file=sys.stderr)
+        delay = 0.5
+        try:
+            while self.running:
+                try:
+                    with socket.create_connection((self.host, self.tcp_port), timeout=5) as sock:
+                        delay = 0.5
+                        self._consume(sock, sink)
+                except (OSError, ConnectionError) as e:
+                    self._flush(sink)
+                    self.reconnects += 1
+                    print(f"⚠️ Conexiune pierdută ({e}); reconectare în {delay:.1f}s de la offset "
+                          f"{self.last_offset}", file=sys.stderr)
+                    time.sleep(delay)
+                    delay = min(delay * 2, 10)
+        except KeyboardInterrupt:
+            self.running = False
+        finally:
+            self._flush(sink)
+            if self.output:
+                sink.close()
+            print("\n🛑 Listener oprit", file=sys.stderr)
+
+
 if __name__ == "__main__":
-    listener = MessageListener()
-    listener.start_listening()
+    parser = argparse.ArgumentParser(description="Message listener (TCP subscribe + UDP broadcast)")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--tcp-port', type=int, default=9999)
+    parser.add_argument('--udp-port', type=int, default=8888)
+    parser.add_argument('--topic', default='all', help="topic sau șablon (ex: sensors.#)")
+    parser.add_argument('--group', default=None, help="numele grupului de consumatori")
+    parser.add_argument('--prefetch', type=int, default=10,
+                        help="mesaje neconfirmate permise în grup")
+    parser.add_argument('--stream', action='store_true',
+                        help="mod rapid: fără afișare detaliată, ieșire în loturi, reluare de la offset")
+    parser.add_argument('--output', default=None,
+                        help="în modul --stream: fișierul în care se adaugă mesajele (implicit stdout)")
+    parser.add_argument('--offset-file', default=None,
+                        help="în modul --stream: fișierul în care se salvează ultimul offset primit")
+    parser.add_argument('--from-offset', type=int, default=None,
+                        help="în modul --stream: offset-ul de start, dacă nu există unul salvat")
+    parser.add_argument('--flush-every', type=int, default=1000,
+                        help="în modul --stream: mesaje acumulate înainte de o scriere")
+    args = parser.parse_args()
+
+    if args.stream:
+        if args.group:
+            parser.error("--stream cannot be combined with --group")
+        StreamingListener(args.host, args.tcp_port, args.topic, args.output, args.offset_file,
+                          args.from_offset, args.flush_every).run()
+    else:
+        listener = MessageListener(args.host, args.tcp_port, args.udp_port, args.topic, args.group,
+                                   args.prefetch)
+        listener.start_listening()
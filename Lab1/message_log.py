@@ -0,0 +1,441 @@
+import os
+import json
+import mmap
+import time
+import struct
+import zlib
+import bisect
+import threading
+from concurrent.futures import Future
+
+from instrumentation import logger
+
+
+# =============================================
+# Jurnal segmentat append-only pentru mesaje
+# =============================================
+# Fiecare înregistrare: [lungime payload (4B)][crc32 payload (4B)][payload]
+# Payload-ul este produs de codec-ul jurnalului (implicit JSON; broker-ul folosește
+# codec-ul compact din record.py).
+# Fiecare segment are un index dens: pentru offset-ul relativ i, la poziția
+# i * 8 din fișierul .index se află (offset relativ, poziție în .log).
+RECORD_HEADER = struct.Struct('>II')
+INDEX_ENTRY = struct.Struct('>II')
+
+LOG_SUFFIX = '.log'
+INDEX_SUFFIX = '.index'
+
+# Politici fsync: când este considerată durabilă o înregistrare
+FSYNC_NONE = 'none'          # scrisă în cache-ul sistemului de operare (la fiecare group commit)
+FSYNC_BATCH = 'batch'        # un fsync per group commit
+FSYNC_MESSAGE = 'message'    # un fsync per mesaj, fără grupare
+FSYNC_POLICIES = (FSYNC_NONE, FSYNC_BATCH, FSYNC_MESSAGE)
+
+
+def _file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+class LogSegment:
+    """Un segment al jurnalului: fișierul de date și indexul de offset-uri.
+
+    Doar segmentul activ ține fișierele deschise pentru scriere; citirile deschid
+    fișierele read-only la nevoie, deci segmentele închise nu consumă descriptori."""
+
+    def __init__(self, directory, base_offset, writable=True):
+        self.base_offset = base_offset
+        name = f"{base_offset:020d}"
+        self.log_path = os.path.join(directory, name + LOG_SUFFIX)
+        self.index_path = os.path.join(directory, name + INDEX_SUFFIX)
+
+        self.log_file = None
+        self.index_file = None
+        if writable:
+            self.log_file = open(self.log_path, 'ab')
+            self.index_file = open(self.index_path, 'ab')
+        self.size = _file_size(self.log_path)
+        self.count = _file_size(self.index_path) // INDEX_ENTRY.size
+
+    @property
+    def next_offset(self):
+        return self.base_offset + self.count
+
+    def append(self, payload):
+        """Scrie o înregistrare la sfârșitul segmentului și returnează offset-ul ei"""
+        position = self.size
+        self.log_file.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)))
+        self.log_file.write(payload)
+        self.index_file.write(INDEX_ENTRY.pack(self.count, position))
+
+        offset = self.next_offset
+        self.size += RECORD_HEADER.size + len(payload)
+        self.count += 1
+        return offset
+
+    def flush(self):
+        if self.log_file is not None:
+            self.log_file.flush()
+            self.index_file.flush()
+
+    def sync(self):
+        """Forțează scrierea pe disc a datelor deja golite din buffer"""
+        log_file, index_file = self.log_file, self.index_file
+        if log_file is None:
+            return  # închis: sincronizat la închidere, dacă politica o cere
+        try:
+            os.fsync(log_file.fileno())
+            os.fsync(index_file.fileno())
+        except ValueError:
+            # Segmentul a fost rotit (și închis) în timpul fsync-ului din afara lacătului
+            if not log_file.closed:
+                raise
+
+    def position_of(self, offset):
+        """Caută în index poziția unui offset din acest segment"""
+        relative = offset - self.base_offset
+        with open(self.index_path, 'rb') as f:
+            f.seek(relative * INDEX_ENTRY.size)
+            entry = f.read(INDEX_ENTRY.size)
+        if len(entry) < INDEX_ENTRY.size:
+            return None
+        return INDEX_ENTRY.unpack(entry)[1]
+
+    def read_from(self, position):
+        """Generator peste payload-urile segmentului, începând de la o poziție.
+
+        Fișierul este mapat în memorie (mmap), deci o scanare completă nu face un
+        apel read() per înregistrare; se oprește la prima înregistrare incompletă sau coruptă."""
+        with open(self.log_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if position >= size:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                while position + RECORD_HEADER.size <= size:
+                    length, crc = RECORD_HEADER.unpack_from(data, position)
+                    start = position + RECORD_HEADER.size
+                    end = start + length
+                    if end > size:
+                        return
+                    payload = data[start:end]
+                    if zlib.crc32(payload) != crc:
+                        return
+                    yield payload
+                    position = end
+
+    def _index_entries_reversed(self):
+        with open(self.index_path, 'rb') as f:
+            for relative in range(self.count - 1, -1, -1):
+                f.seek(relative * INDEX_ENTRY.size)
+                yield INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))
+
+    def recover(self):
+        """Repară finalul segmentului după o oprire bruscă.
+
+        Pornește de la ultima intrare din index care indică o înregistrare întreagă,
+        reindexează înregistrările valide scrise după ea și trunchiază restul (înregistrarea
+        ruptă de la final). Returnează numărul de octeți eliminați din .log."""
+        self.flush()
+        size = os.path.getsize(self.log_path)
+        start, position = 0, 0
+        for relative, candidate in self._index_entries_reversed():
+            if candidate < size and next(self.read_from(candidate), None) is not None:
+                start, position = relative, candidate
+                break
+
+        positions = []
+        end = position
+        for payload in self.read_from(position):
+            positions.append(end)
+            end += RECORD_HEADER.size + len(payload)
+
+        count = start + len(positions)
+        index_size = os.path.getsize(self.index_path)
+        if end == size and count == self.count and index_size == count * INDEX_ENTRY.size:
+            return 0
+
+        self.log_file.truncate(end)
+        self.index_file.truncate(start * INDEX_ENTRY.size)
+        for i, record_position in enumerate(positions):
+            self.index_file.write(INDEX_ENTRY.pack(start + i, record_position))
+        self.flush()
+        self.size = end
+        self.count = count
+        return size - end
+
+    def close(self, sync=False):
+        """Închide fișierele de scriere; segmentul rămâne disponibil pentru citire"""
+        if self.log_file is None:
+            return
+        self.flush()
+        if sync:
+            self.sync()
+        self.log_file.close()
+        self.index_file.close()
+        self.log_file = None
+        self.index_file = None
+
+
+class JSONCodec:
+    """Codec implicit: înregistrarea este un dict serializat JSON"""
+
+    @staticmethod
+    def encode(record):
+        return json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    @staticmethod
+    def decode(payload):
+        return json.loads(payload)
+
+
+def _completed(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class SegmentedLog:
+    """Jurnal append-only împărțit în segmente care se rotesc după dimensiune.
+
+    Scrierile sunt grupate (group commit): submit() pune înregistrarea în bufferul
+    segmentului și returnează un Future care se rezolvă când firul de scriere a golit
+    lotul (și a făcut fsync, după politică). Un lot se închide după commit_interval
+    secunde de la prima înregistrare sau când depășește commit_bytes."""
+
+    def __init__(self, directory='data', segment_bytes=64 * 1024 * 1024, fsync_policy=FSYNC_NONE,
+                 commit_interval=0.002, commit_bytes=1024 * 1024, codec=None):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_policy = fsync_policy
+        self.commit_interval = commit_interval
+        self.commit_bytes = commit_bytes
+        self.codec = codec or JSONCodec()
+        self.lock = threading.Lock()
+        self.commit_ready = threading.Condition(self.lock)
+
+        os.makedirs(directory, exist_ok=True)
+        bases = self._existing_bases() or [0]
+        self.segments = [LogSegment(directory, base, writable=base == bases[-1]) for base in bases]
+        self.active = self.segments[-1]
+        # Doar ultimul segment poate avea o înregistrare ruptă (cele anterioare au fost închise)
+        self.truncated_bytes = self.active.recover()
+
+        # Starea group commit (protejată de self.lock)
+        self.waiting = []             # (offset, Future) care așteaptă punctul de durabilitate
+        self.waiting_bytes = 0
+        self.batch_started = None
+        self.dirty = set()            # segmente scrise de la ultimul commit
+        self.closed = False
+        self.commits = 0
+        self.committed = 0
+        self.fsyncs = 0
+
+        self.writer = None
+        if fsync_policy != FSYNC_MESSAGE:
+            self.writer = threading.Thread(target=self._commit_loop, name='log-writer', daemon=True)
+            self.writer.start()
+
+    def _existing_bases(self):
+        bases = []
+        for name in os.listdir(self.directory):
+            if name.endswith(LOG_SUFFIX):
+                try:
+                    bases.append(int(name[:-len(LOG_SUFFIX)]))
+                except ValueError:
+                    continue
+        return sorted(bases)
+
+    @property
+    def next_offset(self):
+        return self.active.next_offset
+
+    def submit(self, record):
+        """Adaugă o înregistrare fără a aștepta scrierea pe disc.
+
+        Returnează (offset, Future); Future-ul primește offset-ul la punctul de durabilitate."""
+        payload = self.codec.encode(record)
+        with self.lock:
+            if self.closed:
+                raise ValueError("Log is closed")
+            if self.active.size >= self.segment_bytes:
+                self._roll()
+            offset = self.active.append(payload)
+
+            if self.fsync_policy == FSYNC_MESSAGE:
+                self.active.flush()
+                self.active.sync()
+                self.fsyncs += 1
+                self.commits += 1
+                self.committed += 1
+                return offset, _completed(offset)
+
+            ticket = Future()
+            self.waiting.append((offset, ticket))
+            self.waiting_bytes += len(payload)
+            self.dirty.add(self.active)
+            if self.batch_started is None:
+                self.batch_started = time.monotonic()
+                self.commit_ready.notify()
+            elif self.waiting_bytes >= self.commit_bytes:
+                self.commit_ready.notify()
+        return offset, ticket
+
+    def append(self, record):
+        """Adaugă o înregistrare și așteaptă punctul de durabilitate; returnează offset-ul"""
+        offset, ticket = self.submit(record)
+        ticket.result()
+        return offset
+
+    def _commit_loop(self):
+        """Firul de scriere: golește loturile de înregistrări și rezolvă Future-urile lor"""
+        while True:
+            with self.lock:
+                while not self.waiting and not self.closed:
+                    self.commit_ready.wait()
+                if not self.waiting:
+                    return
+                # Fereastra lotului: până la commit_interval de la prima înregistrare
+                while not self.closed and self.waiting_bytes < self.commit_bytes:
+                    remaining = self.batch_started + self.commit_interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.commit_ready.wait(remaining)
+
+                batch, self.waiting = self.waiting, []
+                segments, self.dirty = self.dirty, set()
+                self.waiting_bytes = 0
+                self.batch_started = None
+                error = None
+                try:
+                    for segment in segments:
+                        segment.flush()
+                except (OSError, ValueError) as e:
+                    error = e
+
+            # fsync în afara lacătului: între timp se pot adăuga înregistrări noi
+            if error is None and self.fsync_policy == FSYNC_BATCH:
+                try:
+                    for segment in segments:
+                        segment.sync()
+                except (OSError, ValueError) as e:
+                    error = e
+                self.fsyncs += 1
+
+            self.commits += 1
+            self.committed += len(batch)
+            for offset, ticket in batch:
+                if error is None:
+                    ticket.set_result(offset)
+                else:
+                    ticket.set_exception(error)
+
+    def get_statistics(self):
+        return {
+            'fsync_policy': self.fsync_policy,
+            'next_offset': self.next_offset,
+            'segments': len(self.segments),
+            'commits': self.commits,
+            'committed': self.committed,
+            'avg_commit_size': round(self.committed / self.commits, 1) if self.commits else 0,
+            'fsyncs': self.fsyncs,
+        }
+
+    def _roll(self):
+        """Închide segmentul activ și deschide unul nou"""
+        # Cu FSYNC_BATCH, lotul curent poate include segmentul închis: îl sincronizăm acum
+        self.active.close(sync=self.fsync_policy == FSYNC_BATCH)
+        self.active = LogSegment(self.directory, self.active.next_offset)
+        self.segments.append(self.active)
+
+    def _segment_for(self, offset):
+        bases = [segment.base_offset for segment in self.segments]
+        index = bisect.bisect_right(bases, offset) - 1
+        return self.segments[max(index, 0)]
+
+    def read(self, offset):
+        """Citește înregistrarea de la un offset dat (sau None)"""
+        for _, record in self.iter_from(offset):
+            return record
+        return None
+
+    def iter_from(self, offset=0, skip_errors=False):
+        """Generator peste perechile (offset, înregistrare) începând de la offset.
+
+        Cu skip_errors, o înregistrare care nu poate fi decodată este raportată și sărită."""
+        with self.lock:
+            self.active.flush()
+            segments = list(self.segments)
+            end = self.active.next_offset
+
+        offset = max(offset, segments[0].base_offset)
+        first = self._segment_for(offset)
+        for segment in segments[segments.index(first):]:
+            start = max(offset, segment.base_offset)
+            if start >= segment.next_offset:
+                continue
+            position = segment.position_of(start)
+            if position is None:
+                continue
+            current = start
+            for payload in segment.read_from(position):
+                if current >= end:
+                    return
+                try:
+                    record = self.codec.decode(payload)
+                except Exception as e:
+                    if not skip_errors:
+                        raise
+                    logger.error("Skipping undecodable log record at offset %d: %s", current, e)
+                else:
+                    yield current, record
+                current += 1
+
+    def close(self):
+        """Oprește firul de scriere după ultimul commit și închide segmentele"""
+        with self.lock:
+            self.closed = True
+            self.commit_ready.notify()
+        if self.writer is not None:
+            self.writer.join()
+        with self.lock:
+            for segment in self.segments:
+                segment.flush()
+                segment.close()
+
+
+# =============================================
+# Exporturi JSON / text generate din jurnal
+# =============================================
+def export_json(records, path):
+    """Scrie mesajele JSON într-un fișier, ca listă"""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for message in records:
+            try:
+                content_parsed = json.loads(message['content'])
+            except (TypeError, ValueError):
+                content_parsed = message['content']
+
+            entry = json.dumps({
+                'id': message['id'],
+                'topic': message['topic'],
+                'timestamp': message['timestamp'],
+                'content': content_parsed
+            }, indent=2, ensure_ascii=False)
+            f.write(',\n' if count else '\n')
+            f.write('\n'.join('  ' + line for line in entry.split('\n')))
+            count += 1
+        f.write('\n]' if count else ']')
+    return count
+
+
+def export_text(records, path):
+    """Scrie mesajele text într-un fișier, câte unul pe linie"""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for message in records:
+            f.write(f"[{message['timestamp']}] {message['topic']}: {message['content']}\n")
+            count += 1
+    return count
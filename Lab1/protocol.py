@@ -0,0 +1,187 @@
+import json
+import struct
+from collections import deque
+
+
+# =============================================
+# Protocol binar cu cadre prefixate de lungime
+# =============================================
+# Antet (8 octeți, big-endian):
+#   version (1B) | opcode (1B) | flags (2B) | lungime payload (4B)
+# Payload-ul este JSON UTF-8 (fără pickle, deci sigur pentru date din rețea).
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct('>BBHI')
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+# Cu FLAG_RECORD, payload-ul unui PUBLISH/MESSAGE nu este JSON, ci o înregistrare compactă:
+#   poziție (8B: seq la PUBLISH, offset la MESSAGE) | id (8B) | timestamp (8B, double) |
+#   lungime topic (2B) | lungime format (2B) | topic | format | conținut (octeți bruți)
+# Conținutul trece neschimbat de la publisher în jurnal și spre subscriberi, fără re-codificare.
+FLAG_RECORD = 0x0001
+WIRE_RECORD = struct.Struct('>QQdHH')
+
+OP_PUBLISH = 0x01
+OP_SUBSCRIBE = 0x02
+OP_RESPONSE = 0x03
+OP_MESSAGE = 0x04
+OP_PUBLISH_BATCH = 0x05
+OP_ACK = 0x06
+OP_NACK = 0x07
+OP_STATS = 0x08
+OP_CLUSTER = 0x09
+OP_REPLICATE = 0x0A
+
+OPCODE_NAMES = {
+    OP_PUBLISH: 'PUBLISH',
+    OP_SUBSCRIBE: 'SUBSCRIBE',
+    OP_RESPONSE: 'RESPONSE',
+    OP_MESSAGE: 'MESSAGE',
+    OP_PUBLISH_BATCH: 'PUBLISH_BATCH',
+    OP_ACK: 'ACK',
+    OP_NACK: 'NACK',
+    OP_STATS: 'STATS',
+    OP_CLUSTER: 'CLUSTER',
+    OP_REPLICATE: 'REPLICATE',
+}
+OPCODES = {name: opcode for opcode, name in OPCODE_NAMES.items()}
+
+
+class ProtocolError(Exception):
+    """Cadru invalid: versiune necunoscută, opcode greșit sau dimensiune prea mare"""
+
+
+def encode_payload(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def decode_payload(data):
+    """Payload-ul JSON al unui cadru; trebuie să fie un obiect (dict)"""
+    if not data:
+        return {}
+    try:
+        payload = json.loads(bytes(data).decode('utf-8'))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise ProtocolError(f"Malformed JSON payload: {e}")
+    if not isinstance(payload, dict):
+        raise ProtocolError(f"Payload must be a JSON object, got {type(payload).__name__}")
+    return payload
+
+
+def encode_frame(opcode, payload, flags=0):
+    """Construiește un cadru complet (antet + payload)"""
+    body = encode_payload(payload)
+    if len(body) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame too large: {len(body)} bytes")
+    return HEADER.pack(PROTOCOL_VERSION, opcode, flags, len(body)) + body
+
+
+def encode_record_frame(opcode, position, msg_id, timestamp, topic, format_type, content):
+    """Construiește un cadru FLAG_RECORD; content sunt octeții mesajului, copiați o singură dată"""
+    topic = topic.encode('utf-8')
+    format_type = format_type.encode('utf-8')
+    length = WIRE_RECORD.size + len(topic) + len(format_type) + len(content)
+    if length > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame too large: {length} bytes")
+    return b''.join((HEADER.pack(PROTOCOL_VERSION, opcode, FLAG_RECORD, length),
+                     WIRE_RECORD.pack(position, msg_id or 0, timestamp or 0.0, len(topic), len(format_type)),
+                     topic, format_type, content))
+
+
+def decode_record_payload(opcode, data):
+    """Payload-ul (dict) unui cadru FLAG_RECORD; 'content' rămâne în octeți"""
+    try:
+        position, msg_id, timestamp, topic_length, format_length = WIRE_RECORD.unpack_from(data)
+        start = WIRE_RECORD.size
+        topic = str(data[start:start + topic_length], 'utf-8')
+        start += topic_length
+        format_type = str(data[start:start + format_length], 'utf-8')
+        start += format_length
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ProtocolError(f"Malformed record frame: {e}")
+    if start > len(data):
+        raise ProtocolError("Malformed record frame: truncated header")
+    payload = {'topic': topic, 'format': format_type, 'content': bytes(data[start:])}
+    if opcode == OP_MESSAGE:
+        payload.update(id=msg_id, timestamp=timestamp, offset=position)
+    else:
+        payload['seq'] = position
+    return payload
+
+
+def encode_message(message):
+    """Codifică un mesaj client (dict cu cheia 'type') ca un cadru"""
+    opcode = OPCODES.get(message.get('type'))
+    if opcode is None:
+        raise ProtocolError(f"Unknown message type: {message.get('type')}")
+    payload = {key: value for key, value in message.items() if key != 'type'}
+    return encode_frame(opcode, payload)
+
+
+def message_from_frame(opcode, payload):
+    """Reconstruiește dict-ul de mesaj (cu 'type') dintr-un cadru decodat"""
+    if not isinstance(payload, dict):
+        raise ProtocolError(f"Payload must be a JSON object, got {type(payload).__name__}")
+    message = dict(payload)
+    message['type'] = OPCODE_NAMES.get(opcode)
+    return message
+
+
+class FrameDecoder:
+    """Decodor incremental: reasamblează cadrele din citiri parțiale sau lipite"""
+
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE):
+        self.buffer = bytearray()
+        self.max_frame_size = max_frame_size
+        self.pending = deque()
+
+    def feed(self, data):
+        """Adaugă octeți primiți și returnează lista de cadre (opcode, payload) complete"""
+        self.buffer += data
+        frames = []
+        view = memoryview(self.buffer)
+        position = 0
+        try:
+            while len(self.buffer) - position >= HEADER.size:
+                version, opcode, flags, length = HEADER.unpack_from(view, position)
+                if version != PROTOCOL_VERSION:
+                    raise ProtocolError(f"Unsupported protocol version: {version}")
+                if opcode not in OPCODE_NAMES:
+                    raise ProtocolError(f"Unknown opcode: {opcode}")
+                if length > self.max_frame_size:
+                    raise ProtocolError(f"Frame too large: {length} bytes")
+
+                end = position + HEADER.size + length
+                if end > len(self.buffer):
+                    break
+                body = view[position + HEADER.size:end]
+                try:
+                    if flags & FLAG_RECORD:
+                        frames.append((opcode, decode_record_payload(opcode, body)))
+                    else:
+                        frames.append((opcode, decode_payload(body)))
+                finally:
+                    body.release()
+                position = end
+        finally:
+            view.release()
+            if position:
+                del self.buffer[:position]
+        return frames
+
+
+def decode_datagram(data):
+    """Decodează un datagram UDP care conține exact un cadru"""
+    frames = FrameDecoder().feed(data)
+    if len(frames) != 1:
+        raise ProtocolError("Datagram must contain exactly one frame")
+    return frames[0]
+
+
+def read_frame(sock, decoder, bufsize=65536):
+    """Citește de pe socket până la primul cadru complet (sau None la închidere)"""
+    while not decoder.pending:
+        data = sock.recv(bufsize)
+        if not data:
+            return None
+        decoder.pending.extend(decoder.feed(data))
+    return decoder.pending.popleft()
@@ -0,0 +1,207 @@
+import os
+import json
+import struct
+import functools
+import threading
+from datetime import datetime
+
+from protocol import (HEADER, OP_MESSAGE, ProtocolError, encode_frame, encode_record_frame,
+                      decode_record_payload)
+
+
+# =============================================
+# Înregistrarea compactă a unui mesaj
+# =============================================
+# Un mesaj stocat nu mai este un dict cu chei repetate: MessageRecord are __slots__,
+# conținutul rămâne în octeți (așa cum a venit de la publisher), iar timestamp-ul
+# este un float. Forma de dict (cu timestamp text) se construiește doar la cerere,
+# pentru subscriberii JSON, grupurile de consumatori și exporturi.
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+ENCODING_JSON = 'json'        # cadre MESSAGE cu payload JSON (implicit, compatibil cu clienții vechi)
+ENCODING_RECORD = 'record'    # cadre MESSAGE compacte (FLAG_RECORD), conținutul fără re-codificare
+ENCODINGS = (ENCODING_JSON, ENCODING_RECORD)
+
+MAX_RECORD_ID = 2 ** 64 - 1   # ID-ul este stocat și transmis pe 8 octeți fără semn
+
+
+@functools.lru_cache(maxsize=4096)
+def format_timestamp(seconds):
+    """Textul timestamp-ului; mesajele consecutive au de obicei aceeași secundă"""
+    return datetime.fromtimestamp(seconds).strftime(TIMESTAMP_FORMAT)
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_timestamp(text):
+    """Timestamp-ul (secunde) din forma text a unui mesaj, sau None"""
+    try:
+        return datetime.strptime(text, TIMESTAMP_FORMAT).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class MessageRecord:
+    __slots__ = ('id', 'topic', 'format', 'content', 'timestamp', 'offset')
+
+    def __init__(self, id, topic, format, content, timestamp, offset=None):
+        self.id = id
+        self.topic = topic
+        self.format = format
+        self.content = content
+        self.timestamp = timestamp
+        self.offset = offset
+
+    @property
+    def text(self):
+        """Conținutul ca text (mesajele sunt UTF-8: text, JSON sau XML)"""
+        return str(self.content, 'utf-8', 'replace')
+
+    def to_dict(self):
+        """Forma de dict a mesajului, aceeași ca în cadrele MESSAGE JSON"""
+        return {
+            'id': self.id,
+            'topic': self.topic,
+            'format': self.format,
+            'content': self.text,
+            'timestamp': format_timestamp(int(self.timestamp)) if self.timestamp else None,
+            'offset': self.offset,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Înregistrarea dintr-un dict de mesaj (replicare, jurnale în format JSON vechi)"""
+        content = data.get('content')
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        timestamp = data.get('timestamp')
+        if not isinstance(timestamp, (int, float)):
+            timestamp = parse_timestamp(timestamp)
+        return cls(data.get('id'), data.get('topic'), data.get('format', 'text'), content or b'',
+                   timestamp, data.get('offset'))
+
+
+def invalid_record(data):
+    """Motivul pentru care un dict primit prin replicare nu poate fi stocat, sau None"""
+    if not isinstance(data, dict):
+        return 'Records must be objects'
+    msg_id = data.get('id')
+    if not isinstance(msg_id, int) or isinstance(msg_id, bool) or not 0 <= msg_id <= MAX_RECORD_ID:
+        return f'Invalid record id: {msg_id!r}'
+    if not isinstance(data.get('topic'), str) or not data['topic']:
+        return f"Invalid record topic: {data.get('topic')!r}"
+    if not isinstance(data.get('content'), str):
+        return 'Invalid record content: expected a string'
+    if not isinstance(data.get('format', 'text'), str):
+        return f"Invalid record format: {data.get('format')!r}"
+    return None
+
+
+# =============================================
+# Cadrele MESSAGE ale unei înregistrări
+# =============================================
+def message_frame(record):
+    """Cadrul MESSAGE compact: conținutul este copiat ca atare, fără JSON"""
+    return encode_record_frame(OP_MESSAGE, record.offset, record.id, record.timestamp,
+                               record.topic, record.format, record.content)
+
+
+def record_from_frame(frame):
+    """Înregistrarea dintr-un cadru MESSAGE compact complet (antet inclus)"""
+    with memoryview(frame) as view:
+        payload = decode_record_payload(OP_MESSAGE, view[HEADER.size:])
+    return MessageRecord(payload['id'], payload['topic'], payload['format'], payload['content'],
+                         payload['timestamp'], payload['offset'])
+
+
+def json_message_frame(frame):
+    """Cadrul MESSAGE JSON echivalent unui cadru compact (pentru subscriberii JSON)"""
+    return encode_frame(OP_MESSAGE, record_from_frame(frame).to_dict())
+
+
+# =============================================
+# Tabel de simboluri: ID-uri numerice pentru topic-uri și formate
+# =============================================
+class SymbolTable:
+    """Asociază fiecărui șir (topic, format) un ID stabil; tabelul este salvat
+    append-only, câte un șir JSON pe linie, înainte ca vreo înregistrare să îl folosească"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.ids = {}
+        self.names = []
+        self.lock = threading.Lock()
+        self.file = None
+        if path is not None:
+            self._load()
+            self.file = open(path, 'a', encoding='utf-8')
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # O linie neterminată (oprire bruscă) nu a fost folosită de nicio înregistrare
+        complete = data[:data.rfind(b'\n') + 1]
+        if len(complete) != len(data):
+            with open(self.path, 'r+b') as f:
+                f.truncate(len(complete))
+        for line in complete.decode('utf-8').splitlines():
+            name = json.loads(line)
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+
+    def intern(self, name):
+        symbol = self.ids.get(name)
+        if symbol is not None:
+            return symbol
+        with self.lock:
+            symbol = self.ids.get(name)
+            if symbol is None:
+                if self.file is not None:
+                    self.file.write(json.dumps(name, ensure_ascii=False) + '\n')
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+                symbol = len(self.names)
+                self.names.append(name)
+                self.ids[name] = symbol
+        return symbol
+
+    def name(self, symbol):
+        return self.names[symbol]
+
+    def __len__(self):
+        return len(self.names)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+# =============================================
+# Codec de stocare pentru jurnal
+# =============================================
+# [versiune (1B)][id (8B)][timestamp (8B, double)][ID topic (4B)][ID format (4B)][conținut]
+# Offset-ul nu este stocat (este poziția în jurnal). Înregistrările vechi, scrise ca
+# JSON, încep cu '{' și sunt citite în continuare.
+RECORD_VERSION = 1
+STORED_RECORD = struct.Struct('>BQdII')
+
+
+class RecordCodec:
+    def __init__(self, symbols):
+        self.symbols = symbols
+
+    def encode(self, record):
+        return STORED_RECORD.pack(RECORD_VERSION, record.id, record.timestamp or 0.0,
+                                  self.symbols.intern(record.topic),
+                                  self.symbols.intern(record.format)) + record.content
+
+    def decode(self, payload):
+        if payload[:1] == b'{':
+            return MessageRecord.from_dict(json.loads(payload))
+        version, msg_id, timestamp, topic, format_type = STORED_RECORD.unpack_from(payload)
+        if version != RECORD_VERSION:
+            raise ProtocolError(f"Unsupported record version: {version}")
+        return MessageRecord(msg_id, self.symbols.name(topic), self.symbols.name(format_type),
+                             payload[STORED_RECORD.size:], timestamp)
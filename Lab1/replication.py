@@ -0,0 +1,171 @@
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+from instrumentation import logger
+
+
+# =============================================
+# Replicare lider -> urmăritori (log shipping)
+# =============================================
+# Liderul unei partiții trimite fiecare mesaj stocat replicilor vii ale partiției.
+# Pentru fiecare urmăritor există un flux cu un fir propriu: mesajele adunate cât
+# timp lotul anterior era pe drum pleacă împreună într-un singur cadru REPLICATE,
+# fără a aștepta confirmarea lotului anterior (pipelining). Astfel replicarea
+# adaugă cel mult un drum dus-întors (cu loturi) la latența unei publicări.
+ACK_LEADER = 'leader'     # confirmare după scrierea locală
+ACK_QUORUM = 'quorum'     # confirmare după ce majoritatea replicilor au scris mesajul
+ACK_LEVELS = (ACK_LEADER, ACK_QUORUM)
+
+
+class ReplicationStream:
+    """Fluxul de înregistrări către un urmăritor; păstrează ordinea jurnalului liderului"""
+
+    def __init__(self, router, node_id, max_batch=512):
+        self.router = router
+        self.node_id = node_id
+        self.max_batch = max_batch
+        self.queue = deque()
+        self.ready = threading.Condition()
+        self.shipped = 0
+        self.acknowledged = 0
+        self.failed = 0
+        self.batches = 0
+        threading.Thread(target=self._run, name=f'replication-{node_id}', daemon=True).start()
+
+    def ship(self, record):
+        """Pune înregistrarea în coada fluxului; Future-ul se rezolvă la confirmarea urmăritorului"""
+        future = Future()
+        with self.ready:
+            self.queue.append((record, future))
+            if len(self.queue) == 1:
+                self.ready.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self.ready:
+                while not self.queue:
+                    self.ready.wait()
+                count = min(len(self.queue), self.max_batch)
+                batch = [self.queue.popleft() for _ in range(count)]
+
+            try:
+                response = self.router.peer(self.node_id).request(
+                    {'type': 'REPLICATE', 'records': [record.to_dict() for record, _ in batch]})
+            except Exception as e:
+                self._settle(batch, error=e)
+                continue
+            self.shipped += len(batch)
+            self.batches += 1
+            response.add_done_callback(lambda f, batch=batch: self._settle(batch, response=f))
+
+    def _settle(self, batch, response=None, error=None):
+        if error is None:
+            try:
+                result = response.result()
+                if result.get('status') != 'OK':
+                    error = RuntimeError(result.get('message', 'replication rejected'))
+            except Exception as e:
+                error = e
+        if error is None:
+            self.acknowledged += len(batch)
+            for _, future in batch:
+                future.set_result(True)
+        else:
+            self.failed += len(batch)
+            logger.warning("Replication to node %s failed for %d records: %s", self.node_id, len(batch), error)
+            for _, future in batch:
+                future.set_exception(ConnectionError(f"Replica {self.node_id}: {error}"))
+
+    def get_statistics(self):
+        return {
+            'queued': len(self.queue),
+            'shipped': self.shipped,
+            'acknowledged': self.acknowledged,
+            'failed': self.failed,
+            'avg_batch': round(self.shipped / self.batches, 1) if self.batches else 0,
+        }
+
+
+def quorum_future(local, replicas, needed):
+    """Future rezolvat când scrierea locală și cel puțin `needed` replici au confirmat;
+    eșuează imediat ce cvorumul nu mai poate fi atins"""
+    result = Future()
+    state = {'acks': 0, 'failures': 0, 'local': False}
+    lock = threading.Lock()
+
+    def check():
+        if result.done():
+            return
+        if state['local'] and state['acks'] >= needed:
+            result.set_result(local.result())
+        elif state['failures'] > len(replicas) - needed:
+            result.set_exception(ConnectionError(f"Quorum not reached ({state['acks']}/{needed} replicas)"))
+
+    def on_local(future):
+        with lock:
+            if future.exception() is not None:
+                if not result.done():
+                    result.set_exception(future.exception())
+                return
+            state['local'] = True
+            check()
+
+    def on_replica(future):
+        with lock:
+            state['acks' if future.exception() is None else 'failures'] += 1
+            check()
+
+    local.add_done_callback(on_local)
+    for future in replicas:
+        future.add_done_callback(on_replica)
+    return result
+
+
+class Replicator:
+    """Trimite mesajele stocate de lider replicilor partiției și combină confirmările
+    după nivelul ales (leader sau quorum)"""
+
+    def __init__(self, router, ack_level=ACK_LEADER, max_batch=512):
+        if ack_level not in ACK_LEVELS:
+            raise ValueError(f"Unknown acknowledgement level: {ack_level}")
+        self.router = router
+        self.ack_level = ack_level
+        self.max_batch = max_batch
+        self.streams = {}
+        self.lock = threading.Lock()
+
+    def stream(self, node_id):
+        with self.lock:
+            stream = self.streams.get(node_id)
+            if stream is None:
+                stream = self.streams[node_id] = ReplicationStream(self.router, node_id, self.max_batch)
+            return stream
+
+    def check_quorum(self, topic):
+        """Eroarea de returnat dacă nu sunt destule replici vii pentru nivelul quorum"""
+        if self.ack_level != ACK_QUORUM:
+            return None
+        needed = len(self.router.map.replicas(topic)) // 2
+        alive = len(self.router.followers(topic))
+        if alive < needed:
+            return f"Not enough replicas: {alive} alive, {needed} needed"
+        return None
+
+    def ship(self, topic, record, durable):
+        """Replică înregistrarea; returnează Future-ul după care se poate confirma publicarea.
+
+        Trebuie apelat în ordinea offset-urilor din jurnal (sub lacătul broker-ului)."""
+        acks = [self.stream(node_id).ship(record) for node_id in self.router.followers(topic)]
+        if self.ack_level == ACK_LEADER:
+            return durable
+        return quorum_future(durable, acks, len(self.router.map.replicas(topic)) // 2)
+
+    def get_statistics(self):
+        with self.lock:
+            streams = dict(self.streams)
+        return {
+            'ack_level': self.ack_level,
+            'streams': {node_id: stream.get_statistics() for node_id, stream in streams.items()},
+        }
@@ -0,0 +1,154 @@
+import time
+import threading
+
+
+# =============================================
+# Retenție mărginită în memorie (per topic)
+# =============================================
+class RetentionPolicy:
+    """Limite de retenție: număr de mesaje, octeți și vârstă (secunde); None = fără limită"""
+
+    __slots__ = ('max_messages', 'max_bytes', 'max_age')
+
+    def __init__(self, max_messages=1000, max_bytes=1024 * 1024, max_age=3600):
+        if max_messages is None or max_messages <= 0:
+            raise ValueError("max_messages must be a positive number")
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+
+class RingBuffer:
+    """Buffer circular pentru intrări (offset, timestamp, cadru), în ordinea offset-urilor.
+
+    Lista internă crește prin dublare până la capacitate, apoi este reutilizată."""
+
+    __slots__ = ('capacity', 'entries', 'head', 'size', 'bytes')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = [None] * min(capacity, 16)
+        self.head = 0
+        self.size = 0
+        self.bytes = 0
+
+    def __len__(self):
+        return self.size
+
+    def _slot(self, i):
+        return (self.head + i) % len(self.entries)
+
+    def __getitem__(self, i):
+        return self.entries[self._slot(i)]
+
+    def _grow(self):
+        new_length = min(self.capacity, len(self.entries) * 2)
+        self.entries = [self[i] for i in range(self.size)] + [None] * (new_length - self.size)
+        self.head = 0
+
+    def append(self, entry):
+        if self.size == self.capacity:
+            self.popleft()
+        elif self.size == len(self.entries):
+            self._grow()
+        self.entries[self._slot(self.size)] = entry
+        self.size += 1
+        self.bytes += len(entry[2])
+
+    def popleft(self):
+        entry = self.entries[self.head]
+        self.entries[self.head] = None
+        self.head = (self.head + 1) % len(self.entries)
+        self.size -= 1
+        self.bytes -= len(entry[2])
+        return entry
+
+    def first_index_from(self, offset=None, timestamp=None):
+        """Căutare binară a primei intrări cu offset/timestamp >= valoarea cerută"""
+        key, value = (0, offset) if offset is not None else (1, timestamp)
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self[middle][key] < value:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def iter_from(self, index):
+        for i in range(index, self.size):
+            yield self[i]
+
+
+class RetentionStore:
+    """Păstrează ultimele mesaje ale fiecărui topic în limitele politicii"""
+
+    def __init__(self, default_policy=None, topic_policies=None):
+        self.default_policy = default_policy or RetentionPolicy()
+        self.topic_policies = dict(topic_policies or {})
+        self.buffers = {}
+        self.lock = threading.Lock()
+        self.evicted = 0
+
+    def policy_for(self, topic):
+        return self.topic_policies.get(topic, self.default_policy)
+
+    def set_policy(self, topic, policy):
+        with self.lock:
+            self.topic_policies[topic] = policy
+
+    def append(self, topic, offset, frame, timestamp=None):
+        """Reține cadrul unui mesaj și aplică limitele topic-ului"""
+        now = time.time() if timestamp is None else timestamp
+        policy = self.policy_for(topic)
+        with self.lock:
+            buffer = self.buffers.get(topic)
+            if buffer is None:
+                buffer = self.buffers[topic] = RingBuffer(policy.max_messages)
+            before = len(buffer)
+            buffer.append((offset, now, frame))
+            evicted = before + 1 - len(buffer)
+            evicted += self._trim(buffer, policy, now)
+            self.evicted += evicted
+
+    def _trim(self, buffer, policy, now):
+        evicted = 0
+        while buffer.size > 1 and policy.max_bytes is not None and buffer.bytes > policy.max_bytes:
+            buffer.popleft()
+            evicted += 1
+        if policy.max_age is not None:
+            while buffer.size and now - buffer[0][1] > policy.max_age:
+                buffer.popleft()
+                evicted += 1
+        return evicted
+
+    def expire(self, now=None):
+        """Elimină mesajele expirate și topic-urile rămase goale"""
+        now = time.time() if now is None else now
+        with self.lock:
+            for topic in list(self.buffers):
+                buffer = self.buffers[topic]
+                self.evicted += self._trim(buffer, self.policy_for(topic), now)
+                if not buffer.size:
+                    del self.buffers[topic]
+
+    def replay(self, topic_filter, from_offset=None, from_timestamp=None):
+        """Cadrele reținute pentru topic-urile acceptate de filtru, ordonate după offset"""
+        entries = []
+        with self.lock:
+            for topic, buffer in self.buffers.items():
+                if not topic_filter(topic):
+                    continue
+                start = buffer.first_index_from(from_offset, from_timestamp)
+                entries.extend(buffer.iter_from(start))
+        entries.sort(key=lambda entry: entry[0])
+        return entries
+
+    def get_statistics(self):
+        with self.lock:
+            return {
+                'topics': len(self.buffers),
+                'messages': sum(buffer.size for buffer in self.buffers.values()),
+                'bytes': sum(buffer.bytes for buffer in self.buffers.values()),
+                'evicted': self.evicted,
+            }
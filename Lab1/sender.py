@@ -0,0 +1,371 @@
+import sys
+import json
+import time
+import socket
+import random
+import argparse
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import Future
+from datetime import datetime
+
+from protocol import FrameDecoder, encode_message, encode_record_frame, OP_RESPONSE, OP_MESSAGE, OP_PUBLISH
+
+
+# =============================================
+# Generare de mesaje random (folosită și de GUI)
+# =============================================
+def generate_random_message(format_type, topic):
+    """Generează conținutul unui mesaj random în formatul cerut (json, xml sau text)"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    if format_type not in ("json", "xml"):
+        return f"Mesaj text #{random.randint(1000, 9999)} generat la {timestamp}"
+
+    if format_type == "json":
+        random_data = {
+            "message_id": random.randint(1000, 9999),
+            "timestamp": timestamp,
+            "priority": random.choice(["low", "medium", "high", "critical"]),
+            "source": random.choice(["sensor_1", "sensor_2", "server", "client"]),
+            "value": round(random.uniform(0, 100), 2),
+            "status": random.choice(["active", "inactive", "warning", "error"]),
+            "description": f"Mesaj de test generat automat la {timestamp}"
+        }
+        return json.dumps(random_data, indent=2, ensure_ascii=False)
+
+    # XML - structură conformă cu schema XSD
+    # Creăm un ID pentru mesaj
+    message_id = str(random.randint(1000, 9999))
+
+    # Creăm conținutul ca JSON string care va fi pus în elementul <content>
+    content_data = {
+        "priority": random.choice(["low", "medium", "high"]),
+        "source": random.choice(["sensor_A", "sensor_B", "main_server"]),
+        "value": round(random.uniform(0, 100), 2),
+        "status": random.choice(["ok", "warning", "error"]),
+        "description": f"Mesaj XML generat la {timestamp}"
+    }
+
+    # Creăm structura XML conform schemei XSD
+    root = ET.Element("message")
+    ET.SubElement(root, "id").text = message_id
+    ET.SubElement(root, "topic").text = topic
+    ET.SubElement(root, "timestamp").text = timestamp
+    ET.SubElement(root, "content").text = json.dumps(content_data)
+
+    return ET.tostring(root, encoding='unicode')
+
+
+# =============================================
+# Client persistent cu pipelining
+# =============================================
+class BrokerClient:
+    """O conexiune TCP persistentă; cererile sunt trimise fără a aștepta răspunsul,
+    cu cel mult max_in_flight cereri neconfirmate"""
+
+    def __init__(self, host='localhost', port=9999, max_in_flight=64, timeout=10):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.window = threading.BoundedSemaphore(max_in_flight)
+        self.send_lock = threading.Lock()
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.next_seq = 0
+        self.on_message = None
+        self.sock = None
+        self.reader = None
+        self.closed = False
+
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.settimeout(None)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = threading.Thread(target=self._read_loop, daemon=True)
+        self.reader.start()
+        return self
+
+    def _read_loop(self):
+        decoder = FrameDecoder()
+        error = ConnectionError("Connection closed by server")
+        try:
+            while True:
+                data = self.sock.recv(65536)
+                if not data:
+                    break
+                for opcode, payload in decoder.feed(data):
+                    if opcode == OP_RESPONSE:
+                        self._resolve(payload)
+                    elif opcode == OP_MESSAGE and self.on_message:
+                        self.on_message(payload)
+        except OSError as e:
+            error = e
+        except Exception as e:
+            # Cadru invalid sau excepție din on_message: conexiunea nu mai poate fi folosită,
+            # dar cererile în curs trebuie să primească o eroare, nu să aștepte la nesfârșit
+            error = ConnectionError(f"Connection reader failed: {e!r}")
+            self.close()
+        self.closed = True
+        self._fail_pending(error)
+
+    def _resolve(self, payload):
+        with self.pending_lock:
+            future = self.pending.pop(payload.get('seq'), None)
+        if future is not None:
+            self.window.release()
+            future.set_result(payload)
+
+    def _fail_pending(self, error):
+        with self.pending_lock:
+            futures = list(self.pending.values())
+            self.pending.clear()
+        for future in futures:
+            self.window.release()
+            future.set_exception(error)
+
+    def request(self, message):
+        """Trimite o cerere și returnează un Future cu răspunsul serverului"""
+        return self._request(lambda seq: encode_message(dict(message, seq=seq)))
+
+    def _request(self, build_frame):
+        """Trimite cadrul construit de build_frame(seq) și așteaptă răspunsul cu acel seq"""
+        if not self.window.acquire(timeout=self.timeout):
+            raise TimeoutError("Too many requests in flight")
+        future = Future()
+        with self.send_lock:
+            seq = self.next_seq
+            self.next_seq += 1
+            with self.pending_lock:
+                # După _fail_pending nimeni nu ar mai rezolva Future-ul
+                if self.closed:
+                    self.window.release()
+                    raise ConnectionError("Connection closed")
+                self.pending[seq] = future
+            try:
+                self.sock.sendall(build_frame(seq))
+            except OSError as e:
+                with self.pending_lock:
+                    self.pending.pop(seq, None)
+                self.window.release()
+                raise ConnectionError(f"Send failed: {e}")
+        return future
+
+    def publish(self, topic, content, format_type='text'):
+        return self.request({'type': 'PUBLISH', 'topic': topic, 'format': format_type, 'content': content})
+
+    def publish_record(self, topic, content, format_type='text'):
+        """Publicare în codificarea compactă: conținutul (octeți) nu trece prin JSON"""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        return self._request(lambda seq: encode_record_frame(OP_PUBLISH, seq, 0, 0.0, topic, format_type, content))
+
+    def publish_batch(self, messages):
+        """Publică un lot de mesaje (dict-uri cu topic/format/content) într-un singur cadru"""
+        return self.request({'type': 'PUBLISH_BATCH', 'messages': list(messages)})
+
+    def subscribe(self, topic, on_message, **options):
+        """Subscriere; opțiuni: from_offset, from_timestamp, encoding ('json' sau 'record')
+        sau group + prefetch"""
+        self.on_message = on_message
+        return self.request(dict(options, type='SUBSCRIBE', topic=topic))
+
+    def _send_unacknowledged(self, message):
+        with self.send_lock:
+            self.sock.sendall(encode_message(message))
+
+    def ack(self, delivery_tags):
+        """Confirmă livrări dintr-un grup de consumatori (fără răspuns de la server)"""
+        self._send_unacknowledged({'type': 'ACK', 'delivery_tags': list(delivery_tags)})
+
+    def nack(self, delivery_tags, requeue=True):
+        """Respinge livrări; cu requeue=True mesajele sunt relivrate altui membru"""
+        self._send_unacknowledged({'type': 'NACK', 'delivery_tags': list(delivery_tags), 'requeue': requeue})
+
+    def close(self):
+        self.closed = True
+        if self.sock is not None:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+
+
+# =============================================
+# Generator de încărcare
+# =============================================
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def latency_summary(samples):
+    values = sorted(round(value, 3) for value in samples)
+    return {
+        'count': len(values),
+        'p50_ms': percentile(values, 0.50),
+        'p90_ms': percentile(values, 0.90),
+        'p99_ms': percentile(values, 0.99),
+        'p999_ms': percentile(values, 0.999),
+        'max_ms': values[-1] if values else None,
+    }
+
+
+class LoadGenerator:
+    """Publică N mesaje/s în loturi și măsoară latența confirmărilor și cea end-to-end"""
+
+    def __init__(self, host='localhost', port=9999, rate=1000, duration=10, batch_size=50,
+                 formats=('json',), topic='load.test', connections=1, max_in_flight=64, distinct=100,
+                 topics=1, client_class=None):
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.duration = duration
+        self.batch_size = batch_size
+        self.formats = formats
+        self.topic = topic
+        # Cu mai multe topic-uri (topic.0, topic.1, ...) încărcarea se împarte pe partiții
+        self.topics = [topic] if topics <= 1 else [f"{topic}.{i}" for i in range(topics)]
+        self.subscription = topic if topics <= 1 else f"{topic}.*"
+        self.client_class = client_class or BrokerClient
+        self.connections = connections
+        self.max_in_flight = max_in_flight
+
+        # Conținutul este pregenerat, ca generarea să nu limiteze rata măsurată
+        self.contents = [(f, generate_random_message(f, topic)) for f in formats for _ in range(distinct)]
+
+        self.lock = threading.Lock()
+        self.sent_at = {}
+        self.received_at = {}
+        self.ack_latencies = []
+        self.acked = 0
+        self.rejected = 0
+
+    def _on_delivery(self, message):
+        self.received_at[message.get('id')] = time.perf_counter()
+
+    def _on_ack(self, started, future):
+        now = time.perf_counter()
+        try:
+            response = future.result()
+        except Exception:
+            with self.lock:
+                self.rejected += self.batch_size
+            return
+        ids = response.get('ids', [])
+        with self.lock:
+            self.ack_latencies.append((now - started) * 1000)
+            for msg_id in ids:
+                if msg_id is None:
+                    self.rejected += 1
+                else:
+                    self.acked += 1
+                    self.sent_at[msg_id] = started
+
+    def run(self):
+        subscriber = self.client_class(self.host, self.port).connect()
+        subscriber.subscribe(self.subscription, self._on_delivery).result(timeout=10)
+        clients = [self.client_class(self.host, self.port, self.max_in_flight).connect()
+                   for _ in range(self.connections)]
+
+        interval = self.batch_size / float(self.rate)
+        total_batches = int(self.duration * self.rate / self.batch_size)
+        start = time.perf_counter()
+        futures = []
+        for n in range(total_batches):
+            target = start + n * interval
+            delay = target - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            batch = []
+            for _ in range(self.batch_size):
+                format_type, content = random.choice(self.contents)
+                batch.append({'topic': random.choice(self.topics), 'format': format_type, 'content': content})
+            sent = time.perf_counter()
+            future = clients[n % len(clients)].publish_batch(batch)
+            future.add_done_callback(lambda f, sent=sent: self._on_ack(sent, f))
+            futures.append(future)
+
+        for future in futures:
+            try:
+                future.result(timeout=30)
+            except Exception:
+                pass
+        elapsed = time.perf_counter() - start
+
+        # Așteaptă livrarea ultimelor mesaje către subscriber
+        deadline = time.time() + 5
+        while time.time() < deadline and len(self.received_at) < self.acked:
+            time.sleep(0.05)
+
+        for client in clients + [subscriber]:
+            client.close()
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        with self.lock:
+            end_to_end = [(self.received_at[i] - sent) * 1000
+                          for i, sent in self.sent_at.items() if i in self.received_at]
+            return {
+                'target_rate': self.rate,
+                'achieved_rate': round(self.acked / elapsed, 1) if elapsed else 0,
+                'acked': self.acked,
+                'rejected': self.rejected,
+                'delivered': len(end_to_end),
+                'batch_size': self.batch_size,
+                'connections': self.connections,
+                'topics': len(self.topics),
+                'ack_latency': latency_summary(self.ack_latencies),
+                'end_to_end_latency': latency_summary(end_to_end),
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless message sender and load generator")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=9999)
+    parser.add_argument('--topic', default='general')
+    parser.add_argument('--format', dest='formats', default='json',
+                        help="formatul mesajelor; listă separată prin virgulă pentru mix (json,xml,text)")
+    parser.add_argument('--count', type=int, default=1, help="numărul de mesaje trimise (mod simplu)")
+    parser.add_argument('--load', action='store_true', help="pornește generatorul de încărcare")
+    parser.add_argument('--rate', type=int, default=1000, help="mesaje/s în modul --load")
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--connections', type=int, default=1)
+    parser.add_argument('--topics', type=int, default=1,
+                        help="numărul de topic-uri în modul --load (topic.0 ... topic.N-1)")
+    parser.add_argument('--cluster', action='store_true',
+                        help="află harta partițiilor și publică direct la nodul proprietar")
+    parser.add_argument('--in-flight', type=int, default=64, help="cereri neconfirmate permise per conexiune")
+    args = parser.parse_args()
+    formats = tuple(args.formats.split(','))
+    client_class = BrokerClient
+    if args.cluster:
+        # Import local: cluster.py folosește BrokerClient din acest modul
+        from cluster import ClusterClient
+        client_class = ClusterClient
+
+    if args.load:
+        generator = LoadGenerator(args.host, args.port, args.rate, args.duration, args.batch_size, formats,
+                                  args.topic, args.connections, args.in_flight, topics=args.topics,
+                                  client_class=client_class)
+        print(json.dumps(generator.run(), indent=2))
+        return 0
+
+    client = client_class(args.host, args.port, args.in_flight).connect()
+    futures = [client.publish(args.topic, generate_random_message(formats[i % len(formats)], args.topic),
+                              formats[i % len(formats)])
+               for i in range(args.count)]
+    statuses = [future.result().get('status') for future in futures]
+    client.close()
+    print(f"✅ {statuses.count('OK')}/{len(statuses)} mesaje confirmate")
+    return 0 if statuses.count('OK') == len(statuses) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
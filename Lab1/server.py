@@ -1,17 +1,32 @@
 import socket
 import threading
+import asyncio
+import argparse
 import json
-import xml.etree.ElementTree as ET
-from lxml import etree
-import pickle
-from collections import defaultdict
-from queue import Queue
-import hashlib
-from datetime import datetime
-import jsonschema
+import time
+import logging
 import os
 import sys
 
+from message_log import SegmentedLog, export_json, export_text, FSYNC_POLICIES, FSYNC_NONE
+from xml_archive import XMLSink
+from record import (MessageRecord, RecordCodec, SymbolTable, message_frame, json_message_frame,
+                    invalid_record, ENCODINGS, ENCODING_JSON, ENCODING_RECORD)
+from protocol import (FrameDecoder, ProtocolError, encode_frame, decode_datagram, message_from_frame,
+                      OP_RESPONSE, OP_MESSAGE)
+from validation import XMLValidator, JSONValidator, ValidationEngine, check_publish
+from topic_trie import TopicTrie, validate_pattern, is_pattern, topic_matches, MULTI_LEVEL
+from idgen import SnowflakeIdGenerator, Deduplicator
+from retention import RetentionStore, RetentionPolicy
+from udp_ingest import UDPIngestTier
+from consumer_groups import ConsumerGroupManager
+from cluster import ClusterMap, ClusterRouter, parse_nodes, when_all, merge_batch_responses
+from replication import Replicator, ACK_LEVELS, ACK_LEADER
+from concurrent.futures import Future
+from fanout import SubscriberQueue, ThreadedWriter, OVERFLOW_POLICIES, DROP_OLDEST, DISCONNECT
+from instrumentation import (logger, debug_sampled, setup_logging, set_debug_sampling, start_stats_server,
+                             METRICS)
+
 
 # =============================================
 # Creare automată a fișierelor de schemă
@@ -50,20 +65,23 @@ def create_schema_files():
         "required": ["message_id", "timestamp", "priority", "source", "status", "description"]
     }
 
-    # Creează fișierele
+    # Creează fișierele (prin redenumire atomică: mai multe noduri pot porni în același director)
     files_created = []
+    temporary = f'.{os.getpid()}.tmp'
 
     try:
-        with open('schema.xsd', 'w', encoding='utf-8') as f:
+        with open('schema.xsd' + temporary, 'w', encoding='utf-8') as f:
             f.write(xsd_content)
+        os.replace('schema.xsd' + temporary, 'schema.xsd')
         files_created.append('schema.xsd')
         print("✅ Fișierul schema.xsd a fost creat automat")
     except Exception as e:
         print(f"❌ Eroare creare schema.xsd: {e}")
 
     try:
-        with open('schema.json', 'w', encoding='utf-8') as f:
+        with open('schema.json' + temporary, 'w', encoding='utf-8') as f:
             json.dump(json_schema_content, f, indent=2)
+        os.replace('schema.json' + temporary, 'schema.json')
         files_created.append('schema.json')
         print("✅ Fișierul schema.json a fost creat automat")
     except Exception as e:
@@ -72,6 +90,11 @@ def create_schema_files():
     return files_created
 
 
+# Răspunsuri amânate (durabilitate, replicare) care așteaptă scrierea pe o conexiune;
+# un client care nu le mai citește este deconectat la depășire
+MAX_PENDING_REPLIES = 16384
+
+
 # Verifică și creează fișierele de schemă la pornire
 print("🔍 Verific fișierele de schemă...")
 schema_files = create_schema_files()
@@ -81,297 +104,886 @@ schema_files = create_schema_files()
 # Agent de Mesaje (Message Broker)
 # =============================================
 class MessageBroker:
-    def __init__(self):
-        self.queues = defaultdict(Queue)
-        self.subscribers = defaultdict(list)
-        self.message_store = []
+    REPLAY_CHUNK = 256
+    CHECKPOINT_FILE = 'checkpoint.json'
+    SYMBOLS_FILE = 'symbols.txt'
+
+    def __init__(self, storage_dir='data', queue_size=1024, overflow_policy=DROP_OLDEST, batch_size=64,
+                 retention_policy=None, node_id=0, dedup_window=None, visibility_timeout=30,
+                 fsync_policy=FSYNC_NONE, commit_interval=0.002, commit_bytes=1024 * 1024,
+                 recovery_window=100000):
+        self.ids = SnowflakeIdGenerator(node_id)
+        self.deduplicator = Deduplicator(dedup_window) if dedup_window else None
+        self.subscribers = TopicTrie()
+        self.routes = TopicTrie()
+        self.subscribers_lock = threading.Lock()
+        self.fanout_options = {
+            'max_size': queue_size,
+            'policy': overflow_policy,
+            'batch_size': batch_size,
+        }
+        self.disconnected_subscribers = 0
+        self.retention = RetentionStore(retention_policy)
+        self.consumer_groups = ConsumerGroupManager(visibility_timeout)
         self.routing_table = {}
+        self.storage_dir = storage_dir
+        self.storage_options = {
+            'fsync_policy': fsync_policy,
+            'commit_interval': commit_interval,
+            'commit_bytes': commit_bytes,
+        }
+        self.recovery_window = recovery_window
+        self.cluster = None              # ClusterRouter, setat de NetworkServer
+        self.replicator = None           # Replicator, doar cu factor de replicare > 1
+        self.topic_offsets = {}          # topic -> [număr de mesaje, ultimul offset]
+        self.fanout_counter = METRICS.counter('messages_fanned_out')
         self._initialize_storage()
 
     def _initialize_storage(self):
-        """Inițializează fișierele de stocare"""
+        """Deschide jurnalul segmentat de mesaje și reconstruiește starea din memorie"""
         try:
-            # JSON storage
-            with open('messages.json', 'w', encoding='utf-8') as f:
-                json.dump([], f, indent=2)
-
-            # XML storage
-            with open('messages.xml', 'w', encoding='utf-8') as f:
-                f.write('<?xml version="1.0" encoding="UTF-8"?>\n<messages>\n</messages>')
-
-            print("✅ Fișierele de stocare au fost inițializate")
+            os.makedirs(self.storage_dir, exist_ok=True)
+            self.symbols = SymbolTable(os.path.join(self.storage_dir, self.SYMBOLS_FILE))
+            self.log = SegmentedLog(self.storage_dir, codec=RecordCodec(self.symbols), **self.storage_options)
+            if self.log.truncated_bytes:
+                print(f"⚠️ Înregistrare incompletă eliminată de la finalul jurnalului "
+                      f"({self.log.truncated_bytes} octeți)")
+            started = time.perf_counter()
+            scanned = self._recover_state()
+            print(f"✅ Jurnalul de mesaje a fost deschis ({self.log.next_offset} mesaje stocate, "
+                  f"{scanned} scanate în {time.perf_counter() - started:.2f}s)")
         except Exception as e:
             print(f"❌ Eroare inițializare stocare: {e}")
+            raise
 
-    def add_message(self, topic, message):
-        """Stochează mesajul și îl pune în coada corespunzătoare"""
-        msg_id = hashlib.sha256(pickle.dumps(message)).hexdigest()[:16]
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        stored_msg = {
-            'id': msg_id,
-            'topic': topic,
-            'format': message.get('format', 'text'),
-            'content': message['content'],
-            'timestamp': timestamp
-        }
-
-        self.message_store.append(stored_msg)
-        self.queues[topic].put(stored_msg)
-
-        # Salvare în format corespunzător
-        if message.get('format') == 'json':
-            self._save_json_message(stored_msg)
-        elif message.get('format') == 'xml':
-            self._save_xml_message(stored_msg)
+    def _load_checkpoint(self):
+        """Offset-ul și statisticile per topic salvate la ultimul checkpoint"""
+        try:
+            with open(os.path.join(self.storage_dir, self.CHECKPOINT_FILE), encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            offset = checkpoint['offset']
+            topics = checkpoint['topics']
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0, {}
+        # Un checkpoint mai nou decât jurnalul (ex: după trunchierea finalului) nu este de încredere
+        if not isinstance(offset, int) or offset > self.log.next_offset:
+            return 0, {}
+        return offset, topics
+
+    def _recover_state(self):
+        """Reconstruiește offset-urile per topic și retenția din jurnal.
+
+        Se scanează doar jurnalul de după checkpoint și ultimele recovery_window
+        înregistrări (pentru retenție); returnează numărul de înregistrări citite."""
+        checkpoint_offset, self.topic_offsets = self._load_checkpoint()
+        retention_start = max(0, self.log.next_offset - self.recovery_window)
+
+        scanned = 0
+        skipped = 0
+        for offset, record in self.log.iter_from(min(checkpoint_offset, retention_start), skip_errors=True):
+            scanned += 1
+            # O înregistrare care nu poate fi reconstruită este sărită: nu trebuie să împiedice pornirea
+            record.offset = offset
+            try:
+                frame = message_frame(record)
+            except Exception as e:
+                logger.error("Skipping log record at offset %d: %s", offset, e)
+                skipped += 1
+                continue
+            if offset >= checkpoint_offset:
+                self._track_topic_locked(record.topic, offset)
+            if offset >= retention_start:
+                self.retention.append(record.topic, offset, frame, record.timestamp)
+        if skipped:
+            print(f"⚠️ {skipped} înregistrări din jurnal nu au putut fi reconstruite și au fost sărite")
+        self.retention.expire()
+        return scanned
+
+    def _track_topic_locked(self, topic, offset):
+        counters = self.topic_offsets.get(topic)
+        if counters is None:
+            self.topic_offsets[topic] = [1, offset]
         else:
-            self._save_text_message(stored_msg)
-
-        # Trimite mesajul tuturor subscriberilor
-        for subscriber in self.subscribers[topic]:
+            counters[0] += 1
+            counters[1] = offset
+
+    def checkpoint(self):
+        """Salvează offset-urile per topic; pornirea următoare scanează doar jurnalul de după ele"""
+        with self.subscribers_lock:
+            state = {'offset': self.log.next_offset, 'topics': self.topic_offsets}
+            data = json.dumps(state, ensure_ascii=False, separators=(',', ':'))
+        path = os.path.join(self.storage_dir, self.CHECKPOINT_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+    def checkpoint_periodically(self, interval=60):
+        while True:
+            time.sleep(interval)
             try:
-                subscriber.send_message(stored_msg)
-            except:
-                self.subscribers[topic].remove(subscriber)
+                self.checkpoint()
+            except OSError as e:
+                logger.error("Checkpoint failed: %s", e)
 
-    def _save_json_message(self, message):
-        """Salvează mesajul JSON în fișier"""
-        try:
-            with open('messages.json', 'r+', encoding='utf-8') as f:
-                try:
-                    messages = json.load(f)
-                except json.JSONDecodeError:
-                    messages = []
+    def add_message(self, topic, message):
+        """Stochează mesajul, așteaptă punctul de durabilitate și returnează ID-ul lui"""
+        msg_id, durable = self.submit_message(topic, message)
+        durable.result()
+        return msg_id
+
+    def submit_message(self, topic, message):
+        """Stochează mesajul și îl livrează subscriberilor, fără a aștepta scrierea pe disc.
+
+        Returnează (ID, Future); Future-ul se rezolvă când jurnalul a atins punctul
+        de durabilitate ales (politica fsync și, în cluster, nivelul de confirmare al replicilor)."""
+        if self.replicator is not None:
+            error = self.replicator.check_quorum(topic)
+            if error is not None:
+                failed = Future()
+                failed.set_exception(ConnectionError(error))
+                return None, failed
+
+        content = message['content']
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        format_type = message.get('format', 'text')
 
-                # Încercăm să parsăm conținutul ca JSON
-                try:
-                    content_parsed = json.loads(message['content'])
-                except:
-                    content_parsed = message['content']
-
-                messages.append({
-                    'id': message['id'],
-                    'topic': message['topic'],
-                    'timestamp': message['timestamp'],
-                    'content': content_parsed
-                })
+        msg_id = self.ids.next_id()
+        if self.deduplicator is not None:
+            fingerprint = Deduplicator.fingerprint(topic, format_type, content)
+            existing_id = self.deduplicator.check_and_add(fingerprint, msg_id)
+            if existing_id is not None:
+                durable = Future()
+                durable.set_result(None)
+                return existing_id, durable
+
+        record = MessageRecord(msg_id, topic, format_type, content, time.time())
+
+        with self.subscribers_lock:
+            # Adăugare în jurnal (cost constant, indiferent de istoric); scrierea pe disc e grupată.
+            # Sub lacăt, ca ordinea offset-urilor să fie aceeași în retenție, livrare și checkpoint
+            record.offset, durable = self.log.submit(record)
+            self._track_topic_locked(topic, record.offset)
+            if self.replicator is not None:
+                durable = self.replicator.ship(topic, record, durable)
+
+            # Reține cadrul compact (fără JSON) și pune-l în coada fiecărui subscriber
+            frame = message_frame(record)
+            self.retention.append(topic, record.offset, frame)
+            topics = self._expand_topics_locked(topic)
+            subscribers = self._match_subscribers_locked(topics)
+        self.fanout_counter.inc(len(subscribers))
+        # Cadrul JSON este construit o singură dată, doar dacă există subscriberi JSON
+        json_frame = None
+        for subscriber in subscribers:
+            if subscriber.encoding == ENCODING_RECORD:
+                delivered = subscriber.deliver(frame)
+            else:
+                if json_frame is None:
+                    json_frame = encode_frame(OP_MESSAGE, record.to_dict())
+                delivered = subscriber.deliver(json_frame)
+            if not delivered:
+                self.remove_subscriber(subscriber)
+
+        # Grupurile de consumatori primesc mesajul o singură dată per grup
+        for consumer in self.consumer_groups.publish(topics, record):
+            self.remove_subscriber(consumer)
+        return msg_id, durable
+
+    def apply_replicated(self, records):
+        """Stochează înregistrările primite de la liderul unei partiții.
+
+        Replicile nu livrează mesajele subscriberilor (o face liderul), dar le rețin,
+        ca după promovare să le poată retrimite. Returnează (număr, Future de durabilitate)."""
+        durable = None
+        with self.subscribers_lock:
+            for data in records:
+                record = MessageRecord.from_dict(data)
+                record.offset, durable = self.log.submit(record)
+                self._track_topic_locked(record.topic, record.offset)
+                self.retention.append(record.topic, record.offset, message_frame(record))
+        return len(records), durable
+
+    def catch_up(self, node_id, since):
+        """Retrimite unui nod revenit înregistrările acceptate de acest nod ca lider al
+        partițiilor lui cât timp a lipsit (de la offset-ul local `since`).
+
+        Nodul devine urmăritor (primește replicarea, nu conduce) sub lacăt, după ultima
+        înregistrare retrimisă, ca fluxul de replicare să păstreze ordinea jurnalului.
+        Returnează un Future rezolvat când nodul a confirmat toate înregistrările."""
+        cluster_map = self.cluster.map
+        acks = []
+
+        def resend(start, end):
+            for offset, record in self.log.iter_from(start):
+                if offset >= end:
+                    break
+                if node_id in cluster_map.replicas(record.topic) and \
+                        cluster_map.owner(record.topic) == self.cluster.node_id:
+                    record.offset = offset
+                    acks.append(self.replicator.stream(node_id).ship(record))
+
+        result = Future()
+        if self.replicator is None:
+            cluster_map.mark_syncing(node_id)
+            result.set_result(0)
+            return result
+        # Partea mare a restanței fără lacăt; restul, scris între timp, sub lacăt
+        middle = self.log.next_offset
+        resend(since, middle)
+        with self.subscribers_lock:
+            resend(middle, self.log.next_offset)
+            cluster_map.mark_syncing(node_id)
+
+        def finish():
+            error = next((f.exception() for f in acks if f.exception() is not None), None)
+            if error is None:
+                result.set_result(len(acks))
+            else:
+                result.set_exception(error)
+        when_all(acks, finish)
+        return result
+
+    def remote_owner(self, topic):
+        """Nodul care deține topic-ul, dacă nu este nodul curent (None în afara unui cluster)"""
+        if self.cluster is None or not isinstance(topic, str):
+            return None
+        return self.cluster.remote_owner(topic)
+
+    def route_message(self, topic, message):
+        """Publică local sau, în cluster, trimite mesajul nodului care deține topic-ul (fără răspuns)"""
+        owner = self.remote_owner(topic)
+        if owner is None:
+            return self.submit_message(topic, message)[0]
+        self.cluster.forward(owner, dict(message, type='PUBLISH'))
+        return None
+
+    def export_views(self, json_path='messages.json', xml_path='messages.xml', text_path='messages.txt'):
+        """Generează fișierele JSON/text din jurnal, la cerere; arhiva XML este completată incremental"""
+        def records(format_filter):
+            for _, record in self.log.iter_from(0):
+                if format_filter(record.format):
+                    yield record.to_dict()
+
+        counts = {
+            json_path: export_json(records(lambda f: f == 'json'), json_path),
+            xml_path: self.export_xml_archive(xml_path),
+            text_path: export_text(records(lambda f: f not in ('json', 'xml')), text_path),
+        }
+        for path, count in counts.items():
+            print(f"📁 Exportat {count} mesaje în {path}")
+        return counts
+
+    def export_xml_archive(self, path='messages.xml'):
+        """Adaugă în arhiva XML doar mesajele scrise în jurnal de la exportul anterior.
+
+        Arhiva reține primul offset neexportat; dacă lipsește (sau jurnalul este altul),
+        arhiva este rescrisă din jurnal. Returnează numărul de mesaje adăugate."""
+        with XMLSink(path) as sink:
+            if sink.next_offset is None or sink.next_offset > self.log.next_offset:
+                sink.reset()
+            start = sink.next_offset or 0
+            end = self.log.next_offset
+            count = sink.append(record.to_dict() for offset, record in self.log.iter_from(start)
+                                if offset < end and record.format == 'xml')
+            sink.mark(end)
+        return count
+
+    def match_subscribers(self, topic):
+        """Subscriberii topic-ului, inclusiv cei ai topic-urilor către care există rute"""
+        with self.subscribers_lock:
+            return self._match_subscribers_locked(self._expand_topics_locked(topic))
+
+    def _expand_topics_locked(self, topic):
+        """Topic-ul și toate topic-urile țintă la care ajunge prin rute"""
+        topics = [topic]
+        seen = {topic}
+        for current in topics:
+            for target in self.routes.match(current):
+                if target not in seen:
+                    seen.add(target)
+                    topics.append(target)
+        return topics
+
+    def _match_subscribers_locked(self, topics):
+        subscribers = set()
+        for current in topics:
+            subscribers |= self.subscribers.match(current)
+        return subscribers
+
+    def add_subscriber(self, topic, subscriber, from_offset=None, from_timestamp=None):
+        """Înregistrează un subscriber la un topic sau șablon (ex: sensors.*.temp, sensors.#).
+
+        Cu from_offset / from_timestamp, subscriber-ul primește întâi mesajele reținute
+        începând de acolo; returnează numărul de mesaje retrimise."""
+        if topic == 'all':
+            topic = MULTI_LEVEL
+        with self.subscribers_lock:
+            self.subscribers.add(topic, subscriber)
+            if from_offset is None and from_timestamp is None:
+                return 0
+
+            # Sub același lacăt, ca niciun mesaj nou să nu ajungă înaintea celor retrimise
+            entries = self.retention.replay(lambda t: topic_matches(topic, t), from_offset, from_timestamp)
+            convert = json_message_frame if subscriber.encoding != ENCODING_RECORD else bytes
+            for i in range(0, len(entries), self.REPLAY_CHUNK):
+                chunk = entries[i:i + self.REPLAY_CHUNK]
+                subscriber.deliver(b''.join(convert(frame) for _, _, frame in chunk))
+        return len(entries)
+
+    def remove_subscriber(self, subscriber):
+        """Elimină subscriber-ul de la toate topic-urile și din grupurile de consumatori"""
+        with self.subscribers_lock:
+            if self.subscribers.remove_value(subscriber):
+                self.disconnected_subscribers += 1
+        subscriber.close_connection()
+        for consumer in self.consumer_groups.leave(subscriber):
+            self.remove_subscriber(consumer)
+
+    def join_group(self, group, topic, consumer, prefetch=10):
+        """Adaugă un consumator într-un grup: fiecare mesaj ajunge la un singur membru"""
+        if topic == 'all':
+            topic = MULTI_LEVEL
+        for failed in self.consumer_groups.join(group, topic, consumer, prefetch):
+            self.remove_subscriber(failed)
+
+    def settle(self, consumer, delivery_tags, ack=True, requeue=True):
+        """Procesează ACK/NACK de la un consumator; returnează numărul de livrări confirmate"""
+        settled, failed = self.consumer_groups.settle(consumer, delivery_tags, ack, requeue)
+        for member in failed:
+            self.remove_subscriber(member)
+        return settled
+
+    def redeliver_expired(self, interval=1):
+        """Relivrează periodic mesajele neconfirmate în timpul de vizibilitate"""
+        while True:
+            time.sleep(interval)
+            for failed in self.consumer_groups.expire():
+                self.remove_subscriber(failed)
 
-                f.seek(0)
-                json.dump(messages, f, indent=2, ensure_ascii=False)
-                f.truncate()
-        except Exception as e:
-            print(f"Eroare salvare JSON: {e}")
+    def expire_retention(self, interval=5):
+        """Curăță periodic mesajele reținute care au depășit vârsta maximă"""
+        while True:
+            time.sleep(interval)
+            self.retention.expire()
+
+    def get_fanout_statistics(self):
+        """Adâncimea cozilor și numărul de mesaje pierdute, pe toți subscriberii"""
+        with self.subscribers_lock:
+            unique = self.subscribers.values()
+        queues = [s.outbound.get_statistics() for s in unique if s.outbound is not None]
+        return {
+            'subscribers': len(queues),
+            'queue_depth': sum(q['depth'] for q in queues),
+            'max_queue_depth': max((q['max_depth'] for q in queues), default=0),
+            'enqueued': sum(q['enqueued'] for q in queues),
+            'sent': sum(q['sent'] for q in queues),
+            'dropped': sum(q['dropped'] for q in queues),
+            'disconnected': self.disconnected_subscribers,
+        }
 
-    def _save_xml_message(self, message):
-        """Salvează mesajul XML în fișier"""
-        try:
-            # Verificăm dacă fișierul există și are conținut valid
-            if os.path.exists('messages.xml') and os.path.getsize('messages.xml') > 0:
-                try:
-                    tree = ET.parse('messages.xml')
-                    root = tree.getroot()
-                except ET.ParseError:
-                    # Dacă fișierul este corupt, creăm unul nou
-                    root = ET.Element("messages")
-                    tree = ET.ElementTree(root)
-            else:
-                root = ET.Element("messages")
-                tree = ET.ElementTree(root)
+    def get_statistics(self):
+        """Metricile broker-ului (contoare, histograme) împreună cu starea cozilor și a grupurilor"""
+        statistics = METRICS.snapshot()
+        statistics['fanout'] = self.get_fanout_statistics()
+        statistics['retention'] = self.retention.get_statistics()
+        statistics['consumer_groups'] = self.consumer_groups.get_statistics()
+        statistics['storage'] = self.log.get_statistics()
+        if self.cluster is not None:
+            statistics['cluster'] = self.cluster.get_statistics()
+        if self.replicator is not None:
+            statistics['replication'] = self.replicator.get_statistics()
+        with self.subscribers_lock:
+            statistics['topics'] = {topic: {'messages': count, 'last_offset': last}
+                                    for topic, (count, last) in self.topic_offsets.items()}
+        return statistics
 
-            # Creăm elementul message conform schemei XSD
-            msg_element = ET.Element("message")
+    def add_route(self, topic, target):
+        """Adaugă o rută: mesajele care se potrivesc cu topic-ul (șablon) sunt
+        livrate și subscriberilor topic-ului țintă"""
+        if is_pattern(target):
+            raise ValueError(f"Route target must be a concrete topic: {target}")
+        with self.subscribers_lock:
+            previous = self.routing_table.get(topic)
+            if previous is not None:
+                self.routes.remove(topic, previous)
+            self.routes.add(topic, target)
+            self.routing_table[topic] = target
 
-            ET.SubElement(msg_element, "id").text = message['id']
-            ET.SubElement(msg_element, "topic").text = message['topic']
-            ET.SubElement(msg_element, "timestamp").text = message['timestamp']
 
-            content_elem = ET.SubElement(msg_element, "content")
-            content_elem.text = message['content']
+# =============================================
+# Procesarea comenzilor (comună modului threaded și asyncio)
+# =============================================
+class MessageProcessor:
+    """Logica PUBLISH/SUBSCRIBE; clasele derivate implementează send_frame,
+    start_writer și close_connection"""
 
-            root.append(msg_element)
+    outbound = None
+    encoding = ENCODING_JSON
 
-            # Scriem înapoi în fișier
-            with open('messages.xml', 'w', encoding='utf-8') as f:
-                f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-                f.write(ET.tostring(root, encoding='unicode'))
+    accepted = METRICS.counter('messages_accepted')
+    rejected = METRICS.counter('messages_rejected')
+    validation_time = METRICS.histogram('validation_time_us')
 
-        except Exception as e:
-            print(f"Eroare salvare XML: {e}")
+    def send_frame(self, opcode, payload):
+        raise NotImplementedError
 
-    def _save_text_message(self, message):
-        """Salvează mesajul text în fișier"""
-        try:
-            with open('messages.txt', 'a', encoding='utf-8') as f:
-                f.write(f"[{message['timestamp']}] {message['topic']}: {message['content']}\n")
-        except Exception as e:
-            print(f"Eroare salvare text: {e}")
+    def start_writer(self):
+        """Pornește scrierea asincronă a cozii de ieșire"""
+        raise NotImplementedError
 
-    def add_subscriber(self, topic, subscriber):
-        """Înregistrează un subscriber la un topic"""
-        self.subscribers[topic].append(subscriber)
+    def close_connection(self):
+        raise NotImplementedError
 
-    def add_route(self, topic, target):
-        """Adaugă o rută pentru un topic"""
-        self.routing_table[topic] = target
+    def respond(self, request, payload, deferred=False):
+        """Trimite răspunsul; 'seq' din cerere este returnat pentru clienții cu pipelining.
 
+        deferred=True pentru răspunsurile trimise din firul altcuiva (commit-ul jurnalului,
+        confirmările de replicare): acestea nu au voie să blocheze în scrierea pe socket"""
+        if 'seq' in request:
+            payload['seq'] = request['seq']
+        if deferred:
+            self.send_deferred(OP_RESPONSE, payload)
+        else:
+            self.send_frame(OP_RESPONSE, payload)
 
-# =============================================
-# Validatori XML și JSON
-# =============================================
-class XMLValidator:
-    def __init__(self, xsd_path):
-        self.schema = None
-        try:
-            with open(xsd_path, 'r') as f:
-                schema_root = etree.XML(f.read())
-            self.schema = etree.XMLSchema(schema_root)
-            print("✅ Schema XSD încărcată cu succes!")
-        except Exception as e:
-            print(f"❌ Eroare încărcare schema XSD: {e}")
+    def send_deferred(self, opcode, payload):
+        """Trimite un cadru fără a bloca firul apelant (implicit, send_frame nu blochează)"""
+        self.send_frame(opcode, payload)
 
-    def validate(self, xml_string):
-        if not self.schema:
-            print("⚠️  Fără schema XSD, se acceptă orice XML")
-            return True
+    def respond_later(self, request, future):
+        """Trimite ca răspuns rezultatul unui Future (ex: răspunsul nodului proprietar)"""
+        def done(future):
+            try:
+                response = dict(future.result())
+                response.pop('seq', None)
+            except Exception as e:
+                response = {'status': 'ERROR', 'message': str(e)}
+            try:
+                self.respond(request, response, deferred=True)
+            except (OSError, ConnectionError):
+                pass
+        future.add_done_callback(done)
+
+    def respond_when_durable(self, request, durable, payload):
+        """Trimite răspunsul abia după ce jurnalul a atins punctul de durabilitate"""
+        def done(future):
+            error = future.exception()
+            response = payload if error is None else {'status': 'ERROR', 'message': f'Not durable: {error}'}
+            try:
+                self.respond(request, response, deferred=True)
+            except (OSError, ConnectionError):
+                pass
+        durable.add_done_callback(done)
+
+    def check_publish(self, topic, format_type, content, result=None):
+        """Returnează None pentru un mesaj acceptat, altfel mesajul de eroare"""
+        if result is not None:
+            return check_publish(self.validator, topic, format_type, content, result)
+        started = time.perf_counter()
+        error_msg = check_publish(self.validator, topic, format_type, content)
+        self.validation_time.observe((time.perf_counter() - started) * 1e6)
+        return error_msg
+
+    def validate_batch(self, batch):
+        """Validează un lot; timpul este înregistrat ca medie per mesaj"""
+        started = time.perf_counter()
+        results = self.validator.validate_many((m.get('format', 'text'), m.get('content')) for m in batch)
+        if results:
+            elapsed = (time.perf_counter() - started) * 1e6 / len(results)
+            for _ in results:
+                self.validation_time.observe(elapsed)
+        return results
 
-        try:
-            root = etree.fromstring(xml_string)
-            self.schema.validate(root)
-            print("✅ Validare XSD: Mesaj XML valid")
-            return True
-        except etree.XMLSyntaxError as e:
-            print(f"❌ Eroare parsare XML: {e}")
-            return False
-        except Exception as e:
-            print(f"❌ Eroare validare: {e}")
-            return False
+    def process_message(self, message):
+        msg_type = message.get('type')
+        topic = message.get('topic')
+        content = message.get('content')
+        format_type = message.get('format', 'text')
 
+        debug_sampled("Processing message: type=%s, topic=%s, format=%s", msg_type, topic, format_type)
 
-class JSONValidator:
-    def __init__(self, schema_path):
-        self.schema = None
+        if msg_type == 'PUBLISH':
+            # În cluster, publicarea este trimisă nodului care deține partiția topic-ului
+            owner = self.broker.remote_owner(topic)
+            if owner is not None and not message.get('forwarded'):
+                self.respond_later(message, self.broker.cluster.forward(owner, message))
+                return
 
-        print(f"\n🔍 JSONValidator initialization:")
-        print(f"   JSON Schema path: {schema_path}")
-        print(f"   File exists: {os.path.exists(schema_path)}")
+            error_msg = self.check_publish(topic, format_type, content)
+            if error_msg:
+                self.rejected.inc()
+                self.respond(message, {
+                    'status': 'ERROR',
+                    'message': error_msg
+                })
+                return
 
-        if not os.path.exists(schema_path):
-            print(f"❌ JSON Schema file not found: {schema_path}")
-            return
+            msg_id, durable = self.broker.submit_message(topic, message)
+            (self.accepted if msg_id is not None else self.rejected).inc()
+            self.respond_when_durable(message, durable, {'status': 'OK', 'id': msg_id})
 
-        try:
-            with open(schema_path, 'r') as f:
-                self.schema = json.load(f)
-            print("✅ JSON Schema loaded successfully!")
-        except Exception as e:
-            print(f"❌ Error loading JSON schema: {e}")
+        elif msg_type == 'PUBLISH_BATCH':
+            batch = message.get('messages') or []
+            if not isinstance(batch, list) or not all(isinstance(item, dict) for item in batch):
+                self.rejected.inc()
+                self.respond(message, {'status': 'ERROR',
+                                       'message': 'messages must be a list of message objects'})
+                return
+            if self.broker.cluster is not None and not message.get('forwarded'):
+                local, remote = self.broker.cluster.split(batch)
+                if remote:
+                    self.publish_distributed_batch(message, batch, local, remote)
+                    return
+            response, durable = self.publish_batch(batch)
+            # Jurnalul confirmă în ordinea offset-urilor: ultimul mesaj durabil implică tot lotul
+            if durable is None:
+                self.respond(message, response)
+            else:
+                self.respond_when_durable(message, durable, response)
+
+        elif msg_type == 'SUBSCRIBE':
+            try:
+                validate_pattern(topic if topic != 'all' else MULTI_LEVEL)
+            except ValueError as e:
+                self.respond(message, {'status': 'ERROR', 'message': str(e)})
+                return
+            # Poziția de start se verifică înainte de înregistrare: o valoare greșită
+            # nu trebuie să lase în trie un subscriber fără răspuns
+            from_offset = message.get('from_offset')
+            from_timestamp = message.get('from_timestamp')
+            if from_offset is not None and (not isinstance(from_offset, int) or
+                                            isinstance(from_offset, bool) or from_offset < 0):
+                self.respond(message, {'status': 'ERROR', 'message': f'Invalid from_offset: {from_offset!r}'})
+                return
+            if from_timestamp is not None and (not isinstance(from_timestamp, (int, float)) or
+                                               isinstance(from_timestamp, bool)):
+                self.respond(message, {'status': 'ERROR',
+                                       'message': f'Invalid from_timestamp: {from_timestamp!r}'})
+                return
+            group = message.get('group')
+            prefetch = message.get('prefetch', 10)
+            if group is not None and not isinstance(group, str):
+                self.respond(message, {'status': 'ERROR', 'message': f'Invalid group: {group!r}'})
+                return
+            if not isinstance(prefetch, int) or isinstance(prefetch, bool):
+                self.respond(message, {'status': 'ERROR', 'message': f'Invalid prefetch: {prefetch!r}'})
+                return
+            encoding = message.get('encoding', ENCODING_JSON)
+            if encoding not in ENCODINGS:
+                self.respond(message, {'status': 'ERROR', 'message': f'Unknown encoding: {encoding!r}'})
+                return
+            # Toate subscrierile unei conexiuni folosesc aceeași codificare (ultima cerută)
+            self.encoding = encoding
+            if self.outbound is None:
+                self.outbound = SubscriberQueue(**self.broker.fanout_options)
+                self.start_writer()
+            self.respond(message, {'status': 'SUBSCRIBED'})
+            if group:
+                self.broker.join_group(group, topic, self, prefetch)
+            else:
+                self.broker.add_subscriber(topic, self, from_offset=from_offset,
+                                           from_timestamp=from_timestamp)
+
+        elif msg_type in ('ACK', 'NACK'):
+            tags = message.get('delivery_tags')
+            if tags is None:
+                tags = [message.get('delivery_tag')]
+            if not isinstance(tags, list) or \
+                    not all(isinstance(tag, int) and not isinstance(tag, bool) for tag in tags):
+                self.respond(message, {'status': 'ERROR',
+                                       'message': 'delivery_tags must be a list of integers'})
+                return
+            settled = self.broker.settle(self, tags, ack=msg_type == 'ACK',
+                                         requeue=message.get('requeue', True))
+            # Confirmările sunt fire-and-forget, cu excepția celor care cer răspuns prin 'seq'
+            if 'seq' in message:
+                self.respond(message, {'status': 'OK', 'settled': settled})
+
+        elif msg_type == 'REPLICATE':
+            # Înregistrările ajung direct în jurnal: una invalidă ar bloca repornirea broker-ului
+            records = message.get('records') or []
+            if not isinstance(records, list):
+                error_msg = 'records must be a list'
+            else:
+                error_msg = next(filter(None, map(invalid_record, records)), None)
+            if error_msg:
+                self.respond(message, {'status': 'ERROR', 'message': error_msg})
+                return
+            applied, durable = self.broker.apply_replicated(records)
+            if durable is None:
+                self.respond(message, {'status': 'OK', 'applied': applied})
+            else:
+                self.respond_when_durable(message, durable, {'status': 'OK', 'applied': applied})
+
+        elif msg_type == 'CLUSTER':
+            self.respond(message, {'status': 'OK', 'node_id': self.broker.cluster.node_id,
+                                   'cluster': self.broker.cluster.map.to_dict()})
+
+        elif msg_type == 'STATS':
+            statistics = self.broker.get_statistics()
+            statistics['validation'] = self.validator.get_statistics()
+            self.respond(message, {'status': 'OK', 'statistics': statistics})
+
+    def publish_distributed_batch(self, request, batch, local, remote):
+        """Publică partea locală a lotului, trimite restul nodurilor proprietare și
+        răspunde o singură dată, cu ID-urile în ordinea lotului original"""
+        response, durable = self.publish_batch([batch[i] for i in local])
+        local_result = Future()
+
+        def local_done(future):
+            if future.exception() is not None:
+                local_result.set_exception(future.exception())
+            else:
+                local_result.set_result(response)
+        if durable is None:
+            local_result.set_result(response)
+        else:
+            durable.add_done_callback(local_done)
+
+        parts = [(local, local_result)]
+        for node_id, indexes in remote.items():
+            forwarded = {'type': 'PUBLISH_BATCH', 'messages': [batch[i] for i in indexes]}
+            parts.append((indexes, self.broker.cluster.forward(node_id, forwarded)))
+
+        merged = Future()
+        when_all((future for _, future in parts),
+                 lambda: merged.set_result(merge_batch_responses(len(batch), parts)))
+        self.respond_later(request, merged)
+
+    def publish_batch(self, batch):
+        """Un singur cadru cu mai multe mesaje: validare în lot, un singur răspuns.
+
+        Returnează (răspuns, Future-ul de durabilitate al ultimului mesaj sau None)"""
+        results = self.validate_batch(batch)
+        ids = []
+        errors = []
+        durable = None
+        for index, (item, result) in enumerate(zip(batch, results)):
+            error_msg = self.check_publish(item.get('topic'), item.get('format', 'text'),
+                                           item.get('content'), result)
+            if error_msg:
+                ids.append(None)
+                errors.append({'index': index, 'message': error_msg})
+            else:
+                msg_id, submitted = self.broker.submit_message(item['topic'], item)
+                ids.append(msg_id)
+                if msg_id is None:
+                    errors.append({'index': index, 'message': str(submitted.exception())})
+                else:
+                    durable = submitted
+        self.accepted.inc(len(batch) - len(errors))
+        self.rejected.inc(len(errors))
+        response = {
+            'status': 'ERROR' if errors else 'OK',
+            'ids': ids,
+            'errors': errors
+        }
+        return response, durable
 
-    def validate(self, json_string):
-        if not self.schema:
-            print("⚠️  JSON VALIDATION: No JSON schema, accepting any JSON")
-            return True
+    def deliver(self, frame):
+        """Pune un cadru în coada de ieșire fără a bloca publisher-ul"""
+        return self.outbound is not None and self.outbound.offer(frame)
 
-        try:
-            data = json.loads(json_string)
-            jsonschema.validate(instance=data, schema=self.schema)
-            print("✅ JSON validation: Valid JSON message")
-            return True
-        except json.JSONDecodeError as e:
-            print(f"❌ JSON parsing error: {e}")
-            return False
-        except jsonschema.ValidationError as e:
-            print(f"❌ JSON validation error: {e}")
-            return False
-        except Exception as e:
-            print(f"❌ JSON validation error: {e}")
-            return False
+    def send_message(self, message):
+        self.deliver(encode_frame(OP_MESSAGE, message))
 
 
 # =============================================
 # Handler pentru Conexiuni TCP
 # =============================================
-class ClientHandler(threading.Thread):
-    def __init__(self, client_socket, broker, xml_validator, json_validator):
+class ClientHandler(MessageProcessor, threading.Thread):
+    def __init__(self, client_socket, broker, validator):
         super().__init__()
         self.socket = client_socket
         self.broker = broker
-        self.xml_validator = xml_validator
-        self.json_validator = json_validator
+        self.validator = validator
+        self.decoder = FrameDecoder()
+        self.send_lock = threading.Lock()
+        self.replies = None
+        self.replies_lock = threading.Lock()
 
     def run(self):
-        while True:
-            try:
-                data = self.socket.recv(4096)
-                if not data:
+        # Conexiunea este închisă și subscriber-ul eliminat la orice ieșire din buclă
+        try:
+            while True:
+                try:
+                    data = self.socket.recv(65536)
+                    if not data:
+                        break
+
+                    for opcode, payload in self.decoder.feed(data):
+                        self.process_message(message_from_frame(opcode, payload))
+                except ProtocolError as e:
+                    logger.warning("Protocol error, closing connection: %s", e)
                     break
+                except (EOFError, ConnectionResetError, socket.error):
+                    break
+        finally:
+            self.broker.remove_subscriber(self)
+
+    def send_frame(self, opcode, payload):
+        self.write(encode_frame(opcode, payload))
+
+    def write(self, data):
+        """Scrie pe socket; lacătul evită intercalarea cadrelor de pe fire diferite"""
+        with self.send_lock:
+            self.socket.sendall(data)
+
+    def send_deferred(self, opcode, payload):
+        """Răspunsurile amânate trec printr-o coadă proprie, golită de un fir de scriere
+        pornit la prima folosire: firul de commit nu face niciodată sendall"""
+        with self.replies_lock:
+            if self.replies is None:
+                self.replies = SubscriberQueue(max_size=MAX_PENDING_REPLIES, policy=DISCONNECT)
+                ThreadedWriter(self.replies, self.write,
+                               on_error=lambda: self.broker.remove_subscriber(self)).start()
+        if not self.replies.offer(encode_frame(opcode, payload)):
+            if not self.replies.closed:
+                logger.warning("Client is not reading its replies, closing connection")
+            self.broker.remove_subscriber(self)
+
+    def start_writer(self):
+        ThreadedWriter(self.outbound, self.write, on_error=lambda: self.broker.remove_subscriber(self)).start()
+
+    def close_connection(self):
+        if self.outbound is not None:
+            self.outbound.close()
+        if self.replies is not None:
+            self.replies.close()
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
 
-                message = pickle.loads(data)
-                self.process_message(message)
-            except (EOFError, ConnectionResetError, socket.error):
-                break
 
-    def process_message(self, message):
-        msg_type = message.get('type')
-        topic = message.get('topic')
-        content = message.get('content')
-        format_type = message.get('format', 'text')
+# =============================================
+# Conexiuni TCP și UDP pe o singură buclă asyncio
+# =============================================
+class AsyncClientProtocol(MessageProcessor, asyncio.Protocol):
+    """O conexiune TCP servită de bucla de evenimente, fără fir dedicat"""
 
-        print(f"📨 Processing message: type={msg_type}, topic={topic}, format={format_type}")
+    def __init__(self, broker, validator, loop):
+        self.broker = broker
+        self.validator = validator
+        self.loop = loop
+        self.transport = None
+        self.decoder = FrameDecoder()
+        self.paused = False
 
-        if msg_type == 'PUBLISH':
-            # Validare în funcție de format
-            validation_passed = True
-            error_msg = ''
-
-            if format_type == 'xml':
-                print("🔍 Validating XML...")
-                if not self.xml_validator.validate(content):
-                    validation_passed = False
-                    error_msg = 'XML invalid according to XSD schema'
-            elif format_type == 'json':
-                print("🔍 Validating JSON...")
-                if not self.json_validator.validate(content):
-                    validation_passed = False
-                    error_msg = 'JSON invalid according to JSON schema'
-
-            if not validation_passed:
-                print(f"❌ Message rejected: {error_msg}")
-                self.socket.send(pickle.dumps({
-                    'status': 'ERROR',
-                    'message': error_msg
-                }))
+    def connection_made(self, transport):
+        self.transport = transport
+        logger.debug("TCP client connected: %s", transport.get_extra_info('peername'))
+
+    def data_received(self, data):
+        try:
+            for opcode, payload in self.decoder.feed(data):
+                self.process_message(message_from_frame(opcode, payload))
+        except ProtocolError as e:
+            logger.warning("Protocol error, closing connection: %s", e)
+            self.transport.close()
+
+    def connection_lost(self, exc):
+        self.transport = None
+        self.broker.remove_subscriber(self)
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+        self._drain()
+
+    def start_writer(self):
+        self.outbound.on_ready = lambda: self.loop.call_soon_threadsafe(self._drain)
+
+    def _drain(self):
+        """Golește coada în loturi până când bufferul transportului se umple"""
+        while self.transport is not None and not self.paused:
+            batch = self.outbound.poll_batch()
+            if not batch:
                 return
+            self.transport.write(b''.join(batch))
+
+    def close_connection(self):
+        if self.outbound is not None:
+            self.outbound.close()
+        if self.transport is not None:
+            self.loop.call_soon_threadsafe(self.transport.close)
+
+    def send_frame(self, opcode, payload):
+        """Scrie cadrul pe transport; din alte fire, scrierea e programată pe buclă"""
+        transport = self.transport
+        if transport is None or transport.is_closing():
+            raise ConnectionError("Connection closed")
+        frame = encode_frame(opcode, payload)
+        if _running_loop() is self.loop:
+            transport.write(frame)
+        else:
+            self.loop.call_soon_threadsafe(transport.write, frame)
 
-            self.broker.add_message(topic, message)
-            self.socket.send(pickle.dumps({'status': 'OK'}))
-            print("✅ Message processed and saved successfully")
 
-        elif msg_type == 'SUBSCRIBE':
-            self.broker.add_subscriber(topic, self)
-            self.socket.send(pickle.dumps({'status': 'SUBSCRIBED'}))
+class AsyncUDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, network_server):
+        self.network_server = network_server
 
-    def send_message(self, message):
-        try:
-            self.socket.send(pickle.dumps(message))
-        except:
-            pass
+    def datagram_received(self, data, addr):
+        self.network_server.handle_udp_datagram(data, addr)
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
 
 
 # =============================================
 # Server TCP cu Suport pentru UDP Broadcast
 # =============================================
 class NetworkServer:
-    def __init__(self, host='localhost', tcp_port=9999, udp_port=8888):
+    MODES = ('threaded', 'asyncio')
+
+    def __init__(self, host='localhost', tcp_port=9999, udp_port=8888, mode='threaded',
+                 queue_size=1024, overflow_policy=DROP_OLDEST, retention_policy=None, node_id=0,
+                 dedup_window=None, udp_workers=0, visibility_timeout=30, stats_port=None,
+                 fsync_policy=FSYNC_NONE, commit_interval=0.002, commit_bytes=1024 * 1024,
+                 recovery_window=100000, storage_dir='data', cluster_nodes=None, partitions=64,
+                 replication=1, ack_level=ACK_LEADER):
         print("\n" + "=" * 50)
         print("🚀 Starting server...")
         print("=" * 50)
 
-        self.broker = MessageBroker()
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown server mode: {mode}")
+
+        self.broker = MessageBroker(storage_dir=storage_dir, queue_size=queue_size, overflow_policy=overflow_policy,
+                                    retention_policy=retention_policy, node_id=node_id,
+                                    dedup_window=dedup_window, visibility_timeout=visibility_timeout,
+                                    fsync_policy=fsync_policy, commit_interval=commit_interval,
+                                    commit_bytes=commit_bytes, recovery_window=recovery_window)
         self.xml_validator = XMLValidator('schema.xsd')
         self.json_validator = JSONValidator('schema.json')
+        for validator in (self.xml_validator, self.json_validator):
+            if validator.error:
+                print(f"❌ {validator.error}")
+        self.validator = ValidationEngine(self.xml_validator, self.json_validator)
         self.tcp_port = tcp_port
         self.udp_port = udp_port
         self.host = host
+        self.mode = mode
+        self.udp_workers = udp_workers
+        self.udp_ingest = None
+        self.stats_port = stats_port
+
+        # Fără --cluster, nodul este singur în hartă și deține toate partițiile
+        self.cluster_map = ClusterMap(cluster_nodes or {node_id: (host, tcp_port)}, partitions,
+                                      replication=replication)
+        self.broker.cluster = ClusterRouter(self.cluster_map, node_id)
+        self.broker.cluster.broker = self.broker
+        if self.cluster_map.replication > 1:
+            self.broker.replicator = Replicator(self.broker.cluster, ack_level)
 
     def start_tcp_server(self):
         try:
@@ -384,67 +996,130 @@ class NetworkServer:
             while True:
                 try:
                     client_socket, addr = server.accept()
-                    print(f"📡 TCP Client connected: {addr}")
-                    handler = ClientHandler(client_socket, self.broker, self.xml_validator, self.json_validator)
+                    logger.debug("TCP client connected: %s", addr)
+                    handler = ClientHandler(client_socket, self.broker, self.validator)
                     handler.start()
                 except Exception as e:
-                    print(f"Error accepting TCP client: {e}")
+                    logger.error("Error accepting TCP client: %s", e)
         except Exception as e:
             print(f"❌ Error starting TCP server: {e}")
 
+    def _create_udp_socket(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(('', self.udp_port))
+        return server
+
     def start_udp_broadcast_server(self):
         try:
-            server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            server.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            server.bind(('', self.udp_port))
+            server = self._create_udp_socket()
             print(f"📢 UDP Broadcast Server started on port {self.udp_port}")
 
             while True:
-                try:
-                    data, addr = server.recvfrom(4096)
-                    message = pickle.loads(data)
-                    topic = message.get('topic')
-                    content = message.get('content')
-                    format_type = message.get('format', 'text')
-
-                    print(f"📨 UDP message received from {addr}: topic={topic}, format={format_type}")
-
-                    # Validare în funcție de format
-                    validation_passed = True
-                    if format_type == 'xml':
-                        if not self.xml_validator.validate(content):
-                            validation_passed = False
-                            print("❌ Invalid XML message rejected")
-                    elif format_type == 'json':
-                        if not self.json_validator.validate(content):
-                            validation_passed = False
-                            print("❌ Invalid JSON message rejected")
-
-                    if validation_passed:
-                        self.broker.add_message(topic, message)
-                        print("✅ Valid UDP message processed")
-                    else:
-                        print("❌ UDP message rejected - validation failed")
-
-                except Exception as e:
-                    print(f"Error processing UDP: {e}")
+                data, addr = server.recvfrom(65535)
+                self.handle_udp_datagram(data, addr)
         except Exception as e:
             print(f"❌ Error starting UDP server: {e}")
 
+    def handle_udp_datagram(self, data, addr):
+        """Validează și stochează un mesaj primit prin UDP"""
+        try:
+            message = message_from_frame(*decode_datagram(data))
+            topic = message.get('topic')
+            content = message.get('content')
+            format_type = message.get('format', 'text')
+
+            debug_sampled("UDP message received from %s: topic=%s, format=%s", addr, topic, format_type)
+
+            if message.get('type') != 'PUBLISH':
+                MessageProcessor.rejected.inc()
+                logger.info("UDP message rejected - unsupported type: %r", message.get('type'))
+                return
+
+            # Aceleași verificări ca pe TCP: un mesaj fără topic nu ajunge în jurnal
+            started = time.perf_counter()
+            error_msg = check_publish(self.validator, topic, format_type, content)
+            MessageProcessor.validation_time.observe((time.perf_counter() - started) * 1e6)
+            if error_msg is None:
+                self.broker.route_message(topic, message)
+                MessageProcessor.accepted.inc()
+            else:
+                MessageProcessor.rejected.inc()
+                logger.info("UDP message rejected: %s", error_msg)
+
+        except Exception as e:
+            logger.error("Error processing UDP: %s", e)
+
+    async def serve_async(self):
+        """Acceptă TCP, citește conexiunile și primește UDP pe aceeași buclă"""
+        loop = asyncio.get_running_loop()
+        tcp_server = await loop.create_server(
+            lambda: AsyncClientProtocol(self.broker, self.validator, loop),
+            self.host, self.tcp_port, reuse_address=True, backlog=4096
+        )
+        print(f"🚀 TCP Server (asyncio) started on {self.host}:{self.tcp_port}")
+
+        if not self.udp_workers:
+            await loop.create_datagram_endpoint(lambda: AsyncUDPProtocol(self), sock=self._create_udp_socket())
+            print(f"📢 UDP Broadcast Server (asyncio) started on port {self.udp_port}")
+
+        async with tcp_server:
+            await tcp_server.serve_forever()
+
+    def start_async_server(self):
+        try:
+            asyncio.run(self.serve_async())
+        except Exception as e:
+            print(f"❌ Error starting asyncio server: {e}")
+
+    def get_statistics(self):
+        """Statisticile complete, servite la GET /stats"""
+        statistics = self.broker.get_statistics()
+        statistics['validation'] = self.validator.get_statistics()
+        if self.udp_ingest is not None:
+            statistics['udp_ingest'] = self.udp_ingest.get_statistics()
+        return statistics
+
+    def start_udp_ingest(self):
+        """Pornește workerii UDP; trebuie apelat înaintea celorlalte fire (folosește fork)"""
+        self.udp_ingest = UDPIngestTier(self.broker, self.udp_port, self.udp_workers)
+        self.udp_ingest.start()
+        threading.Thread(target=self.udp_ingest.report, daemon=True).start()
+
     def start_servers(self):
-        tcp_thread = threading.Thread(target=self.start_tcp_server)
-        udp_thread = threading.Thread(target=self.start_udp_broadcast_server)
+        if self.udp_workers:
+            self.start_udp_ingest()
+
+        if self.mode == 'asyncio':
+            threads = [threading.Thread(target=self.start_async_server)]
+        else:
+            threads = [threading.Thread(target=self.start_tcp_server)]
+            if not self.udp_workers:
+                threads.append(threading.Thread(target=self.start_udp_broadcast_server))
+
+        threads.append(threading.Thread(target=self.broker.expire_retention))
+        threads.append(threading.Thread(target=self.broker.redeliver_expired))
+        threads.append(threading.Thread(target=self.broker.checkpoint_periodically))
+        if len(self.cluster_map.nodes) > 1:
+            threads.append(threading.Thread(target=self.broker.cluster.monitor))
 
-        tcp_thread.daemon = True
-        udp_thread.daemon = True
+        if self.stats_port:
+            start_stats_server(self.get_statistics, self.host, self.stats_port)
+            print(f"📊 Statistics available at http://{self.host}:{self.stats_port}/stats")
 
-        tcp_thread.start()
-        udp_thread.start()
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
 
         print("\n" + "=" * 50)
-        print("✅ All servers are running and functional!")
-        print("📁 Messages are saved in: messages.json, messages.xml, messages.txt")
+        print(f"✅ All servers are running and functional! (mode: {self.mode})")
+        if len(self.cluster_map.nodes) > 1:
+            router = self.broker.cluster
+            print(f"🌐 Cluster node {router.node_id}: {router.get_statistics()['owned_partitions']}"
+                  f"/{self.cluster_map.partitions} partitions, {len(self.cluster_map.nodes)} nodes, "
+                  f"replication factor {self.cluster_map.replication}")
+        print(f"📁 Messages are stored in the segmented log: {self.broker.storage_dir}/")
         print("\n🔍 VALIDATION STATUS:")
         print(f"   XML:  {'✅ Active' if self.xml_validator.schema else '❌ Inactive'}")
         print(f"   JSON: {'✅ Active' if self.json_validator.schema else '❌ Inactive'}")
@@ -459,9 +1134,79 @@ class NetworkServer:
             while True:
                 threading.Event().wait(1)
         except KeyboardInterrupt:
+            if self.udp_ingest is not None:
+                self.udp_ingest.stop()
+            self.broker.export_views()
+            self.broker.checkpoint()
+            self.broker.log.close()
             print("\n🛑 Server stopped")
 
 
 if __name__ == "__main__":
-    server = NetworkServer()
-    server.start_servers()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Message broker server (TCP + UDP broadcast)")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--tcp-port', type=int, default=9999)
+    parser.add_argument('--udp-port', type=int, default=8888)
+    parser.add_argument('--mode', choices=NetworkServer.MODES, default='threaded',
+                        help="threaded: un fir per conexiune; asyncio: o singură buclă de evenimente")
+    parser.add_argument('--queue-size', type=int, default=1024,
+                        help="dimensiunea maximă a cozii de ieșire per subscriber")
+    parser.add_argument('--overflow-policy', choices=OVERFLOW_POLICIES, default=DROP_OLDEST)
+    parser.add_argument('--retention-messages', type=int, default=1000,
+                        help="numărul maxim de mesaje reținute în memorie per topic")
+    parser.add_argument('--retention-bytes', type=int, default=1024 * 1024,
+                        help="numărul maxim de octeți reținuți în memorie per topic")
+    parser.add_argument('--retention-age', type=float, default=3600,
+                        help="vârsta maximă (secunde) a mesajelor reținute")
+    parser.add_argument('--node-id', type=int, default=0,
+                        help="identificatorul nodului, inclus în ID-urile mesajelor (0-1023)")
+    parser.add_argument('--dedup-window', type=float, default=None,
+                        help="fereastra (secunde) în care mesajele identice sunt ignorate")
+    parser.add_argument('--udp-workers', type=int, default=0,
+                        help="procese worker UDP cu SO_REUSEPORT (0 = un singur fir în proces)")
+    parser.add_argument('--visibility-timeout', type=float, default=30,
+                        help="secunde după care un mesaj neconfirmat dintr-un grup este relivrat")
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES, default=FSYNC_NONE,
+                        help="none: confirmare după scrierea în cache-ul OS; batch: fsync per group commit; "
+                             "message: fsync per mesaj")
+    parser.add_argument('--commit-interval', type=float, default=2,
+                        help="fereastra (ms) în care scrierile sunt grupate într-un commit")
+    parser.add_argument('--commit-bytes', type=int, default=1024 * 1024,
+                        help="dimensiunea maximă a unui group commit")
+    parser.add_argument('--recovery-window', type=int, default=100000,
+                        help="ultimele N înregistrări din jurnal citite la pornire pentru retenție")
+    parser.add_argument('--data-dir', default=None,
+                        help="directorul jurnalului (implicit data/, sau data/node-<id> în cluster)")
+    parser.add_argument('--cluster', default=None,
+                        help="nodurile clusterului, ex: 0=localhost:9999,1=localhost:10000 (include nodul curent)")
+    parser.add_argument('--partitions', type=int, default=64,
+                        help="numărul de partiții (același pe toate nodurile)")
+    parser.add_argument('--replication', type=int, default=1,
+                        help="numărul de replici ale fiecărei partiții (lider inclus)")
+    parser.add_argument('--acks', choices=ACK_LEVELS, default=ACK_LEADER,
+                        help="leader: confirmare după scrierea la lider; quorum: după majoritatea replicilor")
+    parser.add_argument('--log-level', default='INFO', choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'))
+    parser.add_argument('--log-sample-rate', type=int, default=100,
+                        help="la nivel DEBUG, se loghează un mesaj procesat din N")
+    parser.add_argument('--stats-port', type=int, default=None,
+                        help="portul HTTP pentru GET /stats (implicit dezactivat)")
+    args = parser.parse_args()
+
+    log_listener = setup_logging(getattr(logging, args.log_level))
+    set_debug_sampling(args.log_sample_rate)
+
+    cluster_nodes = parse_nodes(args.cluster) if args.cluster else None
+    data_dir = args.data_dir or (os.path.join('data', f'node-{args.node_id}') if cluster_nodes else 'data')
+
+    server = NetworkServer(args.host, args.tcp_port, args.udp_port, mode=args.mode,
+                           queue_size=args.queue_size, overflow_policy=args.overflow_policy,
+                           retention_policy=RetentionPolicy(args.retention_messages, args.retention_bytes,
+                                                            args.retention_age),
+                           node_id=args.node_id, dedup_window=args.dedup_window, udp_workers=args.udp_workers,
+                           visibility_timeout=args.visibility_timeout, stats_port=args.stats_port,
+                           fsync_policy=args.fsync, commit_interval=args.commit_interval / 1000.0,
+                           commit_bytes=args.commit_bytes, recovery_window=args.recovery_window,
+                           storage_dir=data_dir, cluster_nodes=cluster_nodes, partitions=args.partitions,
+                           replication=args.replication, ack_level=args.acks)
+    server.start_servers()
+    log_listener.stop()
\ No newline at end of file
@@ -0,0 +1,135 @@
+from collections import defaultdict
+
+
+# =============================================
+# Trie pentru topic-uri ierarhice cu wildcard-uri
+# =============================================
+# Topic-urile sunt separate prin '.', ex: sensors.roomA.temp
+#   '*' potrivește exact un nivel   (sensors.*.temp)
+#   '#' potrivește zero sau mai multe niveluri și poate fi doar ultimul (sensors.#)
+SEPARATOR = '.'
+SINGLE_LEVEL = '*'
+MULTI_LEVEL = '#'
+
+
+def split_topic(topic):
+    if not isinstance(topic, str) or not topic:
+        raise ValueError("Topic must be a non-empty string")
+    return topic.split(SEPARATOR)
+
+
+def validate_pattern(pattern):
+    """Verifică un șablon de subscriere și returnează nivelurile lui"""
+    levels = split_topic(pattern)
+    for i, level in enumerate(levels):
+        if level == MULTI_LEVEL and i != len(levels) - 1:
+            raise ValueError(f"'#' must be the last level in pattern: {pattern}")
+        if level != level.strip() or (len(level) > 1 and (SINGLE_LEVEL in level or MULTI_LEVEL in level)):
+            raise ValueError(f"Invalid topic level '{level}' in pattern: {pattern}")
+    return levels
+
+
+def is_pattern(topic):
+    return any(level in (SINGLE_LEVEL, MULTI_LEVEL) for level in topic.split(SEPARATOR))
+
+
+class _Node:
+    __slots__ = ('children', 'values')
+
+    def __init__(self):
+        self.children = {}
+        self.values = set()
+
+
+class TopicTrie:
+    """Index de șabloane: costul potrivirii depinde de adâncimea topic-ului,
+    nu de numărul de subscrieri"""
+
+    def __init__(self):
+        self.root = _Node()
+        self.patterns_by_value = defaultdict(set)
+
+    def add(self, pattern, value):
+        node = self.root
+        for level in validate_pattern(pattern):
+            node = node.children.setdefault(level, _Node())
+        node.values.add(value)
+        self.patterns_by_value[value].add(pattern)
+
+    def remove(self, pattern, value):
+        """Elimină o pereche (șablon, valoare) și curăță nodurile rămase goale"""
+        path = [self.root]
+        levels = split_topic(pattern)
+        for level in levels:
+            node = path[-1].children.get(level)
+            if node is None:
+                return False
+            path.append(node)
+
+        if value not in path[-1].values:
+            return False
+        path[-1].values.discard(value)
+
+        for level, parent, node in zip(reversed(levels), reversed(path[:-1]), reversed(path[1:])):
+            if node.values or node.children:
+                break
+            del parent.children[level]
+
+        patterns = self.patterns_by_value.get(value)
+        if patterns is not None:
+            patterns.discard(pattern)
+            if not patterns:
+                del self.patterns_by_value[value]
+        return True
+
+    def remove_value(self, value):
+        """Elimină valoarea din toate șabloanele la care este înregistrată"""
+        patterns = list(self.patterns_by_value.get(value, ()))
+        for pattern in patterns:
+            self.remove(pattern, value)
+        return len(patterns)
+
+    def match(self, topic):
+        """Returnează mulțimea valorilor ale căror șabloane se potrivesc cu topic-ul"""
+        result = set()
+        nodes = [self.root]
+        for level in split_topic(topic):
+            next_nodes = []
+            for node in nodes:
+                children = node.children
+                multi = children.get(MULTI_LEVEL)
+                if multi is not None:
+                    result |= multi.values
+                exact = children.get(level)
+                if exact is not None:
+                    next_nodes.append(exact)
+                single = children.get(SINGLE_LEVEL)
+                if single is not None:
+                    next_nodes.append(single)
+            if not next_nodes:
+                return result
+            nodes = next_nodes
+
+        for node in nodes:
+            result |= node.values
+            multi = node.children.get(MULTI_LEVEL)
+            if multi is not None:
+                result |= multi.values
+        return result
+
+    def values(self):
+        return list(self.patterns_by_value)
+
+    def __len__(self):
+        return sum(len(patterns) for patterns in self.patterns_by_value.values())
+
+
+def topic_matches(pattern, topic):
+    """Verifică dacă un singur șablon se potrivește cu un topic"""
+    levels = split_topic(topic)
+    for i, level in enumerate(split_topic(pattern)):
+        if level == MULTI_LEVEL:
+            return True
+        if i >= len(levels) or (level != SINGLE_LEVEL and level != levels[i]):
+            return False
+    return len(split_topic(pattern)) == len(levels)
@@ -0,0 +1,257 @@
+import os
+import time
+import zlib
+import struct
+import select
+import socket
+import threading
+import multiprocessing
+from multiprocessing import connection
+
+from protocol import ProtocolError, decode_datagram, encode_frame, message_from_frame, OP_PUBLISH_BATCH
+from validation import XMLValidator, JSONValidator, ValidationEngine, check_publish
+from instrumentation import logger, METRICS
+
+
+# =============================================
+# Ingestie UDP pe mai multe procese (SO_REUSEPORT)
+# =============================================
+# Kernel-ul distribuie datagramele unicast între socket-urile din grupul
+# SO_REUSEPORT, dar copiază fiecare datagramă broadcast în toate socket-urile.
+# Cu IP_PKTINFO aflăm adresa destinație: copiile broadcast sunt împărțite între
+# workeri după crc32(payload), ca fiecare mesaj să fie procesat o singură dată.
+IP_PKTINFO = getattr(socket, 'IP_PKTINFO', 8)
+PKTINFO = struct.Struct('=I4s4s')
+ANCILLARY_SIZE = socket.CMSG_SPACE(PKTINFO.size)
+
+# Contoare per worker, în memorie partajată
+RECEIVED, ACCEPTED, REJECTED, SKIPPED = range(4)
+COUNTERS_PER_WORKER = 4
+
+
+def create_reuseport_socket(port, rcvbuf=4 * 1024 * 1024):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    sock.setsockopt(socket.IPPROTO_IP, IP_PKTINFO, 1)
+    sock.bind(('', port))
+    sock.setblocking(False)
+    return sock
+
+
+def is_broadcast_copy(ancdata):
+    """Adevărat dacă destinația din antetul IP diferă de adresa locală (broadcast/multicast)"""
+    for level, kind, data in ancdata:
+        if level == socket.IPPROTO_IP and kind == IP_PKTINFO and len(data) >= PKTINFO.size:
+            _, local_address, destination = PKTINFO.unpack_from(data)
+            return local_address != destination
+    return False
+
+
+def udp_worker(worker_id, workers, port, xsd_path, json_schema_path, conn, counters, stop_event,
+               batch_size=64, rcvbuf=4 * 1024 * 1024):
+    """Procesul worker: golește socket-ul în loturi, validează și trimite mesajele acceptate"""
+    sock = create_reuseport_socket(port, rcvbuf)
+    engine = ValidationEngine(XMLValidator(xsd_path), JSONValidator(json_schema_path))
+    base = worker_id * COUNTERS_PER_WORKER
+
+    while not stop_event.is_set():
+        if not select.select([sock], [], [], 0.5)[0]:
+            continue
+
+        # Python nu expune recvmmsg: citim fără blocare până se golește bufferul sau lotul e plin
+        packets = []
+        while len(packets) < batch_size:
+            try:
+                data, ancdata, _, _ = sock.recvmsg(65535, ANCILLARY_SIZE)
+            except (BlockingIOError, InterruptedError):
+                break
+            if is_broadcast_copy(ancdata) and zlib.crc32(data) % workers != worker_id:
+                counters[base + SKIPPED] += 1
+                continue
+            packets.append(data)
+
+        accepted = []
+        rejected = 0
+        for data in packets:
+            # Un datagram invalid este respins individual; nu trebuie să oprească workerul
+            try:
+                message = message_from_frame(*decode_datagram(data))
+            except (ProtocolError, ValueError, TypeError, struct.error):
+                rejected += 1
+                continue
+            topic = message.get('topic')
+            format_type = message.get('format', 'text')
+            content = message.get('content')
+            # Aceleași verificări ca publicările TCP (topic concret, conținut șir, schema formatului)
+            if message.get('type') != 'PUBLISH' or check_publish(engine, topic, format_type, content):
+                rejected += 1
+                continue
+            accepted.append({'topic': topic, 'format': format_type, 'content': content})
+
+        if accepted:
+            try:
+                conn.send_bytes(encode_frame(OP_PUBLISH_BATCH, {'messages': accepted}))
+            except (BrokenPipeError, OSError):
+                break
+        counters[base + RECEIVED] += len(packets)
+        counters[base + ACCEPTED] += len(accepted)
+        counters[base + REJECTED] += rejected
+
+    sock.close()
+    conn.close()
+
+
+def kernel_drops(port):
+    """Numărul de datagrame pierdute de kernel pentru socket-urile de pe port (Linux)"""
+    port_hex = f"{port:04X}"
+    total = None
+    for path in ('/proc/net/udp', '/proc/net/udp6'):
+        try:
+            with open(path) as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    if fields[1].rsplit(':', 1)[1] == port_hex:
+                        total = (total or 0) + int(fields[-1])
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+class UDPIngestTier:
+    """Pornește workerii UDP și trece mesajele acceptate către broker"""
+
+    def __init__(self, broker, port=8888, workers=None, batch_size=64,
+                 xsd_path='schema.xsd', json_schema_path='schema.json', rcvbuf=4 * 1024 * 1024):
+        self.broker = broker
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.xsd_path = xsd_path
+        self.json_schema_path = json_schema_path
+        self.rcvbuf = rcvbuf
+
+        # fork evită reimportarea modulului principal în fiecare worker
+        method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.context = multiprocessing.get_context(method)
+        self.counters = self.context.Array('Q', self.workers * COUNTERS_PER_WORKER, lock=False)
+        self.stop_event = self.context.Event()
+        self.processes = []
+        self.connections = []
+        self.forwarded = 0
+        self.restarts = 0
+        self.accepted = METRICS.counter('messages_accepted')
+        self.rejected = METRICS.counter('messages_rejected')
+        self.last_sample = (time.time(), [0] * self.workers)
+
+    def start(self):
+        for worker_id in range(self.workers):
+            process, receiver = self._spawn(worker_id)
+            self.processes.append(process)
+            self.connections.append(receiver)
+
+        threading.Thread(target=self._collect, daemon=True).start()
+        print(f"📢 UDP ingest started on port {self.port} with {self.workers} worker processes")
+
+    def _spawn(self, worker_id):
+        """Pornește procesul worker cu indexul dat; returnează (proces, capătul de citire al pipe-ului)"""
+        receiver, sender = self.context.Pipe(duplex=False)
+        process = self.context.Process(
+            target=udp_worker,
+            args=(worker_id, self.workers, self.port, self.xsd_path, self.json_schema_path, sender,
+                  self.counters, self.stop_event, self.batch_size, self.rcvbuf),
+            daemon=True
+        )
+        process.start()
+        sender.close()
+        return process, receiver
+
+    def _restart(self, worker_id):
+        """Înlocuiește un worker oprit neașteptat; contoarele lui din memoria partajată continuă"""
+        old = self.processes[worker_id]
+        old.join(timeout=1)
+        logger.warning("UDP worker %d exited (code %s); restarting it", worker_id, old.exitcode)
+        process, receiver = self._spawn(worker_id)
+        self.processes[worker_id] = process
+        self.connections[worker_id] = receiver
+        self.restarts += 1
+        return receiver
+
+    def _collect(self):
+        """Primește loturile de la workeri și le adaugă în broker; repornește workerii căzuți"""
+        workers = {conn: worker_id for worker_id, conn in enumerate(self.connections)}
+        while workers:
+            for conn in connection.wait(list(workers), timeout=1):
+                try:
+                    data = conn.recv_bytes()
+                except (EOFError, OSError):
+                    # Pipe-ul se închide doar când procesul worker s-a terminat
+                    worker_id = workers.pop(conn)
+                    conn.close()
+                    if not self.stop_event.is_set():
+                        workers[self._restart(worker_id)] = worker_id
+                    continue
+                try:
+                    _, payload = decode_datagram(data)
+                    messages = payload['messages']
+                except (ProtocolError, ValueError, TypeError, KeyError) as e:
+                    logger.error("Malformed batch from UDP worker %d: %s", workers[conn], e)
+                    continue
+                for message in messages:
+                    # Un mesaj care nu poate fi publicat este respins; colectorul continuă
+                    try:
+                        self.broker.route_message(message['topic'], message)
+                    except Exception as e:
+                        logger.error("UDP message rejected on topic %r: %s",
+                                     message.get('topic') if isinstance(message, dict) else None, e)
+                        self.rejected.inc()
+                        continue
+                    self.forwarded += 1
+                    self.accepted.inc()
+
+    def get_statistics(self):
+        """Contoare și rate per worker (mesaje/s de la apelul anterior), plus pierderile din kernel"""
+        now = time.time()
+        previous_time, previous_received = self.last_sample
+        elapsed = max(now - previous_time, 1e-9)
+
+        workers = []
+        received_now = []
+        for worker_id in range(self.workers):
+            base = worker_id * COUNTERS_PER_WORKER
+            received = self.counters[base + RECEIVED]
+            received_now.append(received)
+            workers.append({
+                'worker': worker_id,
+                'alive': self.processes[worker_id].is_alive() if self.processes else False,
+                'received': received,
+                'accepted': self.counters[base + ACCEPTED],
+                'rejected': self.counters[base + REJECTED],
+                'broadcast_copies_skipped': self.counters[base + SKIPPED],
+                'rate': round((received - previous_received[worker_id]) / elapsed, 1),
+            })
+        self.last_sample = (now, received_now)
+
+        return {
+            'port': self.port,
+            'workers': workers,
+            'forwarded_to_broker': self.forwarded,
+            'worker_restarts': self.restarts,
+            'kernel_drops': kernel_drops(self.port),
+        }
+
+    def report(self, interval=10):
+        """Loghează periodic ratele workerilor și pierderile din kernel"""
+        while True:
+            time.sleep(interval)
+            stats = self.get_statistics()
+            rates = ', '.join(f"w{w['worker']}={w['rate']}/s" for w in stats['workers'])
+            logger.info("UDP ingest: %s; kernel drops=%s", rates, stats['kernel_drops'])
+
+    def stop(self):
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout=2)
@@ -0,0 +1,173 @@
+import os
+import json
+import threading
+from collections import OrderedDict, namedtuple
+
+import jsonschema
+from lxml import etree
+
+from topic_trie import is_pattern
+from instrumentation import logger
+
+
+# =============================================
+# Validare cu scheme compilate o singură dată
+# =============================================
+ValidationResult = namedtuple('ValidationResult', ['valid', 'error'])
+
+VALID = ValidationResult(True, None)
+
+
+def check_publish(validator, topic, format_type, content, result=None):
+    """Verificările unui mesaj de publicat, comune tuturor căilor (TCP, UDP, workerii UDP):
+    returnează None pentru un mesaj acceptat, altfel mesajul de eroare.
+
+    result este rezultatul validării deja făcute în lot; altfel validează acum."""
+    if not isinstance(topic, str) or not topic or is_pattern(topic):
+        return f'Invalid topic: {topic!r}'
+    if content is None:
+        return 'Missing content'
+    # Conținutul este stocat ca octeți: un număr sau un obiect JSON nu este acceptat
+    if not isinstance(content, (str, bytes)):
+        return f'Invalid content: expected a string, got {type(content).__name__}'
+    if not isinstance(format_type, str):
+        return f'Invalid format: {format_type!r}'
+
+    # Validare în funcție de format (schemele sunt deja compilate)
+    if result is None:
+        result = validator.validate(format_type, content)
+    if not result.valid:
+        if format_type == 'xml':
+            error_msg = 'XML invalid according to XSD schema'
+        else:
+            error_msg = 'JSON invalid according to JSON schema'
+        logger.info("Message rejected: %s (%s)", error_msg, result.error)
+        return error_msg
+    return None
+
+
+class XMLValidator:
+    """Validator XSD: schema este compilată o singură dată, la încărcare"""
+
+    def __init__(self, xsd_path):
+        self.schema = None
+        self.error = None
+        # XMLSchema din lxml nu este garantat thread-safe, deci validarea e serializată
+        self.lock = threading.Lock()
+        try:
+            self.schema = etree.XMLSchema(etree.parse(xsd_path))
+        except Exception as e:
+            self.error = f"Error loading XSD schema: {e}"
+
+    def check(self, xml_string):
+        if not self.schema:
+            return VALID
+
+        try:
+            data = xml_string.encode('utf-8') if isinstance(xml_string, str) else xml_string
+            root = etree.fromstring(data)
+        except (etree.XMLSyntaxError, ValueError) as e:
+            return ValidationResult(False, f"XML parsing error: {e}")
+
+        with self.lock:
+            if self.schema.validate(root):
+                return VALID
+            return ValidationResult(False, f"XSD validation error: {self.schema.error_log.last_error}")
+
+    def validate(self, xml_string):
+        return self.check(xml_string).valid
+
+
+class JSONValidator:
+    """Validator JSON Schema: clasa de validator este construită o singură dată"""
+
+    def __init__(self, schema_path):
+        self.schema = None
+        self.validator = None
+        self.error = None
+
+        if not os.path.exists(schema_path):
+            self.error = f"JSON Schema file not found: {schema_path}"
+            return
+
+        try:
+            with open(schema_path, 'r') as f:
+                schema = json.load(f)
+            validator_cls = jsonschema.validators.validator_for(schema)
+            validator_cls.check_schema(schema)
+            self.validator = validator_cls(schema)
+            self.schema = schema
+        except Exception as e:
+            self.error = f"Error loading JSON schema: {e}"
+
+    def check(self, json_string):
+        if not self.validator:
+            return VALID
+
+        try:
+            data = json.loads(json_string)
+        except (json.JSONDecodeError, TypeError) as e:
+            return ValidationResult(False, f"JSON parsing error: {e}")
+
+        error = jsonschema.exceptions.best_match(self.validator.iter_errors(data))
+        if error is None:
+            return VALID
+        return ValidationResult(False, f"JSON validation error: {error.message}")
+
+    def validate(self, json_string):
+        return self.check(json_string).valid
+
+
+class ValidationEngine:
+    """Validează mesaje după format, cu cache LRU pentru payload-uri identice"""
+
+    def __init__(self, xml_validator, json_validator, cache_size=4096, max_cached_length=64 * 1024):
+        self.validators = {'xml': xml_validator, 'json': json_validator}
+        self.cache_size = cache_size
+        self.max_cached_length = max_cached_length
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def validate(self, format_type, content):
+        """Returnează un ValidationResult; nu aruncă excepții"""
+        validator = self.validators.get(format_type)
+        if validator is None:
+            return VALID
+
+        cacheable = self.cache_size > 0 and isinstance(content, (str, bytes)) \
+            and len(content) <= self.max_cached_length
+        if cacheable:
+            key = (format_type, content)
+            with self.lock:
+                result = self.cache.get(key)
+                if result is not None:
+                    self.cache.move_to_end(key)
+                    self.hits += 1
+                    return result
+                self.misses += 1
+
+        try:
+            result = validator.check(content)
+        except Exception as e:
+            result = ValidationResult(False, f"Validation error: {e}")
+
+        if cacheable:
+            with self.lock:
+                self.cache[key] = result
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return result
+
+    def validate_many(self, messages):
+        """Validează un lot de perechi (format, conținut); returnează rezultatele în ordine"""
+        return [self.validate(format_type, content) for format_type, content in messages]
+
+    def get_statistics(self):
+        with self.lock:
+            return {
+                'cache_entries': len(self.cache),
+                'cache_hits': self.hits,
+                'cache_misses': self.misses,
+            }
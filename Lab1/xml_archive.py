@@ -0,0 +1,200 @@
+import os
+import re
+import sys
+import argparse
+import xml.etree.ElementTree as ET
+
+from topic_trie import topic_matches
+
+
+# =============================================
+# Arhivă XML scrisă incremental (streaming)
+# =============================================
+# Arhiva are forma <messages><message>...</message>...</messages>. Mesajele noi
+# sunt scrise peste eticheta de închidere, care este apoi rescrisă la final, deci
+# o adăugare costă cât mesajele adăugate, indiferent de dimensiunea arhivei.
+# Înainte de </messages> poate exista o instrucțiune <?next-offset N?>: primul
+# offset din jurnal care nu a fost încă exportat.
+XML_HEADER = b'<?xml version="1.0" encoding="UTF-8"?>\n<messages>\n'
+CLOSING_TAG = b'</messages>'
+MESSAGE_START = b'<message>'
+MESSAGE_END = b'</message>'
+NEXT_OFFSET = re.compile(rb'<\?next-offset (\d+)\?>\s*$')
+SCAN_BLOCK = 64 * 1024
+
+
+def message_element(message):
+    """Elementul <message> (aceeași structură ca exportul și schema XSD), în octeți UTF-8"""
+    element = ET.Element("message")
+    ET.SubElement(element, "id").text = str(message['id'])
+    ET.SubElement(element, "topic").text = message['topic']
+    ET.SubElement(element, "timestamp").text = message['timestamp']
+    ET.SubElement(element, "content").text = message['content']
+    return ET.tostring(element, encoding='unicode').encode('utf-8')
+
+
+class XMLSink:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+        self.next_offset = None
+        self.tail = self._find_tail()
+
+    def _rfind(self, token, end):
+        """Poziția ultimei apariții a token-ului înainte de `end`, citind blocuri de la final"""
+        position = end
+        while position > 0:
+            start = max(0, position - SCAN_BLOCK)
+            self.file.seek(start)
+            block = self.file.read(min(end, position + len(token) - 1) - start)
+            index = block.rfind(token)
+            if index >= 0:
+                return start + index
+            position = start
+        return -1
+
+    def _find_tail(self):
+        """Poziția de la care se scriu mesajele noi (începutul etichetei de închidere)"""
+        size = self.file.seek(0, os.SEEK_END)
+        if size == 0:
+            self.file.write(XML_HEADER + CLOSING_TAG)
+            self.file.flush()
+            return len(XML_HEADER)
+
+        tail = self._rfind(CLOSING_TAG, size)
+        if tail < 0:
+            # Adăugare întreruptă: se păstrează mesajele complete și se reface finalul
+            end = self._rfind(MESSAGE_END, size)
+            if end < 0:
+                raise ValueError(f"Not a messages archive: {self.path}")
+            tail = end + len(MESSAGE_END)
+            self._write_tail(tail)
+            return tail
+
+        self.file.seek(max(0, tail - 64))
+        before = self.file.read(tail - max(0, tail - 64))
+        match = NEXT_OFFSET.search(before)
+        if match:
+            self.next_offset = int(match.group(1))
+            tail -= len(before) - match.start()
+        return tail
+
+    def _write_tail(self, position):
+        self.file.seek(position)
+        if self.next_offset is not None:
+            self.file.write(b'<?next-offset %d?>\n' % self.next_offset)
+        self.file.write(CLOSING_TAG)
+        self.file.truncate()
+        self.file.flush()
+
+    def append(self, messages):
+        """Adaugă mesajele (dict-uri cu id, topic, timestamp, content); returnează numărul lor"""
+        self.file.seek(self.tail)
+        count = 0
+        for message in messages:
+            self.file.write(message_element(message) + b'\n')
+            count += 1
+        if count:
+            self.tail = self.file.tell()
+            self._write_tail(self.tail)
+        return count
+
+    def mark(self, next_offset):
+        """Reține primul offset din jurnal care nu a fost exportat"""
+        self.next_offset = next_offset
+        self._write_tail(self.tail)
+
+    def reset(self):
+        """Golește arhiva"""
+        self.file.seek(0)
+        self.file.write(XML_HEADER)
+        self.tail = len(XML_HEADER)
+        self.next_offset = None
+        self._write_tail(self.tail)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# =============================================
+# Citire paginată cu memorie constantă
+# =============================================
+def iter_messages(path, topic=None, since=None, until=None, start=0):
+    """Generator peste (poziție, mesaj) din arhivă, începând de la octetul `start`.
+
+    Poziția este offset-ul elementului <message> în fișier: o pagină următoare începe
+    direct de acolo, fără a reciti arhiva de la început. Textul mesajelor este escapat,
+    deci etichetele <message> și </message> delimitează elementele; fiecare este parsat
+    separat, iar memoria nu depinde de dimensiunea arhivei. topic poate fi un șablon
+    (sensors.#); since/until sunt timestamp-uri text ("%Y-%m-%d %H:%M:%S"). Mesajele sunt
+    în ordinea timpului, deci citirea se oprește la primul mesaj de după `until`."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        buffer = b''
+        base = start      # offset-ul în fișier al lui buffer[0]
+        position = 0      # primul octet din buffer încă neprocesat
+        while True:
+            begin = buffer.find(MESSAGE_START, position)
+            end = buffer.find(MESSAGE_END, begin) if begin >= 0 else -1
+            if end < 0:
+                block = f.read(SCAN_BLOCK)
+                if not block:
+                    return
+                # Se păstrează doar restul neprocesat (un element început sau un token tăiat)
+                keep = begin if begin >= 0 else max(position, len(buffer) - len(MESSAGE_START))
+                base += keep
+                buffer = buffer[keep:] + block
+                position = 0
+                continue
+            end += len(MESSAGE_END)
+            element = ET.fromstring(buffer[begin:end])
+            position = end
+            message = {child.tag: child.text or '' for child in element}
+            timestamp = message.get('timestamp', '')
+            if until is not None and timestamp > until:
+                return
+            if (since is None or timestamp >= since) and \
+                    (topic is None or topic_matches(topic, message.get('topic', ''))):
+                yield base + begin, message
+
+
+def read_page(path, cursor=0, page_size=100, topic=None, since=None, until=None):
+    """O pagină de mesaje și cursorul paginii următoare (None la final).
+
+    Cursorul este poziția în octeți a primului mesaj din pagina următoare."""
+    messages = []
+    for position, message in iter_messages(path, topic, since, until, cursor):
+        if len(messages) == page_size:
+            return messages, position
+        messages.append(message)
+    return messages, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Page through a messages.xml archive in constant memory")
+    parser.add_argument('path', nargs='?', default='messages.xml')
+    parser.add_argument('--topic', default=None, help="topic sau șablon (ex: sensors.#)")
+    parser.add_argument('--since', default=None, help='timestamp minim, ex: "2025-10-15 18:00:00"')
+    parser.add_argument('--until', default=None, help="timestamp maxim")
+    parser.add_argument('--cursor', type=int, default=0, help="cursorul returnat de pagina anterioară")
+    parser.add_argument('--page-size', type=int, default=20)
+    args = parser.parse_args()
+
+    messages, cursor = read_page(args.path, args.cursor, args.page_size, args.topic, args.since, args.until)
+    for message in messages:
+        print(f"[{message.get('timestamp')}] {message.get('topic')} #{message.get('id')}")
+        print(f"  {message.get('content')}")
+    print(f"📄 {len(messages)} mesaje")
+    if cursor is not None:
+        print(f"➡️  Pagina următoare: --cursor {cursor}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,92 @@
 import socket
+import threading
 import time
+import hashlib
 
 
 class BackendServer:
     """Simple backend server for testing"""
 
+    # Idle keep-alive connections are closed after this many seconds
+    KEEP_ALIVE_TIMEOUT = 30
+
     def __init__(self, port, server_id):
         self.port = port
         self.server_id = server_id
+        self.connections = 0
+        self.requests = 0
 
     def start(self):
-        def handler(client_socket):
-            request = client_socket.recv(1024).decode()
+        def read_request(client_socket, buffer):
+            """One request head (the simulator ignores request bodies) and the rest of the buffer"""
+            while b'\r\n\r\n' not in buffer:
+                chunk = client_socket.recv(4096)
+                if not chunk:
+                    return None, b''
+                buffer += chunk
+            head, _, rest = buffer.partition(b'\r\n\r\n')
+            lines = head.decode('latin-1').split('\r\n')
+            length = next((int(line.split(':', 1)[1]) for line in lines
+                           if line.lower().startswith('content-length:')), 0)
+            while len(rest) < length:
+                chunk = client_socket.recv(4096)
+                if not chunk:
+                    return None, b''
+                rest += chunk
+            return lines, rest[length:]
 
-            response = f"""HTTP/1.1 200 OK
-Content-Type: text/html
-Connection: close
+        def respond(lines):
+            # Each path is a static page: its ETag lets the proxy revalidate with If-None-Match
+            path = lines[0].split()[1] if len(lines[0].split()) > 1 else '/'
+            etag = '"' + hashlib.md5(path.encode()).hexdigest()[:16] + '"'
+            if_none_match = [line.split(':', 1)[1].strip() for line in lines
+                             if line.lower().startswith('if-none-match:')]
+            if etag in if_none_match:
+                return f"HTTP/1.1 304 Not Modified\r\nETag: {etag}\r\n\r\n".encode()
 
-<html>
+            body = f"""<html>
 <body>
     <h1>Backend Server {self.server_id}</h1>
     <p>Port: {self.port}</p>
     <p>Time: {time.time()}</p>
 </body>
-</html>"""
+</html>""".encode()
 
-            client_socket.sendall(response.encode())
-            client_socket.close()
+            return f"""HTTP/1.1 200 OK\r
+Content-Type: text/html\r
+ETag: {etag}\r
+Content-Length: {len(body)}\r
+\r
+""".encode() + body
+
+        def handler(client_socket):
+            # HTTP/1.1 keep-alive: answer requests on the connection until the client
+            # closes it, asks for Connection: close, or stays idle too long
+            client_socket.settimeout(self.KEEP_ALIVE_TIMEOUT)
+            buffer = b''
+            try:
+                while True:
+                    lines, buffer = read_request(client_socket, buffer)
+                    if lines is None:
+                        break
+                    self.requests += 1
+                    client_socket.sendall(respond(lines))
+                    if lines[0].endswith('HTTP/1.0') or \
+                            any(line.lower().replace(' ', '') == 'connection:close' for line in lines):
+                        break
+            except OSError:
+                pass
+            finally:
+                client_socket.close()
 
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         server_socket.bind(('localhost', self.port))
-        server_socket.listen(10)
+        server_socket.listen(128)
 
         print(f"🔧 Backend Server {self.server_id} running on port {self.port}")
 
         while True:
             client_socket, addr = server_socket.accept()
-            handler(client_socket)
\ No newline at end of file
+            self.connections += 1
+            threading.Thread(target=handler, args=(client_socket,), daemon=True).start()
@@ -0,0 +1,113 @@
+import sys
+import time
+import random
+import argparse
+
+from cache import ResponseCache, ADMISSION_POLICIES
+
+
+def rss_bytes():
+    """Resident set size of this process (Linux), or None"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def make_response(url, size):
+    body = (url + ' ') * (size // (len(url) + 1) + 1)
+    return (f"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n"
+            f"Content-Length: {size}\r\n\r\n{body[:size]}").encode('utf-8')
+
+
+def mb(value):
+    return f"{value / (1024 * 1024):,.1f} MB" if value is not None else "n/a"
+
+
+def unique_urls(count, size, max_bytes, admission):
+    """Crawl of unique URLs: every request is a miss followed by an insert"""
+    cache = ResponseCache(max_bytes=max_bytes, admission=admission)
+    rss_before = rss_bytes()
+    peak_rss = rss_before
+    half_rss = None
+    start = time.perf_counter()
+    for i in range(count):
+        url = f"http://localhost:8080/page/{i}"
+        if cache.get(url) is None:
+            cache.put(url, make_response(url, size))
+        if i % 10000 == 0:
+            cache.sweep()
+            peak_rss = max(peak_rss or 0, rss_bytes() or 0)
+        if i == count // 2:
+            half_rss = rss_bytes()
+    elapsed = time.perf_counter() - start
+
+    stats = cache.get_statistics()
+    print(f"\n🌐 {count:,} unique URLs, ~{size} B responses, admission={admission}")
+    print(f"  cache bytes       {mb(stats['bytes'])} / cap {mb(max_bytes)}")
+    print(f"  entries           {stats['entries']:,}")
+    print(f"  evictions         {stats['evictions']:,}  rejections {stats['rejections']:,}")
+    # Flat between the half-way point and the end: memory no longer tracks the URL count
+    print(f"  RSS growth        {mb(half_rss - rss_before if rss_before else None)} at half-way, "
+          f"{mb(rss_bytes() - rss_before if rss_before else None)} at the end, "
+          f"{mb(peak_rss - rss_before if rss_before else None)} peak")
+    print(f"  throughput        {count / elapsed:,.0f} req/s")
+    return stats['bytes'] <= max_bytes
+
+
+def hot_set_with_scan(requests, hot, size, max_bytes, admission, seed):
+    """Hot set that fits the cache, mixed with a scan of one-off URLs"""
+    rng = random.Random(seed)
+    cache = ResponseCache(max_bytes=max_bytes, admission=admission)
+    scan = 0
+    hot_hits = hot_lookups = 0
+    for _ in range(requests):
+        if rng.random() < 0.5:
+            url = f"http://localhost:8080/hot/{rng.randrange(hot)}"
+            hot_lookups += 1
+        else:
+            url = f"http://localhost:8080/scan/{scan}"
+            scan += 1
+        response = cache.get(url)
+        if response is None:
+            cache.put(url, make_response(url, size))
+        elif url.startswith('http://localhost:8080/hot/'):
+            hot_hits += 1
+
+    stats = cache.get_statistics()
+    print(f"  {admission:<8} hit ratio {stats['hit_ratio']:.3f}   "
+          f"hot-set hit ratio {hot_hits / hot_lookups:.3f}   evictions {stats['evictions']:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response cache benchmark")
+    parser.add_argument('--urls', type=int, default=1000000, help="unique URLs in the crawl")
+    parser.add_argument('--size', type=int, default=1024, help="response body size in bytes")
+    parser.add_argument('--max-mb', type=int, default=64, help="cache byte budget in MB")
+    parser.add_argument('--admission', choices=ADMISSION_POLICIES, default='lru')
+    parser.add_argument('--requests', type=int, default=200000, help="requests in the hot-set/scan mix")
+    parser.add_argument('--hot', type=int, default=5000, help="hot-set size (URLs)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    max_bytes = args.max_mb * 1024 * 1024
+    within_cap = unique_urls(args.urls, args.size, max_bytes, args.admission)
+
+    # A budget that holds about twice the hot set, so the scan decides what survives
+    mix_bytes = 2 * args.hot * (args.size + 400)
+    print(f"\n🔥 Hot set of {args.hot:,} URLs + scan, {args.requests:,} requests, cap {mb(mix_bytes)}")
+    for admission in ADMISSION_POLICIES:
+        hot_set_with_scan(args.requests, args.hot, args.size, mix_bytes, admission, args.seed)
+
+    if not within_cap:
+        print("❌ Cache exceeded its byte budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
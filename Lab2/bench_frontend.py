@@ -0,0 +1,103 @@
+import io
+import sys
+import time
+import socket
+import argparse
+import threading
+import contextlib
+
+from backend_simulator import BackendServer
+from http_proxy import DistributedProxyServer
+
+
+def read_response(sock, buffer):
+    """One Content-Length framed response; returns (status line, rest of the buffer)"""
+    while b'\r\n\r\n' not in buffer:
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("Connection closed before the response")
+        buffer += chunk
+    head, _, rest = buffer.partition(b'\r\n\r\n')
+    length = next((int(line.split(b':', 1)[1]) for line in head.split(b'\r\n')
+                   if line.lower().startswith(b'content-length:')), 0)
+    while len(rest) < length:
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("Connection closed inside the response body")
+        rest += chunk
+    return head.split(b'\r\n', 1)[0], rest[length:]
+
+
+def request(path, close=False):
+    connection = "Connection: close\r\n" if close else ""
+    return (f"GET {path} HTTP/1.1\r\nHost: localhost\r\nUser-Agent: bench-frontend\r\n"
+            f"Accept: */*\r\n{connection}\r\n").encode()
+
+
+def load_close(port, paths):
+    """HTTP/1.0-style: a new connection for every request"""
+    for path in paths:
+        with socket.create_connection(('localhost', port)) as sock:
+            sock.sendall(request(path, close=True))
+            read_response(sock, b'')
+
+
+def load_keep_alive(port, paths):
+    """One persistent connection, one request at a time"""
+    with socket.create_connection(('localhost', port)) as sock:
+        buffer = b''
+        for path in paths:
+            sock.sendall(request(path))
+            _, buffer = read_response(sock, buffer)
+
+
+def load_pipelined(port, paths):
+    """One persistent connection, all requests written before reading the responses"""
+    with socket.create_connection(('localhost', port)) as sock:
+        sock.sendall(b''.join(request(path) for path in paths))
+        buffer = b''
+        for _ in paths:
+            _, buffer = read_response(sock, buffer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proxy front-end benchmark: page loads")
+    parser.add_argument('--assets', type=int, default=30, help="assets per page")
+    parser.add_argument('--pages', type=int, default=100, help="page loads per mode")
+    parser.add_argument('--port', type=int, default=8390)
+    parser.add_argument('--backend-port', type=int, default=9300)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        backends = [BackendServer(args.backend_port + i, f"bench-{i}") for i in range(3)]
+        for backend in backends:
+            threading.Thread(target=backend.start, daemon=True).start()
+        proxy = DistributedProxyServer(host='localhost', port=args.port)
+        proxy.backend_servers = [{'host': 'localhost', 'port': b.port, 'weight': 1} for b in backends]
+        threading.Thread(target=proxy.start, daemon=True).start()
+        time.sleep(0.5)
+        # Warm the cache: the benchmark measures the front end, not the backends
+        paths = ['/index.html'] + [f"/static/asset-{i}.js" for i in range(args.assets)]
+        load_keep_alive(args.port, paths)
+
+    print(f"📄 {args.pages} page loads of 1 page + {args.assets} cached assets")
+    for label, load in (('connection per request', load_close),
+                        ('keep-alive', load_keep_alive),
+                        ('keep-alive + pipelining', load_pipelined)):
+        connections = proxy.client_stats['connections']
+        times = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(args.pages):
+                start = time.perf_counter()
+                load(args.port, paths)
+                times.append(time.perf_counter() - start)
+        times.sort()
+        opened = proxy.client_stats['connections'] - connections
+        p50 = times[len(times) // 2] * 1000
+        p99 = times[min(len(times) - 1, int(len(times) * 0.99))] * 1000
+        print(f"  {label:<26} connections {opened:>5}   page load p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
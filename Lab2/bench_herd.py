@@ -0,0 +1,152 @@
+import io
+import sys
+import time
+import socket
+import argparse
+import threading
+import contextlib
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from http_proxy import DistributedProxyServer
+
+
+class SlowBackend(BaseHTTPRequestHandler):
+    """Backend with a fixed service time that counts full and conditional requests"""
+    protocol_version = 'HTTP/1.0'
+    delay = 0.05
+    counts = Counter()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        etag = '"v1"'
+        with self.lock:
+            self.counts['requests'] += 1
+        time.sleep(self.delay)
+        if self.headers.get('If-None-Match') == etag:
+            with self.lock:
+                self.counts['not_modified'] += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        body = b'x' * 2048
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return
+
+
+def start_backends(ports):
+    for port in ports:
+        server = ThreadingHTTPServer(('localhost', port), SlowBackend)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+
+def start_proxy(port, backend_ports, **options):
+    proxy = DistributedProxyServer(host='localhost', port=port, **options)
+    proxy.backend_servers = [{'host': 'localhost', 'port': p, 'weight': 1} for p in backend_ports]
+    threading.Thread(target=proxy.start, daemon=True).start()
+    time.sleep(0.3)
+    return proxy
+
+
+def fetch(port, path):
+    start = time.perf_counter()
+    with socket.create_connection(('localhost', port), timeout=30) as sock:
+        sock.sendall(f"GET {path} HTTP/1.1\r\nHost: localhost:{port}\r\n"
+                     f"Connection: close\r\n\r\n".encode())
+        data = b''
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    status = data.split(b'\r\n', 1)[0].decode(errors='replace')
+    cache = next((line.split(b':', 1)[1].strip().decode() for line in data.split(b'\r\n\r\n')[0].split(b'\r\n')
+                  if line.lower().startswith(b'x-cache:')), '-')
+    return status, cache, time.perf_counter() - start
+
+
+def burst(port, path, clients):
+    """All clients send the same request at the same moment"""
+    barrier = threading.Barrier(clients)
+    results = []
+    lock = threading.Lock()
+
+    def client():
+        barrier.wait()
+        try:
+            result = fetch(port, path)
+        except OSError as e:
+            result = (f"error: {e}", '-', 0.0)
+        with lock:
+            results.append(result)
+
+    # The proxy logs every request; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return results
+
+
+def report(label, results, before):
+    backend = SlowBackend.counts['requests'] - before['requests']
+    not_modified = SlowBackend.counts['not_modified'] - before['not_modified']
+    latencies = sorted(latency for _, _, latency in results)
+    outcomes = Counter(cache for _, cache, _ in results)
+    errors = sum(1 for status, _, _ in results if not status.startswith('HTTP/1.1 200'))
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"  {label:<34} backend requests {backend:>4} (304: {not_modified:>3})   "
+          f"p50 {p50:7.1f} ms  p99 {p99:7.1f} ms   errors {errors}   {dict(outcomes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thundering-herd benchmark for the proxy cache")
+    parser.add_argument('--clients', type=int, default=500, help="synchronized clients per burst")
+    parser.add_argument('--delay', type=float, default=0.05, help="backend service time (s)")
+    parser.add_argument('--ttl', type=float, default=5, help="cache TTL (s); longer than a burst")
+    parser.add_argument('--port', type=int, default=8190, help="first proxy port")
+    parser.add_argument('--backend-port', type=int, default=9100)
+    args = parser.parse_args()
+
+    SlowBackend.delay = args.delay
+    backend_ports = [args.backend_port + i for i in range(3)]
+    start_backends(backend_ports)
+    scenarios = [
+        ('no coalescing', dict(coalesce=False, stale_while_revalidate=0)),
+        ('single-flight', dict(coalesce=True, stale_while_revalidate=0)),
+        ('single-flight + stale-while-reval.', dict(coalesce=True, stale_while_revalidate=10)),
+    ]
+
+    print(f"\n🐘 {args.clients} synchronized clients, backend service time {args.delay * 1000:.0f} ms")
+    for index, (label, options) in enumerate(scenarios):
+        print(f"\n{label}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            proxy = start_proxy(args.port + index, backend_ports, cache_ttl=args.ttl, **options)
+        path = f"/hot/{index}"
+
+        before = SlowBackend.counts.copy()
+        report('cold miss', burst(proxy.port, path, args.clients), before)
+
+        time.sleep(args.ttl + 0.5)  # let the entry expire
+        before = SlowBackend.counts.copy()
+        report('after TTL expiry', burst(proxy.port, path, args.clients), before)
+        with contextlib.redirect_stdout(io.StringIO()):
+            time.sleep(args.delay * 4)  # background revalidation, if any
+        print(f"  {'':<34} backend requests incl. background: "
+              f"{SlowBackend.counts['requests'] - before['requests']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import io
+import sys
+import time
+import socket
+import argparse
+import threading
+import contextlib
+
+from backend_simulator import BackendServer
+from http_proxy import DistributedProxyServer
+
+
+def time_wait_sockets(ports):
+    """TCP sockets in TIME_WAIT towards the given local ports (Linux /proc/net/tcp)"""
+    count = 0
+    try:
+        with open('/proc/net/tcp') as f:
+            next(f)
+            for line in f:
+                fields = line.split()
+                local_port = int(fields[1].split(':')[1], 16)
+                remote_port = int(fields[2].split(':')[1], 16)
+                if fields[3] == '06' and (local_port in ports or remote_port in ports):
+                    count += 1
+    except OSError:
+        return None
+    return count
+
+
+def fetch(port, path):
+    start = time.perf_counter()
+    with socket.create_connection(('localhost', port), timeout=30) as sock:
+        # no-store: every request goes through to a backend
+        sock.sendall(f"GET {path} HTTP/1.1\r\nHost: localhost:{port}\r\nConnection: close\r\n"
+                     f"Cache-Control: no-store\r\n\r\n".encode())
+        data = b''
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    if not data.startswith(b'HTTP/1.1 200'):
+        raise OSError(data.split(b'\r\n', 1)[0].decode(errors='replace'))
+    return time.perf_counter() - start
+
+
+def run(label, port, backends, clients, requests, **options):
+    with contextlib.redirect_stdout(io.StringIO()):
+        proxy = DistributedProxyServer(host='localhost', port=port, **options)
+        proxy.backend_servers = [{'host': 'localhost', 'port': b.port, 'weight': 1} for b in backends]
+        threading.Thread(target=proxy.start, daemon=True).start()
+        time.sleep(0.3)
+
+    connections_before = sum(b.connections for b in backends)
+    time_wait_before = time_wait_sockets({b.port for b in backends})
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client(index):
+        for i in range(requests):
+            try:
+                latency = fetch(port, f"/page/{index}/{i}")
+                with lock:
+                    latencies.append(latency)
+            except OSError as e:
+                with lock:
+                    errors.append(str(e))
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    connects = sum(b.connections for b in backends) - connections_before
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else 0
+    print(f"\n{label}")
+    print(f"  requests          {len(latencies):,} ok, {len(errors)} errors, "
+          f"{len(latencies) / elapsed:,.0f} req/s")
+    print(f"  backend connects  {connects:,}")
+    print(f"  latency           p50 {p50:.2f} ms   p99 {p99:.2f} ms")
+    time_wait = time_wait_sockets({b.port for b in backends})
+    print(f"  new TIME_WAIT     {time_wait - time_wait_before if time_wait is not None else 'n/a'}")
+    for backend, stats in proxy.get_statistics()['backend_pools'].items():
+        print(f"  pool {backend}  connects {stats['connects']}  reuses {stats['reuses']}  "
+              f"waits {stats['waits']} (avg {stats['avg_wait_ms']} ms, max {stats['max_wait_ms']} ms)  "
+              f"evictions {stats['idle_evictions'] + stats['health_evictions']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend connection pool benchmark")
+    parser.add_argument('--clients', type=int, default=20, help="concurrent clients")
+    parser.add_argument('--requests', type=int, default=200, help="requests per client")
+    parser.add_argument('--pool-size', type=int, default=10, help="connections per backend")
+    parser.add_argument('--port', type=int, default=8290, help="first proxy port")
+    parser.add_argument('--backend-port', type=int, default=9200)
+    args = parser.parse_args()
+
+    # Separate backends per run, so TIME_WAIT sockets of one run are not counted in the other
+    backends = [BackendServer(args.backend_port + i, f"bench-{i}") for i in range(6)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for backend in backends:
+            threading.Thread(target=backend.start, daemon=True).start()
+        time.sleep(0.3)
+
+    print(f"🔌 {args.clients} clients x {args.requests} uncached requests, 3 backends")
+    run("new connection per request (before)", args.port, backends[:3], args.clients, args.requests,
+        backend_pool_size=0)
+    run(f"keep-alive pool, {args.pool_size} per backend (after)", args.port + 1, backends[3:],
+        args.clients, args.requests, backend_pool_size=args.pool_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+
+# Approximate per-entry bookkeeping cost (OrderedDict node, entry object, wheel slot,
+# expiry float; measured with tracemalloc on CPython 3),
+# charged against the byte budget in addition to the key and the response bytes
+ENTRY_OVERHEAD = 360
+
+ADMISSION_LRU = 'lru'
+ADMISSION_TINYLFU = 'tinylfu'
+ADMISSION_POLICIES = (ADMISSION_LRU, ADMISSION_TINYLFU)
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'expires_at', 'tick')
+
+    def __init__(self, value, size, expires_at, tick):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.tick = tick
+
+
+class TimerWheel:
+    """Hashed timer wheel: keys are bucketed by expiry tick, so expiring entries costs
+    time proportional to what actually expires instead of a scan of the whole cache"""
+
+    def __init__(self, tick=1.0, slots=512):
+        self.tick = tick
+        self.slots = [set() for _ in range(slots)]
+        self.current = None
+
+    def tick_for(self, expires_at):
+        return int(expires_at // self.tick)
+
+    def schedule(self, key, tick):
+        self.slots[tick % len(self.slots)].add(key)
+
+    def cancel(self, key, tick):
+        self.slots[tick % len(self.slots)].discard(key)
+
+    def advance(self, now):
+        """Yield (key, tick) for the keys in every slot whose tick has fully passed since
+        the last call; keys scheduled further ahead share slots, so the caller compares
+        each key's own tick with the one yielded"""
+        target = int(now // self.tick) - 1
+        if self.current is None:
+            self.current = target - len(self.slots)
+        first = max(self.current + 1, target - len(self.slots) + 1)
+        for tick in range(first, target + 1):
+            for key in list(self.slots[tick % len(self.slots)]):
+                yield key, tick
+        self.current = max(self.current, target)
+
+
+class FrequencySketch:
+    """Count-Min sketch with small saturating counters, halved periodically so that
+    old popularity fades (the TinyLFU frequency estimate)"""
+
+    def __init__(self, width=4096, depth=4, max_count=15):
+        self.width = 1 << max(4, (width - 1).bit_length())
+        self.mask = self.width - 1
+        self.rows = [bytearray(self.width) for _ in range(depth)]
+        self.max_count = max_count
+        self.additions = 0
+        self.sample_size = 10 * self.width
+
+    def _indexes(self, key):
+        h = hash(key)
+        for row in range(len(self.rows)):
+            yield (h ^ (h >> (16 + row * 4)) * (2 * row + 0x9E3779B1)) & self.mask
+
+    def increment(self, key):
+        for row, index in zip(self.rows, self._indexes(key)):
+            if row[index] < self.max_count:
+                row[index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self._age()
+
+    def frequency(self, key):
+        return min(row[index] for row, index in zip(self.rows, self._indexes(key)))
+
+    def _age(self):
+        self.rows = [bytearray(count >> 1 for count in row) for row in self.rows]
+        self.additions //= 2
+
+
+class ResponseCache:
+    """Byte-budgeted LRU cache with per-entry TTL.
+
+    Expired entries are removed proactively by a timer wheel (see sweep()). With the
+    'tinylfu' admission policy a new entry only displaces the LRU victim when it has
+    been requested more often, so a scan of one-off URLs cannot flush the hot set."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, default_ttl=300, admission=ADMISSION_LRU,
+                 tick=1.0, sketch_width=None):
+        if admission not in ADMISSION_POLICIES:
+            raise ValueError(f"Unknown admission policy: {admission}")
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.admission = admission
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.wheel = TimerWheel(tick)
+        self.sketch = None
+        if admission == ADMISSION_TINYLFU:
+            # Sized for the number of entries the budget can hold at ~1 KB per response
+            self.sketch = FrequencySketch(sketch_width or max(1024, max_bytes // 1024))
+
+        self.hits = 0
+        self.misses = 0
+        self.inserts = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+
+    def entry_size(self, key, value):
+        return len(value) + sys.getsizeof(key) + ENTRY_OVERHEAD
+
+    def get(self, key, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            if self.sketch is not None:
+                self.sketch.increment(key)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= now:
+                self._remove(key, entry)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def peek(self, key, now=None):
+        """The stored value, without counting a lookup or changing its recency"""
+        now = time.time() if now is None else now
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.expires_at <= now:
+                return None
+            return entry.value
+
+    def put(self, key, value, ttl=None, now=None):
+        """Store a response; returns False if it was not admitted (too large or too rare)"""
+        now = time.time() if now is None else now
+        ttl = self.default_ttl if ttl is None else ttl
+        size = self.entry_size(key, value)
+        if ttl <= 0 or size > self.max_bytes:
+            return False
+
+        with self.lock:
+            previous = self.entries.get(key)
+            if previous is not None:
+                self._remove(key, previous)
+            elif self.sketch is not None and self.bytes + size > self.max_bytes and self.entries:
+                victim = next(iter(self.entries))
+                if self.sketch.frequency(key) <= self.sketch.frequency(victim):
+                    self.rejections += 1
+                    return False
+
+            while self.entries and self.bytes + size > self.max_bytes:
+                victim, entry = self.entries.popitem(last=False)
+                self.wheel.cancel(victim, entry.tick)
+                self.bytes -= entry.size
+                self.evictions += 1
+
+            expires_at = now + ttl
+            tick = self.wheel.tick_for(expires_at)
+            self.entries[key] = _Entry(value, size, expires_at, tick)
+            self.wheel.schedule(key, tick)
+            self.bytes += size
+            self.inserts += 1
+            return True
+
+    def delete(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self._remove(key, entry)
+            return entry is not None
+
+    def _remove(self, key, entry):
+        del self.entries[key]
+        self.wheel.cancel(key, entry.tick)
+        self.bytes -= entry.size
+
+    def sweep(self, now=None):
+        """Remove every entry whose TTL has passed; returns how many were removed"""
+        now = time.time() if now is None else now
+        removed = 0
+        with self.lock:
+            for key, tick in self.wheel.advance(now):
+                entry = self.entries.get(key)
+                if entry is not None and entry.tick <= tick:
+                    self._remove(key, entry)
+                    removed += 1
+            self.expirations += removed
+        return removed
+
+    def start_sweeper(self, interval=None):
+        """Run sweep() periodically on a daemon thread"""
+        interval = interval or self.wheel.tick
+
+        def sweeper():
+            while True:
+                time.sleep(interval)
+                self.sweep()
+
+        thread = threading.Thread(target=sweeper, daemon=True)
+        thread.start()
+        return thread
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_statistics(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'admission': self.admission,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'inserts': self.inserts,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'rejections': self.rejections,
+            }
@@ -0,0 +1,169 @@
+import time
+import select
+import threading
+import http.client
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """No backend connection became available within the wait timeout"""
+
+
+class BackendPool:
+    """Persistent HTTP/1.1 connections to one backend, shared by all handler threads.
+
+    At most max_size connections exist at once; further requests wait in a queue for
+    one to be released. Idle connections are reused most-recently-used first, closed
+    after idle_timeout, and checked before reuse (a readable idle socket means the
+    backend closed it or sent something unexpected)."""
+
+    def __init__(self, host, port, max_size=10, idle_timeout=15, wait_timeout=5, timeout=30):
+        self.host = host
+        self.port = port
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self.timeout = timeout  # socket timeout for connecting and reading responses
+        self.idle = deque()  # (connection, released_at), oldest on the left
+        self.size = 0
+        self.condition = threading.Condition()
+
+        self.connects = 0
+        self.reuses = 0
+        self.idle_evictions = 0
+        self.health_evictions = 0
+        self.discards = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.waiting = 0
+        self.timeouts = 0
+
+    def acquire(self):
+        """A connection for one request; returns (connection, reused)"""
+        start = time.monotonic()
+        with self.condition:
+            waited = False
+            while True:
+                self._evict_idle()
+                while self.idle:
+                    conn, _ = self.idle.pop()
+                    if self._healthy(conn):
+                        self.reuses += 1
+                        self._record_wait(waited, start)
+                        return conn, True
+                    conn.close()
+                    self.size -= 1
+                    self.health_evictions += 1
+                if self.size < self.max_size:
+                    self.size += 1
+                    self.connects += 1
+                    self._record_wait(waited, start)
+                    break
+
+                remaining = self.wait_timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f"No connection to {self.host}:{self.port} "
+                                      f"within {self.wait_timeout}s")
+                if not waited:
+                    waited = True
+                    self.waits += 1
+                self.waiting += 1
+                try:
+                    self.condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+        # Connecting happens outside the lock (http.client connects on the first request)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout), False
+
+    def release(self, conn, reusable=True):
+        """Return a connection after its response was read completely"""
+        with self.condition:
+            if reusable and conn.sock is not None:
+                self.idle.append((conn, time.monotonic()))
+            else:
+                conn.close()
+                self.size -= 1
+                self.discards += 1
+            self.condition.notify()
+
+    def discard(self, conn):
+        self.release(conn, reusable=False)
+
+    def _record_wait(self, waited, start):
+        if waited:
+            elapsed = time.monotonic() - start
+            self.wait_time += elapsed
+            self.max_wait = max(self.max_wait, elapsed)
+
+    def _evict_idle(self):
+        deadline = time.monotonic() - self.idle_timeout
+        while self.idle and self.idle[0][1] < deadline:
+            conn, _ = self.idle.popleft()
+            conn.close()
+            self.size -= 1
+            self.idle_evictions += 1
+
+    def _healthy(self, conn):
+        if conn.sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def close(self):
+        with self.condition:
+            while self.idle:
+                conn, _ = self.idle.popleft()
+                conn.close()
+                self.size -= 1
+
+    def get_statistics(self):
+        with self.condition:
+            return {
+                'size': self.size,
+                'idle': len(self.idle),
+                'in_use': self.size - len(self.idle),
+                'max_size': self.max_size,
+                'connects': self.connects,
+                'reuses': self.reuses,
+                'idle_evictions': self.idle_evictions,
+                'health_evictions': self.health_evictions,
+                'discards': self.discards,
+                'waits': self.waits,
+                'waiting': self.waiting,
+                'avg_wait_ms': round(self.wait_time / self.waits * 1000, 2) if self.waits else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 2),
+                'timeouts': self.timeouts,
+            }
+
+
+class ConnectionPools:
+    """One BackendPool per backend (host, port), created on first use"""
+
+    def __init__(self, **options):
+        self.options = options
+        self.pools = {}
+        self.lock = threading.Lock()
+
+    def get(self, backend_server):
+        key = (backend_server['host'], backend_server['port'])
+        pool = self.pools.get(key)
+        if pool is None:
+            with self.lock:
+                pool = self.pools.get(key)
+                if pool is None:
+                    pool = self.pools[key] = BackendPool(*key, **self.options)
+        return pool
+
+    def close(self):
+        for pool in list(self.pools.values()):
+            pool.close()
+
+    def get_statistics(self):
+        return {f"{host}:{port}": pool.get_statistics()
+                for (host, port), pool in list(self.pools.items())}
@@ -0,0 +1,251 @@
+import time
+import hashlib
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit, urlunsplit
+
+
+# Headers that describe a single connection: never forwarded, stored or replayed
+HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-connection', 'te', 'trailer',
+              'transfer-encoding', 'upgrade', 'proxy-authenticate', 'proxy-authorization'}
+
+# Request headers the proxy replaces with its own validators when revalidating
+CONDITIONAL_HEADERS = {'if-none-match', 'if-modified-since', 'if-match',
+                       'if-unmodified-since', 'if-range'}
+
+# Headers a 304 must not overwrite in the stored response
+NOT_MODIFIED_SKIP = {'content-length', 'content-encoding', 'content-range'} | HOP_BY_HOP
+
+# Status codes that may be cached with heuristic freshness (RFC 9110, section 15.1)
+HEURISTIC_STATUSES = {200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501}
+HEURISTIC_FRACTION = 0.1  # of the time since Last-Modified
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def parse_headers(request_data):
+    """Request headers as a dict with lower-case names (repeated headers are joined)"""
+    head = request_data.split('\r\n\r\n', 1)[0]
+    headers = {}
+    for line in head.split('\r\n')[1:]:
+        name, sep, value = line.partition(':')
+        if not sep:
+            continue
+        name = name.strip().lower()
+        value = value.strip()
+        headers[name] = f"{headers[name]}, {value}" if name in headers else value
+    return headers
+
+
+def parse_cache_control(value):
+    """Cache-Control directives as {name: argument or None}"""
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, argument = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip().strip('"') or None
+    return directives
+
+
+def delta_seconds(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def http_date(value):
+    """Seconds since the epoch for an HTTP-date, or None"""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def normalize_url(url, host=None):
+    """Canonical form of a request target: lower-case scheme and host, no default port,
+    '/' for an empty path and no fragment; the query is kept as sent, since parameter
+    order can be significant (?a=1&a=2 is not ?a=2&a=1)"""
+    parts = urlsplit(url)
+    scheme = (parts.scheme or 'http').lower()
+    netloc = (parts.netloc or host or '').lower()
+    hostname, _, port = netloc.rpartition(':')
+    if hostname and port.isdigit() and int(port) == DEFAULT_PORTS.get(scheme):
+        netloc = hostname
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+
+def cache_key(method, url, headers, vary=()):
+    """Key from the method, the normalized URL and the request headers named by Vary"""
+    key = f"{method.upper()} {normalize_url(url, headers.get('host'))}"
+    for name in vary:
+        key += f"\n{name}:{' '.join(headers.get(name, '').split())}"
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match list with an entity tag"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag.strip().removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == opaque for tag in if_none_match.split(','))
+
+
+class VaryIndex:
+    """Stored under the primary key of a URL whose responses vary: the request headers
+    that select a variant and the keys of the variants stored for it"""
+
+    __slots__ = ('names', 'keys')
+
+    def __init__(self, names, keys=frozenset()):
+        self.names = names  # sorted tuple of lower-case header names
+        self.keys = frozenset(keys)
+
+    def __len__(self):
+        return sum(len(name) for name in self.names) + sum(len(key) for key in self.keys)
+
+    def with_key(self, key):
+        return VaryIndex(self.names, self.keys | {key})
+
+
+class ProxyResponse:
+    """A backend response, stored by the cache together with what is needed to compute
+    its age and freshness (RFC 9111) and to revalidate it"""
+
+    __slots__ = ('status', 'reason', 'headers', 'body', 'response_time', 'freshness')
+
+    def __init__(self, status, reason, headers, body, response_time=None):
+        self.status = status
+        self.reason = reason
+        self.headers = headers  # [(name, value)], without hop-by-hop headers
+        self.body = body
+        self.response_time = time.time() if response_time is None else response_time
+        self.freshness = 0
+
+    def header(self, name, default=None):
+        name = name.lower()
+        for header, value in self.headers:
+            if header.lower() == name:
+                return value
+        return default
+
+    def __len__(self):
+        return len(self.body) + sum(len(name) + len(value) + 4 for name, value in self.headers)
+
+    @property
+    def cache_control(self):
+        return parse_cache_control(self.header('Cache-Control'))
+
+    @property
+    def vary(self):
+        return tuple(sorted({name.strip().lower()
+                             for name in (self.header('Vary') or '').split(',') if name.strip()}))
+
+    @property
+    def has_validators(self):
+        return self.header('ETag') is not None or self.header('Last-Modified') is not None
+
+    @property
+    def requires_revalidation(self):
+        """Stale copies may not be served even when the backend is unreachable"""
+        directives = self.cache_control
+        return 'must-revalidate' in directives or 'proxy-revalidate' in directives or \
+            'no-cache' in directives
+
+    def stale_while_revalidate(self, default):
+        """Seconds past expiry this response may be served while it is refreshed"""
+        window = delta_seconds(self.cache_control.get('stale-while-revalidate'))
+        return default if window is None else window
+
+    def initial_age(self):
+        date = http_date(self.header('Date'))
+        apparent = max(0.0, self.response_time - date) if date is not None else 0.0
+        return max(apparent, delta_seconds(self.header('Age')) or 0)
+
+    def current_age(self, now=None):
+        now = time.time() if now is None else now
+        return self.initial_age() + max(0.0, now - self.response_time)
+
+    def is_fresh(self, now=None):
+        return self.current_age(now) < self.freshness
+
+    def freshness_lifetime(self, default_ttl):
+        """Seconds this response stays fresh in a shared cache"""
+        directives = self.cache_control
+        if 'no-cache' in directives:
+            return 0
+        for directive in ('s-maxage', 'max-age'):
+            if directive in directives:
+                return delta_seconds(directives[directive]) or 0
+        expires = self.header('Expires')
+        if expires is not None:
+            expires_at = http_date(expires)
+            date = http_date(self.header('Date')) or self.response_time
+            return max(0, expires_at - date) if expires_at is not None else 0
+        if self.status not in HEURISTIC_STATUSES:
+            return 0
+        last_modified = http_date(self.header('Last-Modified'))
+        if last_modified is not None:
+            date = http_date(self.header('Date')) or self.response_time
+            return min(default_ttl, max(0, date - last_modified) * HEURISTIC_FRACTION)
+        # No freshness information at all: the proxy's configured TTL, as before
+        return default_ttl if self.status == 200 else 0
+
+    def is_storable(self, request_headers):
+        """Whether a shared cache may store this response to the given request"""
+        directives = self.cache_control
+        if 'no-store' in directives or 'private' in directives or '*' in self.vary:
+            return False
+        if 'authorization' in request_headers and not \
+                {'public', 's-maxage', 'must-revalidate'} & directives.keys():
+            return False
+        return self.status in HEURISTIC_STATUSES or 'max-age' in directives or \
+            's-maxage' in directives or 'expires' in {name.lower() for name, _ in self.headers}
+
+    def conditional_headers(self):
+        """Validators for a conditional request that revalidates this response"""
+        headers = {}
+        if self.header('ETag') is not None:
+            headers['If-None-Match'] = self.header('ETag')
+        if self.header('Last-Modified') is not None:
+            headers['If-Modified-Since'] = self.header('Last-Modified')
+        return headers
+
+    def revalidated(self, not_modified, default_ttl):
+        """The stored response refreshed by a 304: updated headers, the stored body"""
+        updates = {name.lower(): (name, value) for name, value in not_modified.headers
+                   if name.lower() not in NOT_MODIFIED_SKIP}
+        headers = [(name, value) for name, value in self.headers if name.lower() not in updates]
+        headers.extend(updates.values())
+        response = ProxyResponse(self.status, self.reason, headers, self.body,
+                                 not_modified.response_time)
+        response.freshness = response.freshness_lifetime(default_ttl)
+        return response
+
+    def not_modified(self, extra_headers=()):
+        """A 304 for a client whose conditional request matches this response"""
+        headers = [(name, value) for name, value in self.headers
+                   if name.lower() in ('etag', 'last-modified', 'cache-control', 'expires',
+                                       'vary', 'date', 'content-location')]
+        return ProxyResponse(304, 'Not Modified', headers, b'').to_bytes(extra_headers)
+
+    def to_bytes(self, extra_headers=(), head=False):
+        """The HTTP/1.1 response sent to the client.
+
+        A response to HEAD has no body; its Content-Length is the backend's, which
+        describes the body a GET would return."""
+        skip = ('age', 'x-cache') if head else ('content-length', 'age', 'x-cache')
+        lines = [f"HTTP/1.1 {self.status} {self.reason}"]
+        for name, value in self.headers:
+            if name.lower() not in skip:
+                lines.append(f"{name}: {value}")
+        for name, value in extra_headers:
+            lines.append(f"{name}: {value}")
+        if head:
+            return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        if self.status >= 200 and self.status not in (204, 304):
+            lines.append(f"Content-Length: {len(self.body)}")
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + self.body
@@ -0,0 +1,242 @@
+import re
+
+
+MAX_HEADER_SIZE = 64 * 1024
+MAX_BODY_SIZE = 10 * 1024 * 1024
+
+REQUEST_LINE = re.compile(r'^([!#$%&\'*+\-.^_`|~0-9A-Za-z]+) (\S+) HTTP/(1\.[01])$')
+# Plain ASCII digits only: int() would also take signs, '0x', '_' and non-ASCII digits
+CONTENT_LENGTH = re.compile(r'^[0-9]+$')
+CHUNK_SIZE = re.compile(rb'^[0-9A-Fa-f]+$')
+
+REASONS = {
+    400: "Bad Request",
+    413: "Content Too Large",
+    431: "Request Header Fields Too Large",
+    501: "Not Implemented",
+    505: "HTTP Version Not Supported",
+}
+
+
+class ParseError(Exception):
+    """Malformed or unacceptable request; the connection is answered with status and closed"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.reason = REASONS.get(status, "Bad Request")
+
+
+class Request:
+    """One complete HTTP/1.x request (the body is already de-chunked)"""
+
+    __slots__ = ('method', 'target', 'version', 'headers', 'body')
+
+    def __init__(self, method, target, version, headers, body=b''):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers  # [(name, value)] in the order received
+        self.body = body
+
+    def header(self, name, default=None):
+        name = name.lower()
+        for header, value in self.headers:
+            if header.lower() == name:
+                return value
+        return default
+
+    @property
+    def connection_tokens(self):
+        return {token.strip().lower() for header, value in self.headers
+                if header.lower() == 'connection' for token in value.split(',')}
+
+    @property
+    def keep_alive(self):
+        """HTTP/1.1 connections persist unless closed; HTTP/1.0 only on request"""
+        tokens = self.connection_tokens
+        if self.version == '1.1':
+            return 'close' not in tokens
+        return 'keep-alive' in tokens
+
+    def data(self):
+        """The request as text with a Content-Length body, in the form process_request
+        takes (latin-1, so the body bytes pass through unchanged)"""
+        lines = [f"{self.method} {self.target} HTTP/{self.version}"]
+        lines.extend(f"{name}: {value}" for name, value in self.headers
+                     if name.lower() not in ('content-length', 'transfer-encoding'))
+        if self.body:
+            lines.append(f"Content-Length: {len(self.body)}")
+        return '\r\n'.join(lines) + '\r\n\r\n' + self.body.decode('latin-1')
+
+
+class RequestParser:
+    """Incremental HTTP/1.1 request parser.
+
+    feed() takes whatever recv() returned and gives back the requests completed by it, in
+    order, so pipelined requests on one connection come out one after another. Bodies
+    are framed by Content-Length or chunked Transfer-Encoding; a request with neither has
+    no body.
+
+    A malformed request after complete ones does not lose them: feed() returns the
+    complete requests, keeps the ParseError in `error` and raises it on the next call."""
+
+    def __init__(self, max_header_size=MAX_HEADER_SIZE, max_body_size=MAX_BODY_SIZE):
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        self.buffer = bytearray()
+        self.request = None       # head parsed, body still incomplete
+        self.remaining = 0        # Content-Length bytes still expected
+        self.chunked = False
+        self.chunk_state = 'size'  # size / data / trailer
+        self.chunk_size = 0
+        self.body = bytearray()
+        self.continue_sent = False
+        self.error = None
+
+    @property
+    def pending(self):
+        """Part of a request has been received"""
+        return self.request is not None or bool(self.buffer.strip(b'\r\n'))
+
+    def feed(self, data):
+        if self.error is not None:
+            raise self.error
+        self.buffer += data
+        completed = []
+        try:
+            self._parse(completed)
+        except ParseError as e:
+            if not completed:
+                raise
+            self.error = e
+        return completed
+
+    def _parse(self, completed):
+        """Append the requests completed by the buffered bytes to `completed`"""
+        while True:
+            if self.request is None:
+                # Empty lines before a request line are ignored (RFC 9112, section 2.2)
+                start = 0
+                while self.buffer[start:start + 2] == b'\r\n':
+                    start += 2
+                if start:
+                    del self.buffer[:start]
+                end = self.buffer.find(b'\r\n\r\n')
+                if end < 0 and len(self.buffer) > self.max_header_size or end > self.max_header_size:
+                    raise ParseError(431, "Request header section too large")
+                if end < 0:
+                    break
+                head = bytes(self.buffer[:end])
+                del self.buffer[:end + 4]
+                self._start(head)
+            if not self._read_body():
+                break
+            completed.append(self._finish())
+
+    def take_continue(self):
+        """True once for a request that sent 'Expect: 100-continue' and awaits its body"""
+        if self.request is None or self.continue_sent:
+            return False
+        if (self.request.header('Expect') or '').lower() != '100-continue':
+            return False
+        self.continue_sent = True
+        return True
+
+    def _start(self, head):
+        try:
+            text = head.decode('latin-1')
+        except UnicodeDecodeError:
+            raise ParseError(400, "Undecodable request head")
+        lines = text.split('\r\n')
+        match = REQUEST_LINE.match(lines[0])
+        if match is None:
+            if lines[0].startswith(('HTTP/', 'PRI ')) or ' HTTP/' in lines[0]:
+                raise ParseError(505, f"Unsupported request line: {lines[0][:100]}")
+            raise ParseError(400, f"Malformed request line: {lines[0][:100]}")
+        method, target, version = match.groups()
+
+        headers = []
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            # No whitespace before the colon and no obsolete line folding (smuggling vectors)
+            if not sep or not name or name != name.strip() or line[:1] in (' ', '\t'):
+                raise ParseError(400, f"Malformed header line: {line[:100]}")
+            headers.append((name, value.strip()))
+        request = Request(method, target, version, headers)
+
+        transfer_encoding = request.header('Transfer-Encoding')
+        lengths = {value for name, value in headers if name.lower() == 'content-length'}
+        if transfer_encoding is not None:
+            if lengths:
+                raise ParseError(400, "Both Transfer-Encoding and Content-Length")
+            codings = [coding.strip().lower() for coding in transfer_encoding.split(',')]
+            if codings[-1] != 'chunked':
+                raise ParseError(400, "Transfer-Encoding must end with chunked")
+            if codings != ['chunked']:
+                raise ParseError(501, f"Unsupported Transfer-Encoding: {transfer_encoding}")
+            self.chunked = True
+        elif lengths:
+            if len(lengths) > 1 or not CONTENT_LENGTH.match(next(iter(lengths))):
+                raise ParseError(400, "Invalid Content-Length")
+            self.remaining = int(next(iter(lengths)))
+            if self.remaining > self.max_body_size:
+                raise ParseError(413, "Request body too large")
+
+        self.request = request
+
+    def _read_body(self):
+        """Consume body bytes from the buffer; True when the body is complete"""
+        if not self.chunked:
+            take = min(self.remaining, len(self.buffer))
+            if take:
+                self.body += self.buffer[:take]
+                del self.buffer[:take]
+                self.remaining -= take
+            return self.remaining == 0
+
+        while True:
+            if self.chunk_state == 'size':
+                end = self.buffer.find(b'\r\n')
+                if end < 0:
+                    if len(self.buffer) > 1024:
+                        raise ParseError(400, "Chunk size line too long")
+                    return False
+                size = bytes(self.buffer[:end]).split(b';', 1)[0].strip()
+                del self.buffer[:end + 2]
+                if not CHUNK_SIZE.match(size):
+                    raise ParseError(400, "Invalid chunk size")
+                self.chunk_size = int(size, 16)
+                if len(self.body) + self.chunk_size > self.max_body_size:
+                    raise ParseError(413, "Request body too large")
+                self.chunk_state = 'data' if self.chunk_size else 'trailer'
+            elif self.chunk_state == 'data':
+                if len(self.buffer) < self.chunk_size + 2:
+                    return False
+                if self.buffer[self.chunk_size:self.chunk_size + 2] != b'\r\n':
+                    raise ParseError(400, "Chunk not terminated by CRLF")
+                self.body += self.buffer[:self.chunk_size]
+                del self.buffer[:self.chunk_size + 2]
+                self.chunk_state = 'size'
+            else:
+                # Trailer fields are read and dropped; an empty line ends the body
+                end = self.buffer.find(b'\r\n')
+                if end < 0:
+                    if len(self.buffer) > self.max_header_size:
+                        raise ParseError(431, "Trailer section too large")
+                    return False
+                del self.buffer[:end + 2]
+                if end == 0:
+                    return True
+
+    def _finish(self):
+        request = self.request
+        request.body = bytes(self.body)
+        self.request = None
+        self.remaining = 0
+        self.chunked = False
+        self.chunk_state = 'size'
+        self.chunk_size = 0
+        self.body = bytearray()
+        self.continue_sent = False
+        return request
@@ -1,27 +1,71 @@
 import socket
 import threading
-import hashlib
-import time
 import pickle
 from urllib.parse import urlparse
 from collections import defaultdict
 import http.client
 import json
 
+from cache import ResponseCache, ADMISSION_LRU
+from http_cache import (ProxyResponse, VaryIndex, HOP_BY_HOP, CONDITIONAL_HEADERS, cache_key,
+                        etag_matches, parse_cache_control, parse_headers)
+from single_flight import SingleFlight
+from connection_pool import ConnectionPools
+from http_parser import RequestParser, ParseError
+
+
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS', 'TRACE'}
+
+# How long a request waits for an identical in-flight backend fetch
+COALESCE_TIMEOUT = 30
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'TRACE', 'PUT', 'DELETE'}
+
+# Errors meaning a reused keep-alive connection was closed by the backend meanwhile
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                           ConnectionResetError, BrokenPipeError)
+
 
 class DistributedProxyServer:
-    def __init__(self, host='localhost', port=8080, cache_ttl=300):
+    def __init__(self, host='localhost', port=8080, cache_ttl=300,
+                 cache_max_bytes=64 * 1024 * 1024, cache_admission=ADMISSION_LRU,
+                 cache_stale_ttl=None, stale_while_revalidate=10, coalesce=True,
+                 backend_pool_size=10, backend_idle_timeout=15, backend_wait_timeout=5,
+                 keep_alive_timeout=15, request_timeout=30, max_requests_per_connection=1000):
         self.host = host
         self.port = port
+        # Freshness for responses without Cache-Control/Expires/Last-Modified
         self.cache_ttl = cache_ttl
-        self.cache = {}
-        self.cache_timestamps = {}
+        # How long stale responses with validators are kept for revalidation
+        self.cache_stale_ttl = cache_ttl if cache_stale_ttl is None else cache_stale_ttl
+        # Seconds past expiry a response is still served while it is refreshed in the
+        # background (unless the response sets its own stale-while-revalidate)
+        self.stale_while_revalidate = stale_while_revalidate
+        # Concurrent misses for the same key share one backend fetch
+        self.coalesce = coalesce
+        self.flights = SingleFlight()
+        # Bounded response cache: byte budget, LRU eviction, TTL expiry via a timer wheel
+        self.cache = ResponseCache(max_bytes=cache_max_bytes, default_ttl=cache_ttl,
+                                   admission=cache_admission)
         self.backend_servers = [
             {'host': 'localhost', 'port': 8000, 'weight': 1},
             {'host': 'localhost', 'port': 8001, 'weight': 1},
             {'host': 'localhost', 'port': 8002, 'weight': 2}
         ]
+        # Persistent keep-alive connections per backend, shared by all handler threads
+        # (backend_pool_size=0 opens a new connection for every request)
+        self.backend_pools = ConnectionPools(max_size=backend_pool_size,
+                                             idle_timeout=backend_idle_timeout,
+                                             wait_timeout=backend_wait_timeout) \
+            if backend_pool_size else None
         self.server_stats = defaultdict(lambda: {'requests': 0, 'errors': 0})
+        # Client connections: idle keep-alive connections are closed after
+        # keep_alive_timeout, a request that stalls half-way after request_timeout
+        self.keep_alive_timeout = keep_alive_timeout
+        self.request_timeout = request_timeout
+        self.max_requests_per_connection = max_requests_per_connection
+        self.client_stats = defaultdict(int)  # connections / requests / keep-alive reuses
+        self.cache_outcomes = defaultdict(int)  # HIT / MISS / COALESCED / REVALIDATED / STALE / BYPASS
         self.current_server = 0
         self.lock = threading.Lock()
 
@@ -33,6 +77,9 @@ class DistributedProxyServer:
         server_socket.listen(100)  # Handle up to 100 concurrent connections
         print(f"🚀 Distributed Proxy Server running on {self.host}:{self.port}")
 
+        # Remove expired cache entries in the background instead of waiting for a lookup
+        self.cache.start_sweeper()
+
         while True:
             client_socket, client_address = server_socket.accept()
             print(f"📥 Connection from {client_address}")
@@ -46,66 +93,208 @@ class DistributedProxyServer:
             client_thread.start()
 
     def handle_client(self, client_socket, client_address):
-        """Handle HTTP requests from clients"""
+        """Handle HTTP/1.1 requests from a client: the connection is kept alive between
+        requests, and pipelined requests are answered one by one in the order received"""
+        parser = RequestParser()
+        served = 0
+        with self.lock:
+            self.client_stats['connections'] += 1
         try:
-            request_data = client_socket.recv(4096).decode('utf-8')
-
-            if not request_data:
-                return
-
-            # Parse HTTP request
-            request_lines = request_data.split('\r\n')
-            request_line = request_lines[0]
-            method, url, version = request_line.split()
-
-            print(f"📨 {method} {url} from {client_address}")
-
-            # Process the request
-            response = self.process_request(method, url, request_data, client_address)
-
-            # Send response back to client
-            client_socket.sendall(response)
-
-        except Exception as e:
+            while True:
+                client_socket.settimeout(self.request_timeout if parser.pending
+                                         else self.keep_alive_timeout)
+                try:
+                    data = client_socket.recv(65536)
+                except socket.timeout:
+                    break  # idle keep-alive connection, or a request that stalled
+                if not data:
+                    break
+
+                try:
+                    requests = parser.feed(data)
+                except ParseError as e:
+                    self.reject_request(client_socket, client_address, e)
+                    break
+                if parser.take_continue():
+                    client_socket.sendall(b"HTTP/1.1 100 Continue\r\n\r\n")
+
+                for request in requests:
+                    served += 1
+                    keep_alive = request.keep_alive and served < self.max_requests_per_connection
+                    print(f"📨 {request.method} {request.target} from {client_address}")
+                    with self.lock:
+                        self.client_stats['requests'] += 1
+                        if served > 1:
+                            self.client_stats['keep_alive_reuses'] += 1
+
+                    try:
+                        # Process the request
+                        response = self.process_request(request.method, request.target,
+                                                        request.data(), client_address)
+                    except Exception as e:
+                        print(f"❌ Error handling client {client_address}: {e}")
+                        response = self.create_error_response(500, "Internal Server Error")
+
+                    # Send response back to client
+                    client_socket.sendall(self.with_connection_header(response, keep_alive))
+                    if not keep_alive:
+                        return
+
+                # A malformed request pipelined after the ones just answered
+                if parser.error is not None:
+                    self.reject_request(client_socket, client_address, parser.error)
+                    break
+
+        except OSError as e:
             print(f"❌ Error handling client {client_address}: {e}")
-            error_response = self.create_error_response(500, "Internal Server Error")
-            client_socket.sendall(error_response)
         finally:
             client_socket.close()
 
+    def reject_request(self, client_socket, client_address, error):
+        """Answer a request the parser rejected; the connection is closed after it"""
+        print(f"❌ Bad request from {client_address}: {error}")
+        error_response = self.create_error_response(error.status, error.reason)
+        client_socket.sendall(self.with_connection_header(error_response, False))
+
+    def with_connection_header(self, response, keep_alive):
+        """Add the Connection header (and Keep-Alive timeout) after the status line"""
+        status_end = response.index(b'\r\n')
+        if keep_alive:
+            header = f"\r\nConnection: keep-alive\r\nKeep-Alive: timeout={self.keep_alive_timeout}"
+        else:
+            header = "\r\nConnection: close"
+        return response[:status_end] + header.encode('latin-1') + response[status_end:]
+
     def process_request(self, method, url, request_data, client_address):
         """Process HTTP request with caching and load balancing"""
-        # Generate cache key
-        cache_key = self.generate_cache_key(method, url, request_data)
-
-        # Check cache for GET requests
-        if method.upper() == 'GET':
-            cached_response = self.get_cached_response(cache_key)
-            if cached_response:
+        method = method.upper()
+        request_headers = parse_headers(request_data)
+        request_directives = parse_cache_control(request_headers.get('cache-control'))
+        use_cache = method == 'GET' and 'no-store' not in request_directives
+
+        if not use_cache:
+            try:
+                response, _ = self.fetch(method, url, request_data, request_headers, None, False)
+            except Exception as e:
+                print(f"❌ Backend error: {e}")
+                return self.create_error_response(502, "Bad Gateway")
+            if method not in SAFE_METHODS and response.status < 400:
+                # A successful unsafe request invalidates what is cached for the URL
+                self.invalidate(url, request_headers)
+            self.count_cache_outcome('BYPASS')
+            return response.to_bytes([('X-Cache', 'BYPASS')], head=method == 'HEAD')
+
+        # Check cache; stale entries are served while refreshed, or revalidated first
+        key = self.generate_cache_key(method, url, request_headers)
+        cached = self.lookup_cached_response(method, url, request_headers)
+        if cached is not None and not self.wants_revalidation(request_headers):
+            if cached.is_fresh():
                 print(f"💾 Serving from cache: {url}")
-                return cached_response
+                return self.cached_reply(cached, request_headers, 'HIT')
+            if self.can_serve_stale(cached):
+                self.flights.do_async(key, self.flight(method, url, request_data,
+                                                       request_headers, cached))
+                print(f"🕰️  Serving stale copy while revalidating: {url}")
+                return self.cached_reply(cached, request_headers, 'STALE')
+
+        try:
+            response, outcome = self.coalesced_fetch(key, method, url, request_data,
+                                                     request_headers, cached)
+        except Exception as e:
+            print(f"❌ Backend error: {e}")
+            if cached is not None and not cached.requires_revalidation:
+                print(f"🕰️  Backend unavailable, serving stale copy: {url}")
+                return self.cached_reply(cached, request_headers, 'STALE')
+            return self.create_error_response(502, "Bad Gateway")
 
+        if outcome == 'REVALIDATED':
+            return self.cached_reply(response, request_headers, outcome)
+        self.count_cache_outcome(outcome)
+        return response.to_bytes([('X-Cache', outcome)])
+
+    def coalesced_fetch(self, key, method, url, request_data, request_headers, cached):
+        """Fetch through single-flight: concurrent misses for the key wait for one backend
+        request. Returns (response, outcome)"""
+        leader = self.flight(method, url, request_data, request_headers, cached)
+        if not self.coalesce:
+            return leader()[:2]
+
+        (response, outcome, leader_headers), shared = self.flights.do(key, leader, COALESCE_TIMEOUT)
+        if not shared:
+            return response, outcome
+        if self.can_share(response, leader_headers, request_headers):
+            return response, 'REVALIDATED' if outcome == 'REVALIDATED' else 'COALESCED'
+        # Not reusable for this client (private, a 304 for the leader's own validators, or
+        # another variant): fetch separately
+        return self.fetch(method, url, request_data, request_headers, cached, True)
+
+    def flight(self, method, url, request_data, request_headers, cached):
+        """The call run by single-flight for a key. Background revalidations and coalesced
+        misses share the keys, so every flight returns the same shape:
+        (response, outcome, headers of the request that was sent)"""
+        def leader():
+            response, outcome = self.fetch(method, url, request_data, request_headers, cached, True)
+            return response, outcome, request_headers
+        return leader
+
+    def can_share(self, response, leader_headers, request_headers):
+        """Whether the response fetched for one request can answer another one"""
+        if response.status == 304:
+            return False
+        if not response.is_storable(leader_headers) or not response.is_storable(request_headers):
+            return False
+        return all(leader_headers.get(name) == request_headers.get(name) for name in response.vary)
+
+    def can_serve_stale(self, cached):
+        if cached.requires_revalidation:
+            return False
+        window = cached.stale_while_revalidate(self.stale_while_revalidate)
+        return cached.current_age() < cached.freshness + window
+
+    def fetch(self, method, url, request_data, request_headers, cached, store):
+        """Send the request to a backend (conditionally, if a stored copy exists) and store
+        the result; returns (response, outcome)"""
         # Select backend server using weighted round-robin
         backend_server = self.select_backend_server()
         print(f"🔀 Routing to backend: {backend_server['host']}:{backend_server['port']}")
 
         try:
-            # Forward request to backend server
-            response = self.forward_to_backend(backend_server, request_data, url)
-
-            # Cache successful GET responses
-            if method.upper() == 'GET' and response.startswith(b'HTTP/1.1 200'):
-                self.cache_response(cache_key, response)
-
-            # Update server statistics
+            validators = cached.conditional_headers() if cached is not None else None
+            response = self.forward_to_backend(backend_server, request_data, url, validators)
             self.update_server_stats(backend_server, success=True)
-
-            return response
-
-        except Exception as e:
-            print(f"❌ Backend error: {e}")
+        except Exception:
             self.update_server_stats(backend_server, success=False)
-            return self.create_error_response(502, "Bad Gateway")
+            raise
+
+        if cached is not None and response.status == 304:
+            # Still valid: refresh the stored headers and freshness, keep the stored body
+            cached = cached.revalidated(response, self.cache_ttl)
+            self.store_response(method, url, request_headers, cached)
+            print(f"♻️  Revalidated: {url}")
+            return cached, 'REVALIDATED'
+
+        if store:
+            self.store_response(method, url, request_headers, response)
+        return response, 'MISS'
+
+    def wants_revalidation(self, request_headers):
+        """Client asked for an end-to-end check (Cache-Control: no-cache / max-age=0)"""
+        directives = parse_cache_control(request_headers.get('cache-control'))
+        return 'no-cache' in directives or directives.get('max-age') == '0' or \
+            ('cache-control' not in request_headers and
+             'no-cache' in request_headers.get('pragma', '').lower())
+
+    def cached_reply(self, cached, request_headers, outcome):
+        """Serialize a cached response, or a 304 if the client already holds it"""
+        self.count_cache_outcome(outcome)
+        extra_headers = [('Age', int(cached.current_age())), ('X-Cache', outcome)]
+        if etag_matches(request_headers.get('if-none-match'), cached.header('ETag')):
+            return cached.not_modified(extra_headers)
+        return cached.to_bytes(extra_headers)
+
+    def count_cache_outcome(self, outcome):
+        with self.lock:
+            self.cache_outcomes[outcome] += 1
 
     def select_backend_server(self):
         """Weighted round-robin load balancing"""
@@ -119,69 +308,125 @@ class DistributedProxyServer:
                 if self.current_server < current_weight:
                     return server
 
-    def forward_to_backend(self, backend_server, request_data, original_url):
-        """Forward HTTP request to backend server"""
-        # Parse the original URL to extract path
+    def forward_to_backend(self, backend_server, request_data, original_url, validators=None):
+        """Forward HTTP request to backend server; validators (If-None-Match /
+        If-Modified-Since) replace the client's own conditional headers"""
+        # Parse the original URL to extract path and query
         parsed_url = urlparse(original_url)
         path = parsed_url.path or '/'
-
-        # Create connection to backend
-        conn = http.client.HTTPConnection(
-            backend_server['host'],
-            backend_server['port']
-        )
-
-        # Parse and reconstruct the request for backend
-        lines = request_data.split('\r\n')
-        request_line = lines[0]
-
-        # Modify request line to use correct path
-        method, _, version = request_line.split()
-        modified_request_line = f"{method} {path} {version}"
-        lines[0] = modified_request_line
-
-        # Rebuild request
-        modified_request = '\r\n'.join(lines)
-
-        # Send request to backend
-        conn.request("GET", path, body=modified_request.encode('utf-8'))
+        if parsed_url.query:
+            path += '?' + parsed_url.query
+
+        # Forward the client's method, end-to-end headers and body
+        head, _, body = request_data.partition('\r\n\r\n')
+        method = head.split('\r\n', 1)[0].split()[0]
+        skip = HOP_BY_HOP | {'content-length'} | (CONDITIONAL_HEADERS if validators else set())
+        headers = {}
+        for line in head.split('\r\n')[1:]:
+            name, sep, value = line.partition(':')
+            if sep and name.strip().lower() not in skip:
+                headers[name.strip()] = value.strip()
+        headers.update(validators or {})
+
+        body = body.encode('latin-1') if body else None
+        if self.backend_pools is None:
+            conn = http.client.HTTPConnection(backend_server['host'], backend_server['port'])
+            try:
+                return self.send_to_backend(conn, method, path, body, headers)
+            finally:
+                conn.close()
+
+        pool = self.backend_pools.get(backend_server)
+        conn, reused = pool.acquire()
+        try:
+            response = self.send_to_backend(conn, method, path, body, headers)
+        except STALE_CONNECTION_ERRORS:
+            pool.discard(conn)
+            if not reused or method not in IDEMPOTENT_METHODS:
+                raise
+            # The backend closed the idle connection: retry once on a new one
+            conn, _ = pool.acquire()
+            try:
+                response = self.send_to_backend(conn, method, path, body, headers)
+            except Exception:
+                pool.discard(conn)
+                raise
+        except Exception:
+            pool.discard(conn)
+            raise
+        pool.release(conn, reusable=conn.sock is not None)
+        return response
+
+    def send_to_backend(self, conn, method, path, body, headers):
+        """One request/response exchange on a backend connection; the body is read
+        completely so the connection can be reused"""
+        conn.request(method, path, body=body, headers=headers)
         response = conn.getresponse()
 
         # Read response data
         response_data = response.read()
-
-        # Build HTTP response
-        status_line = f"HTTP/1.1 {response.status} {response.reason}\r\n"
-        headers = ""
-        for header, value in response.getheaders():
-            headers += f"{header}: {value}\r\n"
-
-        full_response = (status_line + headers + "\r\n").encode('utf-8') + response_data
-        conn.close()
-
-        return full_response
-
-    def generate_cache_key(self, method, url, request_data):
-        """Generate unique cache key for request"""
-        key_data = f"{method}:{url}:{request_data}"
-        return hashlib.md5(key_data.encode()).hexdigest()
+        return ProxyResponse(response.status, response.reason,
+                             [(header, value) for header, value in response.getheaders()
+                              if header.lower() not in HOP_BY_HOP],
+                             response_data)
+
+    def generate_cache_key(self, method, url, request_headers, vary=()):
+        """Cache key from the method, the normalized URL and the Vary-selected headers"""
+        return cache_key(method, url, request_headers, vary)
+
+    def lookup_cached_response(self, method, url, request_headers):
+        """Stored response for the request (fresh or stale), following Vary"""
+        cached = self.get_cached_response(self.generate_cache_key(method, url, request_headers))
+        if isinstance(cached, VaryIndex):
+            # The URL varies: the entry lists the request headers that select a variant
+            cached = self.get_cached_response(
+                self.generate_cache_key(method, url, request_headers, cached.names))
+        return cached
+
+    def store_response(self, method, url, request_headers, response):
+        """Store a response as allowed by its Cache-Control / Expires headers"""
+        if not response.is_storable(request_headers):
+            return False
+        if response.freshness == 0:
+            response.freshness = response.freshness_lifetime(self.cache_ttl)
+        ttl = response.freshness - response.initial_age()
+        # Stale copies are kept for revalidation and stale-while-revalidate
+        keep = self.cache_stale_ttl if response.has_validators else 0
+        if not response.requires_revalidation:
+            keep = max(keep, response.stale_while_revalidate(self.stale_while_revalidate))
+        if keep:
+            ttl = max(ttl, 0) + keep
+
+        key = self.generate_cache_key(method, url, request_headers)
+        vary = response.vary
+        if vary:
+            variant = self.generate_cache_key(method, url, request_headers, vary)
+            with self.lock:
+                # The index keeps the variants already stored, unless Vary itself changed
+                index = self.cache.peek(key)
+                if not isinstance(index, VaryIndex) or index.names != vary:
+                    index = VaryIndex(vary)
+                self.cache_response(key, index.with_key(variant), ttl)
+            key = variant
+        return self.cache_response(key, response, ttl)
+
+    def invalidate(self, url, request_headers):
+        """Drop what is cached for the URL: the stored response or, if the URL varies,
+        every variant listed in its index"""
+        key = self.generate_cache_key('GET', url, request_headers)
+        index = self.cache.peek(key)
+        if isinstance(index, VaryIndex):
+            for variant in index.keys:
+                self.cache.delete(variant)
+        self.cache.delete(key)
 
     def get_cached_response(self, cache_key):
-        """Retrieve response from cache if valid"""
-        if cache_key in self.cache:
-            if time.time() - self.cache_timestamps[cache_key] < self.cache_ttl:
-                return self.cache[cache_key]
-            else:
-                # Cache expired
-                del self.cache[cache_key]
-                del self.cache_timestamps[cache_key]
-        return None
-
-    def cache_response(self, cache_key, response):
-        """Store response in cache"""
-        with self.lock:
-            self.cache[cache_key] = response
-            self.cache_timestamps[cache_key] = time.time()
+        """Retrieve response from cache if present (the caller checks freshness)"""
+        return self.cache.get(cache_key)
+
+    def cache_response(self, cache_key, response, ttl=None):
+        """Store response in cache (may be refused if it does not fit the byte budget)"""
+        return self.cache.put(cache_key, response, ttl)
 
     def update_server_stats(self, server, success=True):
         """Update backend server statistics"""
@@ -206,7 +451,6 @@ class DistributedProxyServer:
         response = f"HTTP/1.1 {status_code} {message}\r\n"
         response += "Content-Type: text/html\r\n"
         response += f"Content-Length: {len(response_body)}\r\n"
-        response += "Connection: close\r\n"
         response += "\r\n"
         response += response_body
 
@@ -214,11 +458,16 @@ class DistributedProxyServer:
 
     def get_statistics(self):
         """Get proxy server statistics"""
+        cache_stats = self.cache.get_statistics()
         with self.lock:
             return {
-                'cache_size': len(self.cache),
-                'cache_hits': sum(1 for ts in self.cache_timestamps.values()
-                                  if time.time() - ts < self.cache_ttl),
+                'cache_size': cache_stats['entries'],
+                'cache_hits': cache_stats['hits'],
+                'cache': cache_stats,
+                'cache_outcomes': dict(self.cache_outcomes),
+                'coalescing': self.flights.get_statistics(),
+                'backend_pools': self.backend_pools.get_statistics() if self.backend_pools else {},
+                'client_stats': dict(self.client_stats),
                 'server_stats': dict(self.server_stats),
                 'backend_servers': self.backend_servers
             }
\ No newline at end of file
@@ -3,9 +3,10 @@ from http.server import HTTPServer, BaseHTTPRequestHandler
 
 
 class ManagementAPI(BaseHTTPRequestHandler):
-    def __init__(self, proxy_server, *args):
-        self.proxy_server = proxy_server
-        super().__init__(*args)
+    # The proxy is attached to the HTTPServer instance (httpd.proxy_server = proxy)
+    @property
+    def proxy_server(self):
+        return self.server.proxy_server
 
     def do_GET(self):
         if self.path == '/stats':
@@ -0,0 +1,72 @@
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution: the first caller
+    runs the function, the others wait for it and receive the same result (or error)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, fn, timeout=None):
+        """Run fn() once for all concurrent callers of key; returns (result, shared)"""
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = self.calls[key] = _Call()
+                self.executions += 1
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+
+        if leader:
+            self._run(key, call, fn)
+        elif not call.done.wait(timeout):
+            raise TimeoutError(f"Timed out waiting for the in-flight call for {key}")
+
+        if call.error is not None:
+            raise call.error
+        return call.result, not leader
+
+    def do_async(self, key, fn):
+        """Run fn() on a daemon thread unless a call for key is already in flight;
+        returns whether a new call was started"""
+        with self.lock:
+            if key in self.calls:
+                return False
+            call = self.calls[key] = _Call()
+            self.executions += 1
+
+        threading.Thread(target=self._run, args=(key, call, fn), daemon=True).start()
+        return True
+
+    def _run(self, key, call, fn):
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def get_statistics(self):
+        with self.lock:
+            return {
+                'in_flight': len(self.calls),
+                'executions': self.executions,
+                'shared': self.shared,
+            }